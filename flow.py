@@ -2,75 +2,231 @@
 Flow to fetch, classify and export Telegram schedule messages.
 
 Flow:
-    FetchTelegramMessagesNode (fetch messages -> CSV)
+    FetchTelegramMessagesNode (fetch messages -> list of ScheduleMessage)
         ↓
-    GroupMessagesByWeekNode (group by week -> list of weekly CSV)
+    GroupMessagesByWeekNode (group by week -> list of weekly message batches)
         ↓
-    LabelScheduleMessagesNode (AsyncParallelBatchNode - classify each week in parallel)
+    PreClassifyMessagesNode (label formulaic messages with local rules, drop chit-chat)
         ↓
-    ExportExcelNode (export to Excel)
+    PackMessageBatchesNode (pack messages into token-budgeted LLM requests)
+        ↓
+    LabelScheduleMessagesNode (AsyncParallelBatchNode - classify each request in parallel)
+        ↓
+    Export (AsyncDAGFlow - independent exports run side by side)
+        ExportExcelNode (export to Excel)
+        ExportYamlNode (dump labels as YAML)
+
+Streaming mode (--stream) replaces the nodes before the export with
+StreamScheduleMessagesNode, which labels each week as soon as the fetch has
+moved past it. Batch-job mode (--batch-job) submits the labeling requests as
+bulk LLM jobs instead of interactive calls, for month-end reruns and backfills.
+With --checkpoint the shared store is saved under RUN_DIR/<run id> after
+every node (and each finished labeling batch as it completes); --resume <run
+id> continues a crashed run from its first unfinished node.
 """
+import argparse
 import asyncio
-from pocketflow import AsyncFlow
+import os
+from datetime import datetime, timezone
+from pocketflow import AsyncFlow, AsyncDAGFlow, Checkpoint, JsonSerializer
 from nodes import (
     FetchTelegramMessagesNode,
     GroupMessagesByWeekNode,
+    PreClassifyMessagesNode,
+    PackMessageBatchesNode,
     LabelScheduleMessagesNode,
     ExportExcelNode,
+    ExportYamlNode,
+    StreamScheduleMessagesNode,
 )
+from src import config
+from src.telegram_sync import month_window, find_schedule_topics
+from src.replay_client import ReplayTelegramClient
+from src.token_budget import estimate_tokens
+from utils.call_llm import close_llm_client
+
+
 
+def create_pack_node():
+    """Create the packing node, leaving room for the labeling system prompt."""
+    return PackMessageBatchesNode(reserved_input_tokens=estimate_tokens(LabelScheduleMessagesNode.SYSTEM_PROMPT))
+
+
+def create_export_flow():
+    """Create the post-label phase: exports that only read the labels run concurrently.
+
+    Add further branches (archives, statistics) as nodes here; use
+    node.after(...) for one that needs another's output.
+    """
+    return AsyncDAGFlow([ExportExcelNode(), ExportYamlNode()])
 
-def create_schedule_flow():
+
+def create_checkpoint(run_id):
+    """Checkpoint of a run under config.RUN_DIR (labels are kept as readable JSON)."""
+    return Checkpoint(
+        os.path.join(config.RUN_DIR, run_id),
+        serializers={"labeled_messages": JsonSerializer()},
+    )
+
+
+def create_schedule_flow(client_factory=None, store_path=None, llm_mode=None, checkpoint=None):
     """Create and return a flow to fetch, classify and export schedule messages.
 
     Flow structure:
-        Fetch -> Group by Week -> Label (parallel) -> Export Excel
+        Fetch -> Group by Week -> Rules -> Pack -> Label (parallel) -> Export (Excel | YAML)
+
+    Args:
+        client_factory: Optional callable returning a Telegram client, e.g.
+            a ReplayTelegramClient to run the flow offline
+        store_path: Optional MessageStore path for the fetch node
+        llm_mode: "interactive" or "batch" labeling (default: config.LLM_MODE)
+        checkpoint: Optional Checkpoint to save (and resume) the run after each node
     """
     # Create nodes
-    fetch_node = FetchTelegramMessagesNode()
+    fetch_node = FetchTelegramMessagesNode(client_factory=client_factory, store_path=store_path)
     group_node = GroupMessagesByWeekNode()
-    label_node = LabelScheduleMessagesNode(max_retries=3, wait=1)
-    export_node = ExportExcelNode()
+    preclassify_node = PreClassifyMessagesNode()
+    pack_node = create_pack_node()
+    label_node = LabelScheduleMessagesNode(mode=llm_mode)
+    export_node = create_export_flow()
 
     # Connect nodes in sequence
-    fetch_node >> group_node >> label_node >> export_node
+    fetch_node >> group_node >> preclassify_node >> pack_node >> label_node >> export_node
 
     # Use AsyncFlow because LabelScheduleMessagesNode is async
-    return AsyncFlow(start=fetch_node)
+    return AsyncFlow(start=fetch_node, checkpoint=checkpoint)
+
+
+def create_streaming_schedule_flow(client_factory=None, store_path=None, llm_mode=None, checkpoint=None):
+    """Create a flow that labels finished weeks while the fetch is still running.
+
+    Flow structure:
+        Stream (Fetch + Group by Week + Label, overlapped) -> Export (Excel | YAML)
+    """
+    stream_node = StreamScheduleMessagesNode(
+        FetchTelegramMessagesNode(client_factory=client_factory, store_path=store_path),
+        GroupMessagesByWeekNode(),
+        LabelScheduleMessagesNode(mode=llm_mode),
+        pack_node=create_pack_node(),
+        preclassify_node=PreClassifyMessagesNode(),
+    )
+    export_node = create_export_flow()
+
+    stream_node >> export_node
+
+    return AsyncFlow(start=stream_node, checkpoint=checkpoint)
+
 
+async def run_flow(year=None, month=None, client_factory=None, stream=False, llm_mode=None, run_id=None):
+    """Run the schedule flow asynchronously for a month (default: current month).
+
+    With a run_id the run is checkpointed under config.RUN_DIR; an existing
+    checkpoint of that id is resumed (its report window replaces year/month).
+    """
+    now = datetime.now(timezone.utc)
+    report_start, report_end = month_window(year or now.year, month or now.month)
 
-async def run_flow():
-    """Run the schedule flow asynchronously."""
     shared = {
+        # Report window [start, end) for FetchTelegramMessagesNode
+        "report_start": report_start,
+        "report_end": report_end,
+
         # FetchTelegramMessagesNode output
-        "telegram_messages_csv": None,
+        "schedule_messages": None,
 
         # GroupMessagesByWeekNode output
         "weekly_messages": None,
 
+        # PreClassifyMessagesNode output
+        "rule_labels": None,
+        "llm_messages": None,
+        "preclassify_stats": None,
+
+        # PackMessageBatchesNode output
+        "message_batches": None,
+
         # LabelScheduleMessagesNode output
         "labeled_messages": None,
         "weekly_labeled_messages": None,
-        "labeled_messages_yaml": None,
+        "unresolved_messages": None,
 
         # ExportExcelNode output
         "excel_output_path": None,
+
+        # ExportYamlNode output
+        "labeled_messages_yaml": None,
     }
 
     # Create and run the flow
-    flow = create_schedule_flow()
-    await flow.run_async(shared)
+    checkpoint = create_checkpoint(run_id) if run_id else None
+    if checkpoint:
+        print(f"{'Resuming' if checkpoint.exists() else 'Checkpointing'} run {run_id} ({checkpoint.run_dir})")
+    if stream:
+        flow = create_streaming_schedule_flow(client_factory=client_factory, llm_mode=llm_mode, checkpoint=checkpoint)
+    else:
+        flow = create_schedule_flow(client_factory=client_factory, llm_mode=llm_mode, checkpoint=checkpoint)
+    try:
+        await flow.run_async(shared)
+    finally:
+        # The shared LLM client's connections belong to this event loop
+        await close_llm_client()
 
     return shared
 
 
+def create_replay_client(source, start, end):
+    """Create an offline ReplayTelegramClient from a fixture path or 'synthetic:N'."""
+    if source.startswith("synthetic:"):
+        topics = find_schedule_topics(os.path.join("data_raw", "dialog_info.json"))
+        return ReplayTelegramClient.synthetic(topics, int(source.split(":", 1)[1]), start, end)
+
+    # Recorded fixtures come from the HiAI Schedule topic (scripts/fetch_schedule_sample.py)
+    return ReplayTelegramClient.from_fixture(source, config.SAMPLE_GROUP_ID, config.SAMPLE_TOPIC_ID)
+
+
 def main():
     """Main entry point."""
-    shared = asyncio.run(run_flow())
+    parser = argparse.ArgumentParser(description="Fetch, classify and export Telegram schedule messages.")
+    parser.add_argument("--month", help="Report month as YYYY-MM (default: current month)")
+    parser.add_argument(
+        "--replay",
+        help="Run offline against a fixture JSON (e.g. data_raw/schedule_sample.json) "
+             "or 'synthetic:N' generated messages instead of Telegram"
+    )
+    parser.add_argument("--stream", action="store_true", help="Label finished weeks while still fetching")
+    parser.add_argument(
+        "--batch-job",
+        action="store_true",
+        help="Label through bulk LLM batch jobs (cheaper, slower; for reruns and backfills)"
+    )
+    parser.add_argument("--checkpoint", action="store_true", help="Save the run after each node so it can be resumed")
+    parser.add_argument("--resume", metavar="RUN_ID", help="Resume a checkpointed run from its first unfinished node")
+    args = parser.parse_args()
+
+    run_id = args.resume
+    if run_id and not create_checkpoint(run_id).exists():
+        parser.error(f"no checkpoint for run '{run_id}' in {config.RUN_DIR}")
+    if args.checkpoint and not run_id:
+        run_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+
+    report_month = datetime.strptime(args.month, "%Y-%m") if args.month else datetime.now(timezone.utc)
+    year, month = report_month.year, report_month.month
+
+    client_factory = None
+    if args.replay:
+        client = create_replay_client(args.replay, *month_window(year, month))
+        client_factory = lambda: client
+
+    shared = asyncio.run(run_flow(
+        year, month, client_factory=client_factory, stream=args.stream,
+        llm_mode="batch" if args.batch_job else None, run_id=run_id
+    ))
 
     print("\n=== Schedule Report ===")
     print(f"Excel output: {shared.get('excel_output_path')}")
     print(f"\nLabeled messages (YAML):\n{shared.get('labeled_messages_yaml')}")
+    if shared.get('unresolved_messages'):
+        print(f"Unresolved messages: {len(shared['unresolved_messages'])}")
 
     return shared
 
@@ -5,13 +5,21 @@ Node package for PocketFlow schedule automation
 from .fetch_telegram_messages import FetchTelegramMessagesNode
 from .process_telegram_messages import ProcessTelegramMessagesNode
 from .group_messages_by_week import GroupMessagesByWeekNode
+from .preclassify_messages import PreClassifyMessagesNode
+from .pack_message_batches import PackMessageBatchesNode
 from .label_schedule_messages import LabelScheduleMessagesNode
 from .export_excel import ExportExcelNode
+from .export_yaml import ExportYamlNode
+from .stream_schedule_messages import StreamScheduleMessagesNode
 
 __all__ = [
     'FetchTelegramMessagesNode',
     'ProcessTelegramMessagesNode',
     'GroupMessagesByWeekNode',
+    'PreClassifyMessagesNode',
+    'PackMessageBatchesNode',
     'LabelScheduleMessagesNode',
     'ExportExcelNode',
+    'ExportYamlNode',
+    'StreamScheduleMessagesNode',
 ]
\ No newline at end of file
@@ -0,0 +1,35 @@
+"""
+Node to dump labeled messages as YAML.
+
+Input: labeled_messages dict from shared store
+Output: labeled_messages_yaml string in shared store
+"""
+from pocketflow import Node
+import yaml
+
+
+class ExportYamlNode(Node):
+    """Node to dump labeled schedule messages as a YAML string.
+
+    Input: labeled_messages dict with categories: nghi, tre, nua_buoi, remote
+    Output: labeled_messages_yaml
+    """
+
+    def prep(self, shared):
+        """Get labeled messages from shared store."""
+        return shared.get("labeled_messages", {})
+
+    def exec(self, labeled_messages):
+        """Dump labeled messages to YAML (the C dumper keeps large months fast)."""
+        return yaml.dump(
+            labeled_messages,
+            Dumper=getattr(yaml, "CSafeDumper", yaml.SafeDumper),
+            allow_unicode=True,
+            default_flow_style=False,
+            sort_keys=False
+        )
+
+    def post(self, shared, prep_res, exec_res):
+        """Store the YAML dump."""
+        shared["labeled_messages_yaml"] = exec_res
+        return "default"
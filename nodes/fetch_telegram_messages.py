@@ -5,45 +5,83 @@ from pocketflow import AsyncNode
 import sys
 import os
 import asyncio
-import json
-import csv
-from io import StringIO
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 
 # Add the project root directory to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from telethon import TelegramClient
 from src import config
+from src.message_store import MessageStore
+from src.sender_cache import SenderResolver
+from src.rate_limiter import AdaptiveRateLimiter
+from src.telegram_sync import sync_topic, month_window, find_schedule_topics
+from src.schedule_message import ScheduleMessage
 
 
 class FetchTelegramMessagesNode(AsyncNode):
-    """Node to fetch messages from Telegram schedule topics for current month.
-
-    Output CSV format:
-        message_id,name,date,message
+    """Node to fetch messages from Telegram schedule topics for a report window.
+
+    The window is shared["report_start"], shared["report_end"] ([start, end),
+    UTC datetimes) and defaults to the current month.
+
+    Messages are synced incrementally into the local MessageStore, so each run
+    only requests messages newer than the last synced one per topic. Topics are
+    fetched concurrently (FETCH_CONCURRENCY) under one shared rate limiter.
+
+    Args:
+        client_factory: Optional zero-argument callable returning a client
+            (e.g. ReplayTelegramClient for offline runs); defaults to a
+            TelegramClient built from config
+        store_path: MessageStore path (default: config.MESSAGE_STORE_PATH, or
+            an in-memory store when client_factory is given)
+        sender_cache_path: Sender cache path (default: config.SENDER_CACHE_PATH,
+            or in memory when client_factory is given)
+        dialog_info_path: dialog_info.json path (default: data_raw/dialog_info.json)
+
+    Output: shared["schedule_messages"] - list of ScheduleMessage sorted by date
     """
 
+    def __init__(self, client_factory=None, store_path=None, sender_cache_path=None,
+                 dialog_info_path=None, max_retries=1, wait=0):
+        super().__init__(max_retries=max_retries, wait=wait)
+        self.client_factory = client_factory
+        # Injected (offline) clients must not write into the production store and cache
+        self.store_path = store_path or (':memory:' if client_factory else config.MESSAGE_STORE_PATH)
+        self.sender_cache_path = sender_cache_path or (None if client_factory else config.SENDER_CACHE_PATH)
+        self.dialog_info_path = dialog_info_path or os.path.join('data_raw', 'dialog_info.json')
+
     async def prep_async(self, shared):
-        # Get current month parameters
-        now = datetime.now(timezone.utc)
+        # Report window [start, end); defaults to the current month
+        start, end = shared.get("report_start"), shared.get("report_end")
+        if not start or not end:
+            now = datetime.now(timezone.utc)
+            start, end = month_window(now.year, now.month)
         return {
-            "year": now.year,
-            "month": now.month
+            "start": start,
+            "end": end
         }
 
     async def exec_async(self, params):
         # Run the telegram fetching logic
         return await self._fetch_messages_async(params)
 
-    async def _fetch_messages_async(self, params):
-        """Async function to fetch messages from Telegram"""
+    async def _fetch_messages_async(self, params, on_progress=None):
+        """Async function to fetch messages from Telegram.
+
+        Args:
+            on_progress: Optional async callback on_progress(topic_key, messages, covered_since)
+                used by the streaming pipeline; topic_key is (group_id, topic_id),
+                messages are new ScheduleMessage of the window and every message of
+                that topic sent at or after covered_since has been reported. Every
+                topic is first reported with covered_since == end.
+        """
         # Validate config
-        if not config.TELEGRAM_API_ID or not config.TELEGRAM_API_HASH:
+        if not self.client_factory and (not config.TELEGRAM_API_ID or not config.TELEGRAM_API_HASH):
             raise ValueError("TELEGRAM_API_ID or TELEGRAM_API_HASH not set")
 
         # Find dialog_info.json
-        dialog_info_path = os.path.join('data_raw', 'dialog_info.json')
+        dialog_info_path = self.dialog_info_path
         if not os.path.exists(dialog_info_path):
             raise FileNotFoundError(f"dialog_info.json not found at {dialog_info_path}")
 
@@ -52,124 +90,95 @@ class FetchTelegramMessagesNode(AsyncNode):
         if not schedule_topics:
             raise ValueError("No topics named 'schedule' found in dialog_info.json")
 
-        # Initialize Telegram client
-        client = TelegramClient(config.SESSION_NAME, config.TELEGRAM_API_ID, config.TELEGRAM_API_HASH)
+        # Initialize Telegram client and local message store
+        client = self._create_client()
+        store = MessageStore(self.store_path)
+        resolver = SenderResolver(self.sender_cache_path, ttl=config.SENDER_CACHE_TTL)
+        limiter = AdaptiveRateLimiter(
+            rate=config.FETCH_REQUESTS_PER_SECOND,
+            max_rate=config.FETCH_MAX_REQUESTS_PER_SECOND
+        )
+        semaphore = asyncio.Semaphore(config.FETCH_CONCURRENCY)
         await client.start()
 
-        try:
-            all_messages = []
+        if on_progress:
+            # Register every topic before any of them starts, so nothing is considered fetched too early
             for topic_info in schedule_topics:
-                messages = await self._fetch_messages_for_topic(
+                await on_progress((topic_info['group_id'], topic_info['topic_id']), [], params['end'])
+
+        async def fetch_topic(topic_info):
+            async with semaphore:
+                return await self._fetch_messages_for_topic(
                     client,
+                    store,
+                    resolver,
+                    limiter,
                     topic_info['group_id'],
                     topic_info['topic_id'],
                     topic_info['group_name'],
-                    topic_info['topic_name']
+                    topic_info['topic_name'],
+                    params['start'],
+                    params['end'],
+                    on_progress
                 )
-                all_messages.extend(messages)
 
-            # Convert to CSV format
-            return self._convert_to_csv(all_messages)
+        try:
+            results = await asyncio.gather(*(fetch_topic(t) for t in schedule_topics))
+            all_messages = [m for messages in results for m in messages]
+
+            # Sort messages by date
+            all_messages.sort(key=lambda m: (m.date, m.message_id))
+            return all_messages
         finally:
+            resolver.save()
+            store.close()
             await client.disconnect()
 
+    def _create_client(self):
+        """Create the Telegram client (or the injected offline client)."""
+        if self.client_factory:
+            return self.client_factory()
+
+        # flood_sleep_threshold=0 surfaces every FloodWaitError to the shared rate limiter
+        return TelegramClient(
+            config.SESSION_NAME, config.TELEGRAM_API_ID, config.TELEGRAM_API_HASH,
+            flood_sleep_threshold=0
+        )
+
     def _find_schedule_topics(self, dialog_info_path):
         """Find all groups with topics named 'schedule' (case-insensitive)."""
-        with open(dialog_info_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-
-        schedule_topics = []
-        for group in data.get('groups_and_channels', []):
-            for topic in group.get('topics', []):
-                if topic.get('title', '').lower() == 'schedule':
-                    schedule_topics.append({
-                        'group_id': group['id'],
-                        'group_name': group['name'],
-                        'topic_id': topic['id'],
-                        'topic_name': topic['title']
-                    })
-
-        return schedule_topics
-
-    async def _fetch_messages_for_topic(self, client, group_id, topic_id, group_name, topic_name):
-        """Fetch messages from a specific topic with pagination and rate limiting."""
-        # Get start of current month
-        now = datetime.now(timezone.utc)
-        start_of_month = datetime(now.year, now.month, 1, tzinfo=timezone.utc)
-
-        all_messages = []
-        offset_id = 0
-        MESSAGES_PER_REQUEST = 200
-        TOTAL_MESSAGES_LIMIT = 1000
-        SLEEP_BETWEEN_REQUESTS = 1
-
-        while len(all_messages) < TOTAL_MESSAGES_LIMIT:
-            remaining = TOTAL_MESSAGES_LIMIT - len(all_messages)
-            limit = min(MESSAGES_PER_REQUEST, remaining)
-
-            messages_batch = []
-            async for message in client.iter_messages(
+        return find_schedule_topics(dialog_info_path)
+
+    async def _fetch_messages_for_topic(self, client, store, resolver, limiter, group_id, topic_id,
+                                        group_name, topic_name, start, end, on_progress=None):
+        """Sync a topic into the local store and return its messages for the window [start, end)."""
+        topic_progress = None
+        if on_progress:
+            async def topic_progress(records, covered_since):
+                messages = self._to_schedule_messages(group_id, records, start, end)
+                await on_progress((group_id, topic_id), messages, covered_since)
+
+        stored_messages = await sync_topic(
+            client, store, resolver, limiter, group_id, topic_id, start, end, on_progress=topic_progress
+        )
+        return self._to_schedule_messages(group_id, stored_messages, start, end)
+
+    def _to_schedule_messages(self, group_id, records, start, end):
+        """Convert stored message dicts to ScheduleMessage, keeping non-empty messages of the window."""
+        # Skip empty messages (media without caption, service messages)
+        return [
+            ScheduleMessage(
+                m['message_id'],
                 group_id,
-                reply_to=topic_id,
-                limit=limit,
-                offset_id=offset_id
-            ):
-                # Stop if message is older than start of month
-                if message.date and message.date < start_of_month:
-                    break
-
-                # Get sender info
-                sender = await message.get_sender()
-                sender_name = None
-                sender_id = message.sender_id
-
-                if sender:
-                    if hasattr(sender, 'first_name'):
-                        sender_name = sender.first_name
-                        if sender.last_name:
-                            sender_name += f" {sender.last_name}"
-                    elif hasattr(sender, 'title'):
-                        sender_name = sender.title
-
-                msg_data = {
-                    'message_id': message.id,
-                    'name': sender_name or f"User {sender_id}",
-                    'date': message.date.strftime('%Y-%m-%d %H:%M') if message.date else '',
-                    'message': message.text.strip() if message.text else ''
-                }
-                messages_batch.append(msg_data)
-                offset_id = message.id
-
-            if not messages_batch:
-                break
-
-            all_messages.extend(messages_batch)
-
-            # Sleep between requests to avoid rate limiting
-            if len(all_messages) < TOTAL_MESSAGES_LIMIT and messages_batch:
-                await asyncio.sleep(SLEEP_BETWEEN_REQUESTS)
-
-        return all_messages
-
-    def _convert_to_csv(self, messages):
-        """Convert messages list to CSV string format.
-
-        Output columns: message_id, name, date, message
-        """
-        # Sort messages by date
-        messages.sort(key=lambda x: x['date'])
-
-        # Filter out empty messages
-        messages = [m for m in messages if m['message']]
-
-        # Write to CSV string
-        output = StringIO()
-        writer = csv.DictWriter(output, fieldnames=['message_id', 'name', 'date', 'message'])
-        writer.writeheader()
-        writer.writerows(messages)
-
-        return output.getvalue()
+                m['sender_id'],
+                m['sender_name'] or f"User {m['sender_id']}",
+                m['date'],
+                m['text'].strip()
+            )
+            for m in records
+            if m['text'].strip() and start <= m['date'] < end
+        ]
 
     async def post_async(self, shared, prep_res, exec_res):
-        shared["telegram_messages_csv"] = exec_res
+        shared["schedule_messages"] = exec_res
         return "default"
\ No newline at end of file
@@ -5,180 +5,521 @@ Node to label schedule messages using LLM (Gemini) into categories:
 - nua_buoi: xin nghỉ nửa buổi (sáng / chiều)
 - remote: xin làm remote / làm online
 
-Uses AsyncParallelBatchNode to process multiple weeks in parallel.
-Input: List of weekly CSV data from GroupMessagesByWeekNode
-Output: Merged labeled messages from all weeks
+Uses AsyncParallelBatchNode to label multiple batches in parallel.
+Labels are cached per message (src/label_cache.py); only messages without a
+cached label for the current prompt/model are sent to the LLM. SYSTEM_PROMPT
+is registered once as a provider context cache (src/prompt_cache.py) so each
+request only sends its messages, with inline prompts as the fallback.
+Requests use the compact encoding of src/prompt_codec.py (row numbers, sender
+aliases, day offsets and dates pre-resolved by src/date_resolver.py); responses
+are expanded back into names and dates here, and dates that contradict the
+resolved ones count as low confidence.
+With a cascade model configured, the cheaper model labels every batch first
+and only low-confidence or inconsistent messages are re-labeled by the main
+model (src/label_cascade.py). Slow calls are hedged with a duplicate request
+once they pass the model's p95 latency (src/llm_router.py). In batch mode the
+requests are submitted as bulk jobs instead (src/batch_jobs.py), for backfills
+where cost and quota matter more than latency.
+Input: message_batches from PackMessageBatchesNode (or weekly_messages from
+GroupMessagesByWeekNode when there is no packing stage)
+Output: Merged labeled messages (including rule_labels from
+PreClassifyMessagesNode), plus the same labels regrouped by week
 """
-from pocketflow import AsyncParallelBatchNode
-import yaml
+from pocketflow import AsyncParallelBatchNode, ItemError
+import asyncio
 import sys
 import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from utils.call_llm import call_llm_async
+from utils.call_llm import call_llm_async, create_context_cache, delete_context_cache
+from src import config
+from src.label_cache import LabelCache, prompt_version
+from src.llm_dispatcher import AdaptiveConcurrencyLimiter, LLMDispatcher
+from src.llm_router import HedgedRouter, Route
+from src.batch_jobs import BatchJobClient, GeminiBatchProvider, LocalBatchProvider
+from src.prompt_cache import PromptCache, LocalContextCache, is_cache_error
+from src.label_cascade import CascadeStats, select_escalations
+from src.label_schema import CATEGORIES, RESPONSE_SCHEMA, parse_label_response
+from src.prompt_codec import PromptCodec
 
 
 class LabelScheduleMessagesNode(AsyncParallelBatchNode):
     """Node to classify schedule messages using Gemini LLM in parallel.
 
-    Input: List of weekly data dicts with csv_string for each week
+    Input: List of batch dicts with messages (ScheduleMessage) for each LLM request
     Output: Merged labeled messages with categories: nghi, tre, nua_buoi, remote
 
-    Uses AsyncParallelBatchNode to call LLM for each week in parallel.
+    Uses AsyncParallelBatchNode to call LLM for each batch in parallel.
+
+    Args:
+        cache_path: LabelCache path (default: config.LABEL_CACHE_PATH)
+        model: Gemini model used for labeling (default: config.GEMINI_MODEL)
+        context_cache: "gemini", "local" or "off" (default: config.LLM_CONTEXT_CACHE)
+        repair_rounds: Follow-up requests for messages a response missed
+            (default: config.LLM_REPAIR_ROUNDS)
+        cascade_model: Cheaper model that labels first; "" disables the cascade
+            (default: config.LLM_CASCADE_MODEL)
+        cascade_confidence: Confidence below which cheap labels are escalated
+            (default: config.LLM_CASCADE_CONFIDENCE)
+        cascade_max_escalation: Largest share of a batch escalated for low confidence
+            (default: config.LLM_CASCADE_MAX_ESCALATION)
+        hedge: "on" or "off" (default: config.LLM_HEDGE)
+        provider: Async `call(prompt, **kwargs) -> str` used instead of call_llm_async
+            (e.g. src.llm_router.StubProvider for offline runs)
+        mode: "interactive" or "batch" (default: config.LLM_MODE)
+        batch_provider: Batch job provider, "gemini" or "local" (runs job files
+            against `provider` in-process) (default: config.LLM_BATCH_JOB_PROVIDER)
     """
 
-    SYSTEM_PROMPT = """Bạn là một trợ lý phân loại tin nhắn xin phép lịch làm việc. Chỉ trả về YAML, không có text khác.
+    SYSTEM_PROMPT = """Bạn là một trợ lý phân loại tin nhắn xin phép lịch làm việc. Chỉ trả về JSON, không có text khác.
 
-Phân loại các tin nhắn vào các nhãn sau:
+Phân loại các tin nhắn vào các nhãn (c) sau:
 - nghi: xin nghỉ cả ngày hoặc nhiều ngày (nghỉ phép, nghỉ làm, off)
 - tre: xin lên trễ, đi trễ, vào muộn
 - nua_buoi: xin nghỉ nửa buổi (nghỉ sáng, nghỉ chiều)
 - remote: xin làm remote, làm online, work from home
+- none: không thuộc loại nào
+
+Input: dòng đầu là ngày gốc d0, sau đó là CSV với i = số thứ tự, s = người gửi,
+d = ngày gửi (số ngày so với d0), t = giờ gửi, r = ngày đã tính sẵn từ nội dung, message = nội dung.
+Output: mảng JSON, mỗi phần tử {"i": số thứ tự, "c": nhãn, "p": độ tin cậy, "d": [ngày xin phép, tính theo số ngày so với d0], "n": mô tả ngắn}
 
 ---
 Ví dụ 1:
 Input (CSV):
-message_id,name,date,message
-1047,Tín Lữ,2026-01-13 23:11,Em xin phép làm remote hôm nay (14/1) do em bị sốt ạ
-
-Output (YAML):
-nghi: []
-tre: []
-nua_buoi: []
-remote:
-  - message_id: 1047
-    name: Tín Lữ
-    dates:
-      - "2026-01-14"
-    info: Làm remote do bị sốt
+d0=2026-01-14 (Thứ Tư)
+i,s,d,t,r,message
+1,s1,0,06:11,0,Em xin phép làm remote hôm nay (14/1) do em bị sốt ạ
+
+Output (JSON):
+[{"i": 1, "c": "remote", "p": 0.95, "n": "Làm remote do bị sốt"}]
 
 ---
 Ví dụ 2:
 Input (CSV):
-message_id,name,date,message
-1042,Nguyễn Duy Thắng,2026-01-13 00:41,Dạ em xin phép thầy và anh chị cho em lên trễ tầm 10h ạ
-
-Output (YAML):
-nghi: []
-tre:
-  - message_id: 1042
-    name: Nguyễn Duy Thắng
-    dates:
-      - "2026-01-13"
-    info: Lên trễ đến 10h
-nua_buoi: []
-remote: []
+d0=2026-01-13 (Thứ Ba)
+i,s,d,t,r,message
+1,s1,0,07:41,,Dạ em xin phép thầy và anh chị cho em lên trễ tầm 10h ạ
+
+Output (JSON):
+[{"i": 1, "c": "tre", "p": 0.95, "n": "Lên trễ đến 10h"}]
 
 ---
 Ví dụ 3:
 Input (CSV):
-message_id,name,date,message
-1050,Minh Trần,2026-01-15 08:00,Em xin nghỉ phép ngày 16/1 và 17/1 ạ
-1051,Hoa Nguyễn,2026-01-15 09:30,Em xin nghỉ buổi chiều hôm nay ạ
-
-Output (YAML):
-nghi:
-  - message_id: 1050
-    name: Minh Trần
-    dates:
-      - "2026-01-16"
-      - "2026-01-17"
-    info: Nghỉ phép 2 ngày
-tre: []
-nua_buoi:
-  - message_id: 1051
-    name: Hoa Nguyễn
-    dates:
-      - "2026-01-15"
-    info: Nghỉ buổi chiều
-remote: []
+d0=2026-01-15 (Thứ Năm)
+i,s,d,t,r,message
+1,s1,0,08:00,1;2,Em xin nghỉ phép ngày 16/1 và 17/1 ạ
+2,s2,0,09:30,0c,Em xin nghỉ buổi chiều hôm nay ạ
+3,s1,0,09:45,,Ok giữ sức khỏe nha
+4,s3,0,10:20,?,Em xin nghỉ đầu tuần sau ạ
+
+Output (JSON):
+[{"i": 1, "c": "nghi", "p": 0.95, "n": "Nghỉ phép 2 ngày"}, {"i": 2, "c": "nua_buoi", "p": 0.9, "n": "Nghỉ buổi chiều"}, {"i": 3, "c": "none", "p": 0.9}, {"i": 4, "c": "nghi", "p": 0.7, "d": [4], "n": "Nghỉ đầu tuần sau"}]
 
 ---
 Lưu ý:
-- CHỈ trả về YAML thuần, KHÔNG có markdown, KHÔNG có ```yaml
-- dates là danh sách ngày theo format YYYY-MM-DD
-- Nếu tin nhắn đề cập ngày d/m, convert sang YYYY-MM-DD dựa vào năm của ngày gửi
-- Nếu không đề cập ngày cụ thể, dùng ngày gửi tin nhắn
-- info ngắn gọn, tối đa 50 ký tự
-- Category không có tin nhắn thì để mảng rỗng []
-- Bỏ qua tin nhắn không thuộc loại nào"""
+- CHỈ trả về JSON, KHÔNG có markdown
+- d, r là số ngày so với d0 (0 = d0, 1 = ngày sau d0, -1 = ngày trước d0)
+- r: các ngày tính sẵn từ nội dung, cách nhau bởi ";"; hậu tố s = buổi sáng, c = buổi chiều, n = nửa buổi;
+  r trống (hoặc chỉ có hậu tố) = tin nhắn không đề cập ngày, tức là ngày gửi d; r = "?" = chưa tính được
+- Bỏ "d" trong output nếu ngày xin phép đúng như r (hoặc là ngày gửi khi r trống)
+- Chỉ ghi "d" khi r = "?" hoặc r sai so với nội dung
+- n ngắn gọn, tối đa 50 ký tự
+- p là độ tin cậy từ 0 đến 1; tin nhắn mơ hồ (không rõ loại hoặc không rõ ngày) thì p thấp
+- Tin nhắn không thuộc loại nào: {"i": i, "c": "none", "p": độ tin cậy}
+- Mỗi i trong input phải xuất hiện trong ít nhất một phần tử của output"""
+
+    def __init__(self, cache_path=None, model=None, context_cache=None, repair_rounds=None,
+                 cascade_model=None, cascade_confidence=None, cascade_max_escalation=None,
+                 hedge=None, provider=None, mode=None, batch_provider=None, max_retries=1, wait=0):
+        mode = mode or config.LLM_MODE
+        # Bounded in-flight batches and a per-batch timeout. Only the dispatcher retries
+        # (config.LLM_MAX_ATTEMPTS per call); node retries on top would multiply the calls,
+        # so max_retries stays 1 unless a caller opts in.
+        # Batch jobs need every request pending at once and may take hours.
+        # A batch that still fails comes back as an ItemError (see post_async).
+        super().__init__(
+            max_retries=max_retries,
+            wait=wait,
+            max_concurrency=None if mode == "batch" else config.LABEL_MAX_PARALLEL_BATCHES or None,
+            timeout=None if mode == "batch" else config.LABEL_BATCH_TIMEOUT or None,
+            backoff=2,
+            max_wait=config.LLM_BACKOFF_MAX,
+            return_errors=True,
+        )
+        self.repair_rounds = config.LLM_REPAIR_ROUNDS if repair_rounds is None else repair_rounds
+        self.cache_path = cache_path or config.LABEL_CACHE_PATH
+        self.model = model or config.GEMINI_MODEL
+
+        self.cascade_model = config.LLM_CASCADE_MODEL if cascade_model is None else cascade_model
+        self.cascade_confidence = (config.LLM_CASCADE_CONFIDENCE
+                                   if cascade_confidence is None else cascade_confidence)
+        self.cascade_max_escalation = (config.LLM_CASCADE_MAX_ESCALATION
+                                       if cascade_max_escalation is None else cascade_max_escalation)
+        self.cascade_stats = None
+        if self.cascade_model:
+            self.cascade_stats = CascadeStats(self.cascade_model, self.model,
+                                              self.cascade_confidence, self.cascade_max_escalation)
+            # Cascade labels depend on both models and the escalation policy
+            self.prompt_version = prompt_version(self.SYSTEM_PROMPT, self.model, self.cascade_model,
+                                                 str(self.cascade_confidence), str(self.cascade_max_escalation))
+        else:
+            self.prompt_version = prompt_version(self.SYSTEM_PROMPT, self.model)
+        self._cache = None
+        self.date_mismatch_count = 0
+
+        self.mode = mode
+        self.batch_jobs = None
+        if self.mode == "batch":
+            # Jobs send the whole prompt; context caches and hedging do not apply
+            self.batch_jobs = self._create_batch_jobs(batch_provider or config.LLM_BATCH_JOB_PROVIDER, provider)
+            self.prompt_cache, call = None, self.batch_jobs
+            hedge = "off"
+            # Every pending request joins the job; job latency says nothing about load
+            limiter = AdaptiveConcurrencyLimiter(limit=config.LLM_BATCH_JOB_MAX_REQUESTS,
+                                                 max_limit=config.LLM_BATCH_JOB_MAX_REQUESTS,
+                                                 latency_spike=float("inf"))
+        else:
+            self.prompt_cache, call = self._create_prompt_cache(
+                context_cache or config.LLM_CONTEXT_CACHE, provider or call_llm_async
+            )
+            limiter = AdaptiveConcurrencyLimiter(limit=config.LLM_CONCURRENCY, max_limit=config.LLM_MAX_CONCURRENCY)
+
+        self.router = None
+        if (hedge or config.LLM_HEDGE) == "on":
+            self.router = HedgedRouter(
+                call,
+                Route(call, config.LLM_HEDGE_MODEL or None),
+                hedge_percentile=config.LLM_HEDGE_PERCENTILE,
+                max_hedge_ratio=config.LLM_HEDGE_MAX_RATIO,
+                expand=lambda cached_content, prompt: f"{self.SYSTEM_PROMPT}\n\n{prompt}",
+                limiter=limiter,
+            )
+            call = self.router
+
+        # Every batch goes through one dispatcher, which caps in-flight calls
+        self.dispatcher = LLMDispatcher(
+            call,
+            limiter,
+            max_attempts=config.LLM_MAX_ATTEMPTS,
+            max_delay=config.LLM_BACKOFF_MAX,
+        )
+
+    def _create_prompt_cache(self, mode, call):
+        """Return (PromptCache or None, LLM call) for a context cache mode."""
+        ttl_seconds = config.LLM_CONTEXT_CACHE_TTL
+        if mode == "off":
+            return None, call
+        if mode == "local":
+            local = LocalContextCache()
+            return PromptCache(local.create, local.delete, ttl_seconds), local.wrap(call)
+        return PromptCache(create_context_cache, delete_context_cache, ttl_seconds), call
+
+    def _create_batch_jobs(self, provider_name, call):
+        """Return the BatchJobClient for a batch job provider."""
+        if provider_name == "local":
+            provider = LocalBatchProvider(call or call_llm_async)
+        else:
+            provider = GeminiBatchProvider()
+        return BatchJobClient(provider, config.LLM_BATCH_JOB_DIR,
+                              poll_interval=config.LLM_BATCH_JOB_POLL_INTERVAL)
+
+    def _get_cache(self):
+        """Open the label cache on first use (batches share one connection)."""
+        if self._cache is None:
+            self._cache = LabelCache(self.cache_path)
+        return self._cache
 
     async def prep_async(self, shared):
-        """Get list of weekly data from shared store."""
-        return shared.get("weekly_messages", [])
+        """Get list of message batches (or weekly data) from shared store."""
+        if shared.get("message_batches") is not None:
+            return shared["message_batches"]
+        return [part for week in shared.get("weekly_messages") or [] for part in self.split_by_group(week)]
 
-    async def exec_async(self, week_data):
-        """Classify messages for a single week using LLM.
+    def split_by_group(self, batch):
+        """Split a batch into one batch per group, each with its group_id set.
+
+        Message ids are only unique within a group, and labels are matched to
+        messages by message_id, so a batch must not mix groups.
+        """
+        messages = batch.get('messages') or []
+        by_group = {}
+        for msg in messages:
+            by_group.setdefault(msg.group_id, []).append(msg)
+        if len(by_group) <= 1:
+            return [dict(batch, group_id=messages[0].group_id) if messages else batch]
+        return [dict(batch, group_id=group_id, messages=group_messages)
+                for group_id, group_messages in by_group.items()]
+
+    async def exec_async(self, batch):
+        """Classify the messages of a single batch using LLM.
 
         Args:
-            week_data: Dict with keys: week_key, week_range, csv_string
+            batch: Dict with keys: batch_key, batch_range, group_id, messages
+                (a week dict with week_key, week_range is accepted too); all
+                messages belong to group_id (see split_by_group)
 
         Returns:
-            Dict with week info and labeled results
+            Dict with batch info and labeled results
         """
-        csv_string = week_data.get('csv_string', '')
-        if not csv_string:
+        batch_key = batch.get('batch_key', batch.get('week_key'))
+        batch_range = batch.get('batch_range', batch.get('week_range'))
+        messages = batch.get('messages') or []
+        if not messages:
             return {
-                'week_key': week_data.get('week_key'),
-                'week_range': week_data.get('week_range'),
+                'batch_key': batch_key,
+                'batch_range': batch_range,
+                'group_id': batch.get('group_id'),
                 'labels': self._empty_result()
             }
 
-        prompt = f"""{self.SYSTEM_PROMPT}
+        cache = self._get_cache()
+        cached = cache.get_many(messages, self.prompt_version)
+        uncached = [msg for msg in messages if msg.message_id not in cached]
 
-Input (CSV):
-{csv_string}
+        labels = self._empty_result()
+        unresolved = []
+        if uncached:
+            llm_labels, resolved, unresolved = await self._label_uncached(uncached)
+            for category in CATEGORIES:
+                labels[category].extend(llm_labels[category])
+            cache.put_many(resolved, self._labels_by_message(llm_labels), self.prompt_version)
 
-Output (YAML):"""
-        print(prompt)  # Debug: print the prompt being sent
-        response_text = await call_llm_async(prompt)
-        response_text = response_text.strip()
+        self._merge_cached(labels, cached, messages)
 
-        # Clean up response - remove markdown code blocks if present
-        response_text = self._clean_llm_response(response_text)
+        print(f"Batch {batch_key} ({batch_range}): {len(cached)} cached, {len(uncached)} sent to LLM"
+              + (f", {len(unresolved)} unresolved" if unresolved else ""))
+        return {
+            'batch_key': batch_key,
+            'batch_range': batch_range,
+            'group_id': batch.get('group_id'),
+            'labels': labels,
+            'unresolved': [self._unresolved_item(msg) for msg in unresolved]
+        }
+
+    async def exec_fallback_async(self, batch, exc):
+        """Keep the batch's cached labels and report the rest as unresolved instead of failing the run."""
+        print(f"Batch {batch.get('batch_key', batch.get('week_key'))} failed: {type(exc).__name__}: {exc}")
+        messages = batch.get('messages') or []
+        cached = self._get_cache().get_many(messages, self.prompt_version)
+
+        labels = self._empty_result()
+        self._merge_cached(labels, cached, messages)
+        return {
+            'batch_key': batch.get('batch_key', batch.get('week_key')),
+            'batch_range': batch.get('batch_range', batch.get('week_range')),
+            'group_id': batch.get('group_id'),
+            'labels': labels,
+            'unresolved': [self._unresolved_item(msg) for msg in messages if msg.message_id not in cached]
+        }
 
-        result = yaml.safe_load(response_text)
-        assert isinstance(result, dict), f"Expected dict, got {type(result)}: {response_text[:200]}"
+    def checkpoint_item(self, batch, result):
+        """Only checkpoint fully labeled batches, so a resumed run retries the rest."""
+        return not result.get('unresolved')
+
+    def _merge_cached(self, labels, cached, messages):
+        """Merge cached labels into `labels`, then keep each category in message order."""
+        by_id = {msg.message_id: msg for msg in messages}
+        for message_id, message_labels in cached.items():
+            for label in message_labels:
+                labels[label['category']].append({
+                    'message_id': message_id,
+                    'name': by_id[message_id].name,
+                    'dates': label['dates'],
+                    'info': label['info'],
+                })
+        position = {msg.message_id: i for i, msg in enumerate(messages)}
+        for category in CATEGORIES:
+            labels[category].sort(key=lambda item: position.get(self._message_id(item), len(position)))
+
+    def _item_error_result(self, error):
+        """Batch result for a batch that failed or timed out even after exec_fallback_async."""
+        batch = error.item
+        print(f"Batch {batch.get('batch_key', batch.get('week_key'))} failed: {type(error.exc).__name__}: {error.exc}")
+        return {
+            'batch_key': batch.get('batch_key', batch.get('week_key')),
+            'batch_range': batch.get('batch_range', batch.get('week_range')),
+            'group_id': batch.get('group_id'),
+            'labels': self._empty_result(),
+            'unresolved': [self._unresolved_item(msg) for msg in batch.get('messages') or []]
+        }
 
+    def _unresolved_item(self, msg):
+        """Describe a message the LLM could not label."""
         return {
-            'week_key': week_data.get('week_key'),
-            'week_range': week_data.get('week_range'),
-            'labels': self._normalize_result(result)
+            'message_id': msg.message_id,
+            'group_id': msg.group_id,
+            'name': msg.name,
+            'date': msg.date_str,
+            'message': msg.text,
         }
 
-    def _clean_llm_response(self, text):
-        """Clean LLM response to extract valid YAML."""
-        import re
-        text = text.strip()
+    async def _label_uncached(self, messages):
+        """Label messages with the main model, or through the cascade when configured.
+
+        Returns:
+            (labels, resolved messages, unresolved messages)
+        """
+        if not self.cascade_model:
+            labels, resolved, unresolved, _ = await self._label_with_repair(messages, self.repair_rounds)
+            return labels, resolved, unresolved
+
+        labels, resolved, unresolved, confidence = await self._label_with_repair(
+            messages, self.repair_rounds, model=self.cascade_model
+        )
+        escalated, capped = select_escalations(
+            messages, resolved, confidence, self.cascade_confidence, self.cascade_max_escalation
+        )
+        relabeled = set()
+        if escalated:
+            strong_labels, strong_resolved, _, _ = await self._label_with_repair(escalated, self.repair_rounds)
+            relabeled = {msg.message_id for msg in strong_resolved}
+
+            # Messages the main model resolved take its labels; the rest keep the cheap ones
+            for category in CATEGORIES:
+                labels[category] = [
+                    item for item in labels[category] if self._message_id(item) not in relabeled
+                ] + strong_labels[category]
+            resolved = [msg for msg in resolved if msg.message_id not in relabeled] + strong_resolved
+            unresolved = [msg for msg in unresolved if msg.message_id not in relabeled]
 
-        # Remove markdown code blocks (```yaml, ```yml, ``` etc.)
-        match = re.search(r'^```(?:yaml|yml)?\s*\n(.*?)```\s*$', text, re.DOTALL | re.IGNORECASE)
-        if match:
-            return match.group(1).strip()
+        self.cascade_stats.record(len(messages), len(escalated), capped, len(relabeled))
+        return labels, resolved, unresolved
 
-        # Fallback: strip ``` from start and end
-        if text.startswith('```'):
-            lines = text.split('\n')
-            if lines[0].strip().startswith('```'):
-                lines = lines[1:]
-            if lines and lines[-1].strip() == '```':
-                lines = lines[:-1]
-            return '\n'.join(lines).strip()
+    async def _label_with_repair(self, messages, rounds, model=None):
+        """Label messages, re-asking only for the ones a response missed or got wrong.
 
-        return text
+        Returns:
+            (labels, resolved messages, unresolved messages, {message_id: confidence} of resolved)
+        """
+        try:
+            labels, accounted, confidence = await self._label_with_llm(messages, model)
+        except ValueError as e:
+            # Unparseable (e.g. truncated) response: retry in smaller requests
+            if rounds == 0:
+                print(f"Giving up on {len(messages)} message(s): {e}")
+                return self._empty_result(), [], messages, {}
+            print(f"Unparseable response for {len(messages)} message(s), retrying in smaller requests")
+            half = (len(messages) + 1) // 2
+            parts = [messages[:half], messages[half:]] if len(messages) > 1 else [messages]
+            labels, resolved, unresolved, confidence = self._empty_result(), [], [], {}
+            for part_labels, part_resolved, part_unresolved, part_confidence in await asyncio.gather(
+                *(self._label_with_repair(part, rounds - 1, model) for part in parts)
+            ):
+                for category in CATEGORIES:
+                    labels[category].extend(part_labels[category])
+                resolved.extend(part_resolved)
+                unresolved.extend(part_unresolved)
+                confidence.update(part_confidence)
+            return labels, resolved, unresolved, confidence
+
+        resolved = [msg for msg in messages if msg.message_id in accounted]
+        missing = [msg for msg in messages if msg.message_id not in accounted]
+        if not missing:
+            return labels, resolved, [], confidence
+        if rounds == 0:
+            return labels, resolved, missing, confidence
+
+        print(f"Response missed or mislabeled {len(missing)} message(s), asking again for those only")
+        repair_labels, repair_resolved, unresolved, repair_confidence = await self._label_with_repair(
+            missing, rounds - 1, model
+        )
+        for category in CATEGORIES:
+            labels[category].extend(repair_labels[category])
+        confidence.update(repair_confidence)
+        return labels, resolved + repair_resolved, unresolved, confidence
 
-    def _normalize_result(self, result):
-        """Ensure result has all required categories."""
-        normalized = self._empty_result()
+    async def _label_with_llm(self, messages, model=None):
+        """Classify messages with one LLM call.
+
+        Args:
+            messages: Messages to label
+            model: Model to call (default: self.model)
 
-        if not isinstance(result, dict):
-            return normalized
+        Returns:
+            (labels of valid messages, ids of messages the response accounted for,
+            {message_id: confidence} of those messages)
 
-        for category in ['nghi', 'tre', 'nua_buoi', 'remote']:
-            if category in result and isinstance(result[category], list):
-                normalized[category] = result[category]
+        Raises:
+            ValueError: The response could not be parsed
+        """
+        # Compact rows (aliases, day offsets) are only built here, for the prompt
+        codec = PromptCodec(messages)
+        request = f"""Input (CSV):
+{codec.encode()}
+Output (JSON):"""
+
+        model = model or self.model
+        response_text = None
+        cache_name = await self.prompt_cache.get(self.SYSTEM_PROMPT, model) if self.prompt_cache else None
+        if cache_name:
+            try:
+                response_text = await self.dispatcher(
+                    request, model=model, cached_content=cache_name, response_schema=RESPONSE_SCHEMA
+                )
+            except Exception as e:
+                if not is_cache_error(e):
+                    raise
+                self.prompt_cache.invalidate(cache_name)
+
+        if response_text is None:
+            prompt = f"""{self.SYSTEM_PROMPT}
+
+{request}"""
+            response_text = await self.dispatcher(prompt, model=model, response_schema=RESPONSE_SCHEMA)
+
+        records = parse_label_response(response_text, codec)
+        self.date_mismatch_count += codec.date_mismatch_count
+
+        # A message is accounted for when it has only valid labels, or is listed
+        # in `none`; labels for ids that were not asked about are dropped
+        names = {msg.message_id: msg.name for msg in messages}
+        labeled, invalid = set(), set()
+        for category in CATEGORIES:
+            for record in records[category]:
+                if record.message_id in names:
+                    (labeled if record.dates else invalid).add(record.message_id)
+        none = set(records['none']) & set(names)
+        accounted = (labeled | none) - invalid
+
+        # Labeled and `none` at once is inconsistent: lowest confidence
+        confidence = {
+            message_id: 0.0 if message_id in labeled and message_id in none
+            else records['confidence'].get(message_id, 0.0)
+            for message_id in accounted
+        }
 
-        return normalized
+        labels = {
+            category: [
+                record.to_dict(names[record.message_id])
+                for record in records[category] if record.message_id in accounted
+            ]
+            for category in CATEGORIES
+        }
+        return labels, accounted, confidence
+
+    def _message_id(self, item):
+        """message_id of a labeled item as int (None if missing or invalid)."""
+        try:
+            return int(item.get('message_id'))
+        except (AttributeError, TypeError, ValueError):
+            return None
+
+    def _labels_by_message(self, labels):
+        """Regroup category lists into {message_id: [{category, dates, info}]} for the cache."""
+        by_message = {}
+        for category in CATEGORIES:
+            for item in labels[category]:
+                message_id = self._message_id(item)
+                if message_id is None:
+                    continue
+                by_message.setdefault(message_id, []).append({
+                    'category': category,
+                    'dates': item.get('dates') or [],
+                    'info': item.get('info'),
+                })
+        return by_message
 
     def _empty_result(self):
         """Return empty result structure."""
@@ -190,39 +531,71 @@ Output (YAML):"""
         }
 
     async def post_async(self, shared, prep_res, exec_res):
-        """Merge results from all weeks and store in shared store."""
-        # Merge all weekly results
+        """Merge results from all batches, regroup them by week and store in shared store."""
+        weeks = shared.get("weekly_messages") or []
+        weekly_labels = {week['week_key']: self._empty_result() for week in weeks}
+        results = [self._item_error_result(r) if isinstance(r, ItemError) else r for r in (exec_res or []) if r]
+
+        # Message ids are unique per group; every batch result has its group_id
+        week_of = {}
+        position = {}
+        for week in weeks:
+            for msg in week['messages']:
+                key = (msg.group_id, msg.message_id)
+                week_of.setdefault(key, week['week_key'])
+                position.setdefault(key, len(position))
+
+        # Merge rule labels and all batch results in message order, and regroup them by week
         merged = self._empty_result()
-
-        weekly_results = []
-        for week_result in (exec_res or []):
-            if not week_result:
-                continue
-
-            # Store per-week result
-            weekly_results.append({
-                'week_key': week_result.get('week_key'),
-                'week_range': week_result.get('week_range'),
-                'labels': week_result.get('labels', self._empty_result())
-            })
-
-            # Merge into total
-            labels = week_result.get('labels', {})
-            for category in ['nghi', 'tre', 'nua_buoi', 'remote']:
-                if category in labels:
-                    merged[category].extend(labels[category])
-
-        # Sort weekly results by week_key
-        weekly_results.sort(key=lambda x: x.get('week_key', ''))
+        items = []
+        for result in (shared.get("rule_labels") or []) + results:
+            labels = result.get('labels', {})
+            for category in CATEGORIES:
+                for item in labels.get(category, []):
+                    key = (result.get('group_id'), self._message_id(item))
+                    items.append((position.get(key, len(position)), category, key, item))
+
+        items.sort(key=lambda entry: entry[0])
+        for _, category, key, item in items:
+            merged[category].append(item)
+            if key in week_of:
+                weekly_labels[week_of[key]][category].append(item)
+
+        weekly_results = [
+            {
+                'week_key': week['week_key'],
+                'week_range': week['week_range'],
+                'labels': weekly_labels[week['week_key']]
+            }
+            for week in weeks
+        ]
+
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
+        if self.dispatcher.call_count:
+            print(self.dispatcher.summary())
+        if self.date_mismatch_count:
+            print(f"Dates: {self.date_mismatch_count} LLM answer(s) contradicted the locally resolved dates")
+        if self.batch_jobs and self.batch_jobs.job_count:
+            print(self.batch_jobs.summary())
+        if self.router and self.router.call_count:
+            print(self.router.summary())
+        if self.cascade_stats and self.cascade_stats.cheap_count:
+            print(self.cascade_stats.summary())
+        if self.prompt_cache:
+            if self.prompt_cache.created_count:
+                print(self.prompt_cache.summary())
+            await self.prompt_cache.close()
+
+        # Messages no response could label are reported, not fatal
+        unresolved = [item for result in results for item in result.get('unresolved', [])]
+        if unresolved:
+            print(f"Warning: {len(unresolved)} message(s) could not be labeled (see shared['unresolved_messages'])")
 
         # Store results
         shared["labeled_messages"] = merged
         shared["weekly_labeled_messages"] = weekly_results
-        shared["labeled_messages_yaml"] = yaml.dump(
-            merged,
-            allow_unicode=True,
-            default_flow_style=False,
-            sort_keys=False
-        )
+        shared["unresolved_messages"] = unresolved
 
         return "default"
\ No newline at end of file
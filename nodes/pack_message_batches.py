@@ -0,0 +1,117 @@
+"""
+Node to pack weekly messages into LLM labeling requests by token budget.
+
+Weeks are only used as an ordering: consecutive messages are packed into one
+request until the estimated input or output tokens would exceed the budget,
+so quiet weeks are merged and busy weeks are split. A request is cut at a day
+boundary (Vietnam time) when that keeps it at least half full and the moved
+day still fits with the next message, so messages of the same day stay in the
+same prompt. A single message over the budget gets a request of its own. Message ids are only unique within a Telegram
+group, so a request never mixes messages of different groups.
+
+Input: llm_messages from PreClassifyMessagesNode, or all weekly_messages
+    from GroupMessagesByWeekNode when there is no pre-classification stage
+Output: message_batches for LabelScheduleMessagesNode
+"""
+from pocketflow import Node
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src import config
+from src.date_resolver import local_day
+from src.token_budget import estimate_input_tokens, estimate_output_tokens
+
+
+class PackMessageBatchesNode(Node):
+    """Node to pack messages into token-budgeted labeling requests.
+
+    Args:
+        input_budget: Estimated prompt tokens per request (default: config.LLM_BATCH_INPUT_TOKENS)
+        output_budget: Estimated response tokens per request (default: config.LLM_BATCH_OUTPUT_TOKENS)
+        reserved_input_tokens: Prompt tokens already used by the fixed system prompt
+    """
+
+    def __init__(self, input_budget=None, output_budget=None, reserved_input_tokens=0, max_retries=1, wait=0):
+        super().__init__(max_retries=max_retries, wait=wait)
+        self.input_budget = (input_budget or config.LLM_BATCH_INPUT_TOKENS) - reserved_input_tokens
+        self.output_budget = output_budget or config.LLM_BATCH_OUTPUT_TOKENS
+
+    def prep(self, shared):
+        """Get the messages to label (chronological) from shared store."""
+        if shared.get("llm_messages") is not None:
+            return shared["llm_messages"]
+        return [msg for week in shared.get("weekly_messages") or [] for msg in week['messages']]
+
+    def exec(self, messages):
+        """Pack the messages into batches."""
+        batches = self._pack(messages)
+        print(f"Packed {len(messages)} messages into {len(batches)} requests")
+        return batches
+
+    def _pack(self, messages):
+        """Pack chronologically ordered messages into batch dicts, per group."""
+        by_group = {}
+        for msg in messages:
+            by_group.setdefault(msg.group_id, []).append(msg)
+
+        packed = []
+        for group_messages in by_group.values():
+            packed.extend(self._pack_group(group_messages))
+
+        return [self._make_batch(i, batch) for i, batch in enumerate(packed)]
+
+    def _pack_group(self, messages):
+        """Pack chronologically ordered messages of one group into lists of messages."""
+        packed = []
+        current = []
+        input_tokens = output_tokens = 0
+
+        for msg in messages:
+            msg_input, msg_output = estimate_input_tokens(msg), estimate_output_tokens(msg)
+            if current and not self._fits(input_tokens + msg_input, output_tokens + msg_output):
+                carry = self._split_at_day(current)
+                carry_input = sum(estimate_input_tokens(m) for m in carry)
+                carry_output = sum(estimate_output_tokens(m) for m in carry)
+                # Only move the last day if it fits with the incoming message
+                if not self._fits(carry_input + msg_input, carry_output + msg_output):
+                    carry, carry_input, carry_output = [], 0, 0
+                packed.append(current[:len(current) - len(carry)])
+                current, input_tokens, output_tokens = carry, carry_input, carry_output
+
+            current.append(msg)
+            input_tokens += msg_input
+            output_tokens += msg_output
+
+        if current:
+            packed.append(current)
+
+        return packed
+
+    def _fits(self, input_tokens, output_tokens):
+        return input_tokens <= self.input_budget and output_tokens <= self.output_budget
+
+    def _split_at_day(self, batch):
+        """Return the trailing messages of the last day, if moving them keeps the batch half full."""
+        last_day = local_day(batch[-1].date)
+        first = len(batch)
+        while first > 0 and local_day(batch[first - 1].date) == last_day:
+            first -= 1
+
+        return batch[first:] if first >= len(batch) // 2 and first > 0 else []
+
+    def _make_batch(self, index, messages):
+        """Build a batch dict with a key and the date range it covers."""
+        first_day = messages[0].date.strftime('%Y-%m-%d')
+        last_day = messages[-1].date.strftime('%Y-%m-%d')
+        return {
+            'batch_key': f"{first_day}#{index + 1:03d}",
+            'batch_range': f"{first_day} -> {last_day}",
+            'group_id': messages[0].group_id,
+            'messages': messages
+        }
+
+    def post(self, shared, prep_res, exec_res):
+        """Store message batches in shared store."""
+        shared["message_batches"] = exec_res
+        return "default"
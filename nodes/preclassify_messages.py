@@ -0,0 +1,76 @@
+"""
+Node to pre-classify formulaic schedule messages with local rules.
+
+High-confidence requests are labeled without the LLM, obvious chit-chat is
+dropped, and only the ambiguous rest is passed on to PackMessageBatchesNode
+and LabelScheduleMessagesNode (see src/rule_classifier.py for the rules).
+
+Input: weekly_messages from GroupMessagesByWeekNode
+Output: rule_labels (merged by LabelScheduleMessagesNode), llm_messages and
+    preclassify_stats
+"""
+from pocketflow import Node
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.label_schema import CATEGORIES
+from src.rule_classifier import classify, LABEL, SKIP
+
+
+class PreClassifyMessagesNode(Node):
+    """Node to label or drop messages locally before the LLM stage.
+
+    Input: List of weekly data dicts with messages (ScheduleMessage)
+    Output: Rule labels per group (same shape as LabelScheduleMessagesNode
+        batch results) and the messages left for the LLM
+    """
+
+    def prep(self, shared):
+        """Get all messages from the weekly data in shared store."""
+        return [msg for week in shared.get("weekly_messages") or [] for msg in week['messages']]
+
+    def exec(self, messages):
+        """Classify every message with the rules."""
+        rule_labels, llm_messages, stats = self._classify(messages)
+        self._print_stats(stats)
+        return {'rule_labels': rule_labels, 'llm_messages': llm_messages, 'stats': stats}
+
+    def _classify(self, messages):
+        """Return (rule label results per group, messages for the LLM, stats)."""
+        by_group = {}
+        llm_messages = []
+        stats = {'total': len(messages), 'labeled': 0, 'skipped': 0, 'llm': 0}
+
+        for msg in messages:
+            result = classify(msg)
+            if result.decision == LABEL:
+                stats['labeled'] += 1
+                labels = by_group.setdefault(msg.group_id, {c: [] for c in CATEGORIES})
+                labels[result.category].append(result.label)
+            elif result.decision == SKIP:
+                stats['skipped'] += 1
+            else:
+                stats['llm'] += 1
+                llm_messages.append(msg)
+
+        rule_labels = [
+            {'batch_key': f"rules:{group_id}", 'batch_range': None, 'group_id': group_id, 'labels': labels}
+            for group_id, labels in by_group.items()
+        ]
+        return rule_labels, llm_messages, stats
+
+    def _print_stats(self, stats):
+        """Print how many messages the rules resolved without the LLM."""
+        total = stats['total'] or 1
+        resolved = stats['labeled'] + stats['skipped']
+        print(f"Rules: {stats['total']} messages -> {stats['labeled']} labeled, "
+              f"{stats['skipped']} skipped, {stats['llm']} left for LLM "
+              f"(hit rate {resolved / total:.0%})")
+
+    def post(self, shared, prep_res, exec_res):
+        """Store rule labels, remaining messages and hit-rate stats in shared store."""
+        shared["rule_labels"] = exec_res['rule_labels']
+        shared["llm_messages"] = exec_res['llm_messages']
+        shared["preclassify_stats"] = exec_res['stats']
+        return "default"
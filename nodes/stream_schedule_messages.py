@@ -0,0 +1,152 @@
+"""
+Node that streams fetched messages into weekly labeling.
+
+FetchTelegramMessagesNode reports messages through an asyncio.Queue while it
+is still paging. Messages are grouped by week as they arrive and a week is
+released to LabelScheduleMessagesNode as soon as every topic has been
+fetched past that week's Monday, so LLM calls overlap Telegram paging.
+With a PreClassifyMessagesNode, rules label or drop messages of a released
+week first. With a PackMessageBatchesNode, a released week that exceeds the
+token budget is split into several requests (quiet weeks are not merged,
+since that would hold them back until later weeks finish).
+
+Input: report window (same as FetchTelegramMessagesNode)
+Output: the same shared keys as Fetch -> Group by Week -> Label
+"""
+from pocketflow import AsyncNode
+import asyncio
+from datetime import datetime, time, timezone
+
+
+class StreamScheduleMessagesNode(AsyncNode):
+    """Node to run fetch, weekly grouping and labeling as one streaming stage.
+
+    Args:
+        fetch_node: FetchTelegramMessagesNode used to fetch messages
+        group_node: GroupMessagesByWeekNode used for week boundaries
+        label_node: LabelScheduleMessagesNode used to label released weeks
+        pack_node: Optional PackMessageBatchesNode used to split large weeks
+        preclassify_node: Optional PreClassifyMessagesNode run on released weeks
+    """
+
+    def __init__(self, fetch_node, group_node, label_node, pack_node=None, preclassify_node=None,
+                 max_retries=1, wait=0):
+        super().__init__(max_retries=max_retries, wait=wait)
+        self.fetch_node = fetch_node
+        self.group_node = group_node
+        self.label_node = label_node
+        self.pack_node = pack_node
+        self.preclassify_node = preclassify_node
+
+    async def prep_async(self, shared):
+        """Get the report window from shared store."""
+        return await self.fetch_node.prep_async(shared)
+
+    async def exec_async(self, params):
+        """Fetch messages and label each week as soon as it is complete."""
+        queue = asyncio.Queue()
+
+        async def on_progress(topic_key, messages, covered_since):
+            await queue.put((topic_key, messages, covered_since))
+
+        async def fetch():
+            try:
+                return await self.fetch_node._fetch_messages_async(params, on_progress)
+            finally:
+                await queue.put(None)
+
+        fetch_task = asyncio.create_task(fetch())
+        cursors = {}   # (group_id, topic_id) -> every message since this time has arrived
+        pending = {}   # Monday (date) -> messages of a week not released yet
+        released = []  # week_data of released weeks
+        tasks = []     # label task of each released batch
+        rule_labels = []
+        stats = {'total': 0, 'labeled': 0, 'skipped': 0, 'llm': 0}
+        all_messages = []
+
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+
+                topic_key, messages, covered_since = event
+                cursors[topic_key] = covered_since
+                for msg in messages:
+                    all_messages.append(msg)
+                    pending.setdefault(self.group_node._get_week_start(msg.date), []).append(msg)
+
+                # A week is complete once every topic has been fetched past its Monday
+                for week_data in self._release_weeks(pending, max(cursors.values())):
+                    released.append(week_data)
+                    tasks.extend(self._start_labeling(week_data, rule_labels, stats))
+
+            # Propagate fetch errors, then release whatever is left
+            await fetch_task
+            for week_data in self._release_weeks(pending, None):
+                released.append(week_data)
+                tasks.extend(self._start_labeling(week_data, rule_labels, stats))
+
+            labels = await asyncio.gather(*tasks)
+        except BaseException:
+            fetch_task.cancel()
+            for task in tasks:
+                task.cancel()
+            raise
+
+        if self.preclassify_node:
+            self.preclassify_node._print_stats(stats)
+
+        all_messages.sort(key=lambda m: (m.date, m.message_id))
+        return {
+            'messages': all_messages,
+            'weekly_messages': sorted(released, key=lambda week: week['week_key']),
+            'batch_labels': [result[0] for result in labels],
+            'rule_labels': rule_labels,
+            'preclassify_stats': stats if self.preclassify_node else None,
+        }
+
+    def _release_weeks(self, pending, cursor):
+        """Pop and return every pending week that starts at or after `cursor` (all if None)."""
+        weeks = []
+        for week_start in sorted(pending):
+            week_start_time = datetime.combine(week_start, time(), tzinfo=timezone.utc)
+            if cursor is not None and week_start_time < cursor:
+                continue
+
+            week_messages = pending.pop(week_start)
+            week_messages.sort(key=lambda m: m.date)
+            week_key, week_range = self.group_node._get_week_info(week_start)
+            weeks.append({
+                'week_key': week_key,
+                'week_range': week_range,
+                'messages': week_messages
+            })
+        return weeks
+
+    def _start_labeling(self, week_data, rule_labels, stats):
+        """Start label tasks for the messages of a released week the rules could not resolve."""
+        messages = week_data['messages']
+        if self.preclassify_node:
+            week_rule_labels, messages, week_stats = self.preclassify_node._classify(messages)
+            rule_labels.extend(week_rule_labels)
+            for key in stats:
+                stats[key] += week_stats[key]
+            if not messages:
+                return []
+
+        if self.pack_node:
+            batches = self.pack_node._pack(messages)
+        else:
+            batches = self.label_node.split_by_group(dict(week_data, messages=messages))
+        return [asyncio.create_task(self.label_node._exec([batch])) for batch in batches]
+
+    async def post_async(self, shared, prep_res, exec_res):
+        """Store fetched, grouped and labeled messages like the sequential nodes do."""
+        shared["schedule_messages"] = exec_res['messages']
+        shared["weekly_messages"] = exec_res['weekly_messages']
+        if self.preclassify_node:
+            shared["rule_labels"] = exec_res['rule_labels']
+            shared["preclassify_stats"] = exec_res['preclassify_stats']
+        await self.label_node.post_async(shared, exec_res['weekly_messages'], exec_res['batch_labels'])
+        return "default"
@@ -1,7 +1,12 @@
-import asyncio, warnings, copy, time
+import asyncio, warnings, copy, time, random, contextvars, functools, pickle, os, json, re, shutil, hashlib
+from concurrent.futures import ProcessPoolExecutor
+from collections.abc import MutableMapping
 
 class BaseNode:
+    offload,deps,item_checkpoint=True,(),None
     def __init__(self): self.params,self.successors={},{}
+    def after(self,*nodes): self.deps=(*self.deps,*nodes); return self
+    def checkpoint_item(self,item,result): return True
     def set_params(self,params): self.params=params
     def next(self,node,action="default"):
         if action in self.successors: warnings.warn(f"Overwriting successor for action '{action}'")
@@ -34,7 +39,7 @@ class Node(BaseNode):
                 if self.wait>0: time.sleep(self.wait)
 
 class BatchNode(Node):
-    def _exec(self,items): return [super(BatchNode,self)._exec(i) for i in (items or [])]
+    def _exec(self,items): return [_cached(self,i,item,super(BatchNode,self)._exec) for i,item in enumerate(items or [])]
 
 class Flow(BaseNode):
     def __init__(self,start=None): super().__init__(); self.start_node=start
@@ -56,17 +61,160 @@ class BatchFlow(Flow):
         for bp in pr: self._orch(shared,{**self.params,**bp})
         return self.post(shared,pr,None)
 
+class PickleSerializer:
+    ext="pkl"
+    def dump(self,value,f): pickle.dump(value,f,protocol=pickle.HIGHEST_PROTOCOL)
+    def load(self,f): return pickle.load(f)
+
+class JsonSerializer:
+    ext="json"
+    def dump(self,value,f): f.write(json.dumps(value,ensure_ascii=False,default=str).encode("utf-8"))
+    def load(self,f): return json.loads(f.read().decode("utf-8"))
+
+def _atomic_write(path,dump):
+    tmp=f"{path}.tmp"
+    with open(tmp,"wb") as f: dump(f)
+    os.replace(tmp,path)
+
+class ItemCheckpoint:
+    def __init__(self,item_dir,serializer=None): self.item_dir,self.serializer=item_dir,serializer or PickleSerializer()
+    def key(self,index,item):
+        try: return hashlib.sha1(pickle.dumps(item,protocol=4)).hexdigest()
+        except Exception: return f"item-{index}"
+    def _path(self,key): return os.path.join(self.item_dir,f"{key}.{self.serializer.ext}")
+    def __contains__(self,key): return os.path.exists(self._path(key))
+    def __getitem__(self,key):
+        with open(self._path(key),"rb") as f: return self.serializer.load(f)
+    def __setitem__(self,key,value):
+        try: os.makedirs(self.item_dir,exist_ok=True); _atomic_write(self._path(key),lambda f: self.serializer.dump(value,f))
+        except Exception as e: warnings.warn(f"Item result not checkpointed: {type(e).__name__}: {e}")
+
+def _cached(node,i,item,run):
+    ckpt=node.item_checkpoint
+    if ckpt is None: return run(item)
+    k=ckpt.key(i,item)
+    if k in ckpt: return ckpt[k]
+    r=run(item)
+    if node.checkpoint_item(item,r): ckpt[k]=r
+    return r
+
+async def _acached(node,i,item,run):
+    ckpt=node.item_checkpoint
+    if ckpt is None: return await run(item)
+    k=ckpt.key(i,item)
+    if k in ckpt: return ckpt[k]
+    r=await run(item)
+    if node.checkpoint_item(item,r): ckpt[k]=r
+    return r
+
+class Checkpoint:
+    def __init__(self,run_dir,serializers=None,default=None): self.run_dir,self.serializers,self.default=run_dir,serializers or {},default or PickleSerializer()
+    @property
+    def run_id(self): return os.path.basename(os.path.normpath(self.run_dir))
+    def _state_path(self): return os.path.join(self.run_dir,"state.json")
+    def exists(self): return os.path.exists(self._state_path())
+    def load(self):
+        with open(self._state_path(),encoding="utf-8") as f: state=json.load(f)
+        shared={}
+        for key,name in state["keys"].items():
+            with open(os.path.join(self.run_dir,state["shared_dir"],name),"rb") as f: shared[key]=self.serializers.get(key,self.default).load(f)
+        return state["steps"],shared
+    def save(self,steps,shared):
+        shared_dir=f"shared-{len(steps):03d}"; path=os.path.join(self.run_dir,shared_dir); os.makedirs(path,exist_ok=True); keys={}
+        for i,(key,value) in enumerate(shared.items()):
+            if not isinstance(key,str): warnings.warn(f"Shared key {key!r} not checkpointed: keys must be str"); continue
+            ser=self.serializers.get(key,self.default); name=f"{i:03d}-{re.sub(r'[^A-Za-z0-9_.-]','_',key)[:60]}.{ser.ext}"
+            try: _atomic_write(os.path.join(path,name),lambda f: ser.dump(value,f)); keys[key]=name
+            except Exception as e: warnings.warn(f"Shared key '{key}' not checkpointed: {type(e).__name__}: {e}")
+        _atomic_write(self._state_path(),lambda f: f.write(json.dumps({"steps":steps,"shared_dir":shared_dir,"keys":keys},ensure_ascii=False,indent=1).encode("utf-8")))
+        for old in os.listdir(self.run_dir):
+            if old.startswith("shared-") and old!=shared_dir: shutil.rmtree(os.path.join(self.run_dir,old),ignore_errors=True)
+        if steps: shutil.rmtree(self.items(len(steps)-1).item_dir,ignore_errors=True)
+    def items(self,step): return ItemCheckpoint(os.path.join(self.run_dir,"items",f"{step:03d}"),self.default)
+
+class ItemError:
+    def __init__(self,index,item,exc): self.index,self.item,self.exc=index,item,exc
+    def __repr__(self): return f"ItemError({self.index}, {type(self.exc).__name__}: {self.exc})"
+
+def _retry_delay(wait,backoff,retry,max_wait=None):
+    if not backoff: return wait
+    return random.uniform(0,min(wait*backoff**retry,max_wait if max_wait is not None else float("inf")))
+
+async def _run_items(items,run,max_concurrency=None,return_errors=False):
+    sem=asyncio.Semaphore(max_concurrency) if max_concurrency else None
+    async def one(i,item):
+        try:
+            if sem: await sem.acquire()
+            try: return await run(item)
+            finally:
+                if sem: sem.release()
+        except Exception as e:
+            if not return_errors: raise
+            return ItemError(i,item,e)
+    res=await asyncio.gather(*(one(i,item) for i,item in enumerate(items)))
+    errs=[r for r in res if isinstance(r,ItemError)]
+    if errs: warnings.warn(f"{len(errs)} of {len(res)} batch items failed: {errs[:3]}")
+    return res
+
+_pool_target=None
+def _pool_init(target): global _pool_target; _pool_target=target
+def _pool_call(item):
+    try: return True,_pool_target(item)
+    except Exception as e:
+        try: pickle.dumps(e); return False,e
+        except Exception: return False,RuntimeError(f"{type(e).__name__}: {e}")
+
+def _run_pool(items,target,max_workers=None,chunksize=1,return_errors=False,mp_context=None):
+    items=list(items or [])
+    if not items: return []
+    with ProcessPoolExecutor(max_workers,mp_context=mp_context,initializer=_pool_init,initargs=(target,)) as pool: out=list(pool.map(_pool_call,items,chunksize=chunksize))
+    res=[]
+    for i,(item,(ok,r)) in enumerate(zip(items,out)):
+        if not ok and not return_errors: raise r
+        res.append(r if ok else ItemError(i,item,r))
+    errs=[r for r in res if isinstance(r,ItemError)]
+    if errs: warnings.warn(f"{len(errs)} of {len(res)} batch items failed: {errs[:3]}")
+    return res
+
+def _detached(node): n=copy.copy(node); n.successors,n.mp_context={},None; return n
+
+class ProcessPoolBatchNode(BatchNode):
+    def __init__(self,max_retries=1,wait=0,max_workers=None,chunksize=1,return_errors=False,mp_context=None):
+        super().__init__(max_retries,wait); self.max_workers,self.chunksize,self.return_errors,self.mp_context=max_workers,chunksize,return_errors,mp_context
+    def _exec(self,items):
+        items,ckpt=list(items or []),self.item_checkpoint
+        if ckpt is None: return _run_pool(items,functools.partial(Node._exec,_detached(self)),self.max_workers,self.chunksize,self.return_errors,self.mp_context)
+        keys=[ckpt.key(i,item) for i,item in enumerate(items)]; res=[ckpt[k] if k in ckpt else None for k in keys]; todo=[i for i,k in enumerate(keys) if k not in ckpt]
+        for i,r in zip(todo,_run_pool([items[i] for i in todo],functools.partial(Node._exec,_detached(self)),self.max_workers,self.chunksize,self.return_errors,self.mp_context)):
+            if isinstance(r,ItemError): r.index=i
+            elif self.checkpoint_item(items[i],r): ckpt[keys[i]]=r
+            res[i]=r
+        return res
+
+class ProcessPoolBatchFlow(BatchFlow):
+    def __init__(self,start=None,max_workers=None,chunksize=1,return_errors=False,mp_context=None):
+        super().__init__(start); self.max_workers,self.chunksize,self.return_errors,self.mp_context=max_workers,chunksize,return_errors,mp_context
+    def _orch_item(self,shared,params): shared=copy.deepcopy(shared); self._orch(shared,params); return shared
+    def _run(self,shared):
+        pr=self.prep(shared) or []
+        res=_run_pool([{**self.params,**bp} for bp in pr],functools.partial(_detached(self)._orch_item,shared),self.max_workers,self.chunksize,self.return_errors,self.mp_context)
+        self.item_errors=[r for r in res if isinstance(r,ItemError)]
+        return self.post(shared,pr,res)
+
 class AsyncNode(Node):
+    timeout,backoff,max_wait=None,None,None
     async def prep_async(self,shared): pass
     async def exec_async(self,prep_res): pass
     async def exec_fallback_async(self,prep_res,exc): raise exc
     async def post_async(self,shared,prep_res,exec_res): pass
     async def _exec(self,prep_res): 
         for self.cur_retry in range(self.max_retries):
-            try: return await self.exec_async(prep_res)
+            retry=self.cur_retry
+            try: return await (asyncio.wait_for(self.exec_async(prep_res),self.timeout) if self.timeout else self.exec_async(prep_res))
             except Exception as e:
-                if self.cur_retry==self.max_retries-1: return await self.exec_fallback_async(prep_res,e)
-                if self.wait>0: await asyncio.sleep(self.wait)
+                if retry==self.max_retries-1: return await self.exec_fallback_async(prep_res,e)
+                d=_retry_delay(self.wait,self.backoff,retry,self.max_wait)
+                if d>0: await asyncio.sleep(d)
     async def run_async(self,shared): 
         if self.successors: warnings.warn("Node won't run successors. Use AsyncFlow.")  
         return await self._run_async(shared)
@@ -74,17 +222,43 @@ class AsyncNode(Node):
     def _run(self,shared): raise RuntimeError("Use run_async.")
 
 class AsyncBatchNode(AsyncNode,BatchNode):
-    async def _exec(self,items): return [await super(AsyncBatchNode,self)._exec(i) for i in items]
+    async def _exec(self,items): return [await _acached(self,i,item,super(AsyncBatchNode,self)._exec) for i,item in enumerate(items or [])]
 
 class AsyncParallelBatchNode(AsyncNode,BatchNode):
-    async def _exec(self,items): return await asyncio.gather(*(super(AsyncParallelBatchNode,self)._exec(i) for i in items))
+    def __init__(self,max_retries=1,wait=0,max_concurrency=None,timeout=None,backoff=None,max_wait=None,return_errors=False):
+        super().__init__(max_retries,wait); self.max_concurrency,self.timeout,self.backoff,self.max_wait,self.return_errors=max_concurrency,timeout,backoff,max_wait,return_errors
+    async def _exec(self,items):
+        run=super(AsyncParallelBatchNode,self)._exec
+        res=await _run_items(list(enumerate(items or [])),lambda e: _acached(self,e[0],e[1],run),self.max_concurrency,self.return_errors)
+        for r in res:
+            if isinstance(r,ItemError): r.item=r.item[1]
+        return res
 
 class AsyncFlow(Flow,AsyncNode):
+    def __init__(self,start=None,executor=None,offload=True,checkpoint=None): super().__init__(start); self.executor,self.offload,self.checkpoint=executor,offload,checkpoint
+    async def _run_sync(self,node,shared):
+        if not (self.offload and node.offload): return node._run(shared)
+        return await asyncio.get_running_loop().run_in_executor(self.executor,functools.partial(contextvars.copy_context().run,node._run,shared))
     async def _orch_async(self,shared,params=None):
         curr,p,last_action =copy.copy(self.start_node),(params or {**self.params}),None
-        while curr: curr.set_params(p); last_action=await curr._run_async(shared) if isinstance(curr,AsyncNode) else curr._run(shared); curr=copy.copy(self.get_next_node(curr,last_action))
+        while curr: curr.set_params(p); last_action=await curr._run_async(shared) if isinstance(curr,AsyncNode) else await self._run_sync(curr,shared); curr=copy.copy(self.get_next_node(curr,last_action))
         return last_action
-    async def _run_async(self,shared): p=await self.prep_async(shared); o=await self._orch_async(shared); return await self.post_async(shared,p,o)
+    async def _orch_checkpointed(self,shared):
+        ckpt,loop,steps,last_action=self.checkpoint,asyncio.get_running_loop(),[],None
+        curr,p=copy.copy(self.start_node),{**self.params}
+        if ckpt.exists():
+            steps,saved=await loop.run_in_executor(self.executor,ckpt.load); shared.update(saved)
+            for name,last_action in steps:
+                if type(curr).__name__!=name: raise ValueError(f"Checkpoint of run '{ckpt.run_id}' does not match this flow: step {name}, flow has {type(curr).__name__}")
+                curr=copy.copy(self.get_next_node(curr,last_action))
+        while curr:
+            curr.set_params(p); curr.item_checkpoint=ckpt.items(len(steps))
+            last_action=await curr._run_async(shared) if isinstance(curr,AsyncNode) else await self._run_sync(curr,shared)
+            steps.append([type(curr).__name__,last_action])
+            await loop.run_in_executor(self.executor,ckpt.save,list(steps),dict(shared))
+            curr=copy.copy(self.get_next_node(curr,last_action))
+        return last_action
+    async def _run_async(self,shared): p=await self.prep_async(shared); o=await (self._orch_checkpointed(shared) if self.checkpoint else self._orch_async(shared)); return await self.post_async(shared,p,o)
     async def post_async(self,shared,prep_res,exec_res): return exec_res
 
 class AsyncBatchFlow(AsyncFlow,BatchFlow):
@@ -94,7 +268,64 @@ class AsyncBatchFlow(AsyncFlow,BatchFlow):
         return await self.post_async(shared,pr,None)
 
 class AsyncParallelBatchFlow(AsyncFlow,BatchFlow):
+    def __init__(self,start=None,max_concurrency=None,timeout=None,max_retries=1,wait=0,backoff=None,max_wait=None,return_errors=False,executor=None,offload=True):
+        super().__init__(start,executor,offload); self.max_concurrency,self.timeout,self.max_retries,self.wait,self.backoff,self.max_wait,self.return_errors=max_concurrency,timeout,max_retries,wait,backoff,max_wait,return_errors
+    async def _orch_item(self,shared,bp):
+        for retry in range(self.max_retries):
+            try: return await (asyncio.wait_for(self._orch_async(shared,bp),self.timeout) if self.timeout else self._orch_async(shared,bp))
+            except Exception:
+                if retry==self.max_retries-1: raise
+                d=_retry_delay(self.wait,self.backoff,retry,self.max_wait)
+                if d>0: await asyncio.sleep(d)
     async def _run_async(self,shared): 
         pr=await self.prep_async(shared) or []
-        await asyncio.gather(*(self._orch_async(shared,{**self.params,**bp}) for bp in pr))
-        return await self.post_async(shared,pr,None)
\ No newline at end of file
+        res=await _run_items([{**self.params,**bp} for bp in pr],lambda bp: self._orch_item(shared,bp),self.max_concurrency,self.return_errors)
+        self.item_errors=[r for r in res if isinstance(r,ItemError)]
+        return await self.post_async(shared,pr,res)
+
+class SharedConflictError(RuntimeError): pass
+
+class _SharedView(MutableMapping):
+    def __init__(self,base): self.base,self.writes,self.deleted=base,{},set()
+    def __getitem__(self,k):
+        if k in self.writes: return self.writes[k]
+        if k in self.deleted: raise KeyError(k)
+        return self.base[k]
+    def __setitem__(self,k,v): self.writes[k]=v; self.deleted.discard(k)
+    def __delitem__(self,k): self[k]; self.writes.pop(k,None); self.deleted.add(k)
+    def __iter__(self): return iter({**{k:None for k in self.base if k not in self.deleted},**self.writes})
+    def __len__(self): return sum(1 for _ in self)
+
+class AsyncDAGFlow(AsyncFlow):
+    def __init__(self,nodes=(),executor=None,offload=True): super().__init__(None,executor,offload); self.nodes=list(nodes)
+    def add(self,node,after=()): self.nodes.append(node.after(*after) if after else node); return node
+    def _order(self):
+        order,state=[],{}
+        def visit(n):
+            if state.get(n)==1: raise ValueError(f"Dependency cycle at {type(n).__name__}")
+            if state.get(n)==2: return
+            state[n]=1
+            for d in n.deps: visit(d)
+            state[n]=2; order.append(n)
+        for n in self.nodes: visit(n)
+        return order
+    async def _orch_async(self,shared,params=None):
+        order,p=self._order(),(params or {**self.params})
+        ancestors,writer,tasks,actions={},{},{},{}
+        for n in order: ancestors[n]=set().union(*({d,*ancestors[d]} for d in n.deps))
+        async def run(n):
+            if n.deps: await asyncio.gather(*(tasks[d] for d in n.deps))
+            curr=copy.copy(n); curr.set_params(p); view=_SharedView(shared)
+            actions[n]=await curr._run_async(view) if isinstance(curr,AsyncNode) else await self._run_sync(curr,view)
+            for k in (*view.writes,*view.deleted):
+                if k in writer and writer[k] not in ancestors[n]: raise SharedConflictError(f"{type(n).__name__} and {type(writer[k]).__name__} both write shared['{k}']")
+                writer[k]=n
+            for k in view.deleted: shared.pop(k,None)
+            shared.update(view.writes)
+        for n in order: tasks[n]=asyncio.ensure_future(run(n))
+        try: await asyncio.gather(*tasks.values())
+        finally:
+            for t in tasks.values(): t.cancel()
+            await asyncio.gather(*tasks.values(),return_exceptions=True)
+        return actions
+    async def post_async(self,shared,prep_res,exec_res): return None
@@ -0,0 +1,86 @@
+"""
+Measure fetch + weekly grouping offline against ReplayTelegramClient.
+
+Usage:
+    python scripts/benchmark_replay.py --messages 10000 100000 --latency 0.05 --flood-rate 0.01
+    python scripts/benchmark_replay.py --fixture data_raw/schedule_sample.json --month 2026-01
+"""
+import sys
+import os
+import asyncio
+import argparse
+import time
+from datetime import datetime, timezone
+
+# Add the project root directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pocketflow import AsyncFlow
+from src import config
+from nodes import FetchTelegramMessagesNode, GroupMessagesByWeekNode
+from src.replay_client import ReplayTelegramClient
+from src.telegram_sync import month_window, find_schedule_topics
+
+
+
+async def run_once(client, start, end):
+    """Run fetch >> group against a replay client and return (shared, seconds)."""
+    fetch_node = FetchTelegramMessagesNode(client_factory=lambda: client)
+    group_node = GroupMessagesByWeekNode()
+    fetch_node >> group_node
+
+    shared = {"report_start": start, "report_end": end}
+    started = time.perf_counter()
+    await AsyncFlow(start=fetch_node).run_async(shared)
+    return shared, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline fetch/grouping benchmark.")
+    parser.add_argument("--messages", type=int, nargs="*", default=[10_000], help="Synthetic message counts")
+    parser.add_argument("--fixture", help="Replay a recorded fixture instead of synthetic messages")
+    parser.add_argument("--month", help="Report month as YYYY-MM (default: current month)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per emulated request")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="Probability of FloodWait per request")
+    parser.add_argument("--flood-seconds", type=int, default=1, help="Seconds requested by FloodWaits")
+    parser.add_argument("--rate", type=float, help="Initial requests per second (default: FETCH_REQUESTS_PER_SECOND)")
+    parser.add_argument("--max-rate", type=float, help="Max requests per second (default: FETCH_MAX_REQUESTS_PER_SECOND)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.rate:
+        config.FETCH_REQUESTS_PER_SECOND = args.rate
+    if args.max_rate:
+        config.FETCH_MAX_REQUESTS_PER_SECOND = args.max_rate
+
+    report_month = datetime.strptime(args.month, "%Y-%m") if args.month else datetime.now(timezone.utc)
+    start, end = month_window(report_month.year, report_month.month)
+    options = {
+        'page_latency': args.latency,
+        'flood_wait_rate': args.flood_rate,
+        'flood_wait_seconds': args.flood_seconds,
+    }
+
+    if args.fixture:
+        clients = [(args.fixture, ReplayTelegramClient.from_fixture(
+            args.fixture, config.SAMPLE_GROUP_ID, config.SAMPLE_TOPIC_ID, seed=args.seed, **options))]
+    else:
+        dialog_info_path = os.path.join(os.path.dirname(__file__), '..', 'data_raw', 'dialog_info.json')
+        topics = find_schedule_topics(dialog_info_path)
+        clients = [
+            (f"synthetic:{count}", ReplayTelegramClient.synthetic(topics, count, start, end, seed=args.seed, **options))
+            for count in args.messages
+        ]
+
+    print(f"Window: {start.strftime('%Y-%m-%d')} -> {end.strftime('%Y-%m-%d')}")
+    for source, client in clients:
+        shared, seconds = asyncio.run(run_once(client, start, end))
+        print(f"\n=== {source} ===")
+        print(f"  Messages fetched: {len(shared['schedule_messages'])}")
+        print(f"  Weeks: {len(shared['weekly_messages'] or [])}")
+        print(f"  Requests: {client.request_count} (FloodWaits: {client.flood_wait_count})")
+        print(f"  Time: {seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
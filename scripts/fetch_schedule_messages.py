@@ -1,7 +1,6 @@
 import sys
 import os
 import asyncio
-import json
 import csv
 from datetime import datetime, timezone
 
@@ -10,104 +9,34 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from telethon import TelegramClient
 from src import config
+from src.message_store import MessageStore
+from src.sender_cache import SenderResolver
+from src.rate_limiter import AdaptiveRateLimiter
+from src.telegram_sync import sync_topic, month_window, find_schedule_topics
 
-# Constants
-MESSAGES_PER_REQUEST = 200
-TOTAL_MESSAGES_LIMIT = 1000
-SLEEP_BETWEEN_REQUESTS = 1  # seconds
 
-
-def find_schedule_topics(dialog_info_path):
-    """Find all groups with topics named 'schedule' (case-insensitive)."""
-    with open(dialog_info_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    schedule_topics = []
-    for group in data.get('groups_and_channels', []):
-        for topic in group.get('topics', []):
-            if topic.get('title', '').lower() == 'schedule':
-                schedule_topics.append({
-                    'group_id': group['id'],
-                    'group_name': group['name'],
-                    'topic_id': topic['id'],
-                    'topic_name': topic['title']
-                })
-
-    return schedule_topics
-
-
-async def fetch_messages_for_topic(client, group_id, topic_id, group_name, topic_name):
-    """Fetch messages from a specific topic with pagination and rate limiting."""
+async def fetch_messages_for_topic(client, store, resolver, limiter, group_id, topic_id, group_name, topic_name, start, end):
+    """Sync a topic into the local store and return its messages for the window [start, end)."""
     print(f"\nFetching messages from '{group_name}' -> '{topic_name}'")
     print(f"  Group ID: {group_id}, Topic ID: {topic_id}")
 
-    # Get start of current month (January 2026)
-    now = datetime.now(timezone.utc)
-    start_of_month = datetime(now.year, now.month, 1, tzinfo=timezone.utc)
-    print(f"  Fetching messages from {start_of_month.strftime('%Y-%m-%d')} onwards")
-
-    all_messages = []
-    offset_id = 0
-    request_count = 0
-
-    while len(all_messages) < TOTAL_MESSAGES_LIMIT:
-        remaining = TOTAL_MESSAGES_LIMIT - len(all_messages)
-        limit = min(MESSAGES_PER_REQUEST, remaining)
-
-        request_count += 1
-        print(f"  Request {request_count}: Fetching {limit} messages (offset_id={offset_id})...")
-
-        messages_batch = []
-        async for message in client.iter_messages(
-            group_id,
-            reply_to=topic_id,
-            limit=limit,
-            offset_id=offset_id
-        ):
-            # Stop if message is older than start of month
-            if message.date and message.date < start_of_month:
-                print(f"  Reached messages older than {start_of_month.strftime('%Y-%m-%d')}, stopping...")
-                break
-            # Get sender info
-            sender = await message.get_sender()
-            sender_name = None
-            sender_id = message.sender_id
-
-            if sender:
-                if hasattr(sender, 'first_name'):
-                    sender_name = sender.first_name
-                    if sender.last_name:
-                        sender_name += f" {sender.last_name}"
-                elif hasattr(sender, 'title'):
-                    sender_name = sender.title
-
-            msg_data = {
-                'group_id': group_id,
-                'topic_id': topic_id,
-                'group_name': group_name,
-                'topic_name': topic_name,
-                'message_id': message.id,
-                'date': message.date.isoformat() if message.date else None,
-                'sender_id': sender_id,
-                'sender_name': sender_name,
-                'text': message.text if message.text else ''
-            }
-            messages_batch.append(msg_data)
-            offset_id = message.id  # Update offset for next batch
-
-        if not messages_batch:
-            print(f"  No more messages available.")
-            break
-
-        all_messages.extend(messages_batch)
-        print(f"  Fetched {len(messages_batch)} messages. Total: {len(all_messages)}")
-
-        # Sleep between requests to avoid rate limiting
-        if len(all_messages) < TOTAL_MESSAGES_LIMIT and messages_batch:
-            print(f"  Sleeping {SLEEP_BETWEEN_REQUESTS} second(s)...")
-            await asyncio.sleep(SLEEP_BETWEEN_REQUESTS)
-
-    return all_messages
+    stored_messages = await sync_topic(client, store, resolver, limiter, group_id, topic_id, start, end, verbose=True)
+    print(f"  {len(stored_messages)} messages from {start.strftime('%Y-%m-%d')} to {end.strftime('%Y-%m-%d')} in local store")
+
+    return [
+        {
+            'group_id': group_id,
+            'topic_id': topic_id,
+            'group_name': group_name,
+            'topic_name': topic_name,
+            'message_id': m['message_id'],
+            'date': m['date'].isoformat(),
+            'sender_id': m['sender_id'],
+            'sender_name': m['sender_name'],
+            'text': m['text']
+        }
+        for m in stored_messages
+    ]
 
 
 def save_to_csv(messages, output_path):
@@ -127,10 +56,18 @@ def save_to_csv(messages, output_path):
 
 
 def main():
+    """Usage: python scripts/fetch_schedule_messages.py [YYYY-MM] (default: current month)"""
     if not config.TELEGRAM_API_ID or not config.TELEGRAM_API_HASH:
         print("Error: TELEGRAM_API_ID or TELEGRAM_API_HASH not set.")
         return
 
+    # Report month window [start, end)
+    if len(sys.argv) > 1:
+        report_month = datetime.strptime(sys.argv[1], '%Y-%m')
+    else:
+        report_month = datetime.now(timezone.utc)
+    start, end = month_window(report_month.year, report_month.month)
+
     # Find dialog_info.json
     dialog_info_path = os.path.join(os.path.dirname(__file__), '..', 'data_raw', 'dialog_info.json')
     if not os.path.exists(dialog_info_path):
@@ -148,24 +85,42 @@ def main():
         print(f"  - {topic['group_name']} -> {topic['topic_name']} (Group: {topic['group_id']}, Topic: {topic['topic_id']})")
 
     print("\nInitializing Telegram Client...")
-    client = TelegramClient(config.SESSION_NAME, config.TELEGRAM_API_ID, config.TELEGRAM_API_HASH)
+    # flood_sleep_threshold=0 surfaces every FloodWaitError to the shared rate limiter
+    client = TelegramClient(
+        config.SESSION_NAME, config.TELEGRAM_API_ID, config.TELEGRAM_API_HASH,
+        flood_sleep_threshold=0
+    )
+    store = MessageStore(config.MESSAGE_STORE_PATH)
+    resolver = SenderResolver(config.SENDER_CACHE_PATH, ttl=config.SENDER_CACHE_TTL)
 
     async def run():
-        all_messages = []
-
-        for topic_info in schedule_topics:
-            messages = await fetch_messages_for_topic(
-                client,
-                topic_info['group_id'],
-                topic_info['topic_id'],
-                topic_info['group_name'],
-                topic_info['topic_name']
-            )
-            all_messages.extend(messages)
-
-        # Generate output filename with timestamp
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        output_path = os.path.join(os.path.dirname(__file__), '..', 'data_raw', f'schedule_messages_{timestamp}.csv')
+        limiter = AdaptiveRateLimiter(
+            rate=config.FETCH_REQUESTS_PER_SECOND,
+            max_rate=config.FETCH_MAX_REQUESTS_PER_SECOND
+        )
+        semaphore = asyncio.Semaphore(config.FETCH_CONCURRENCY)
+
+        async def fetch_topic(topic_info):
+            async with semaphore:
+                return await fetch_messages_for_topic(
+                    client,
+                    store,
+                    resolver,
+                    limiter,
+                    topic_info['group_id'],
+                    topic_info['topic_id'],
+                    topic_info['group_name'],
+                    topic_info['topic_name'],
+                    start,
+                    end
+                )
+
+        results = await asyncio.gather(*(fetch_topic(t) for t in schedule_topics))
+        all_messages = [m for messages in results for m in messages]
+
+        # One CSV per month, rewritten from the local store on each run
+        month = start.strftime('%Y_%m')
+        output_path = os.path.join(os.path.dirname(__file__), '..', 'data_raw', f'schedule_messages_{month}.csv')
 
         save_to_csv(all_messages, output_path)
 
@@ -174,7 +129,11 @@ def main():
         print(f"Output file: {output_path}")
 
     client.start()
-    client.loop.run_until_complete(run())
+    try:
+        client.loop.run_until_complete(run())
+    finally:
+        resolver.save()
+        store.close()
 
 
 if __name__ == "__main__":
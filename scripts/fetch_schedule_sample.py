@@ -8,34 +8,28 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from telethon import TelegramClient
 from src import config
+from src.sender_cache import SenderResolver
 
 # HiAI group with Schedule topic
 GROUP_ID = -1002804503194
 TOPIC_ID = 5
 
-async def fetch_sample_messages(client, limit=200):
+async def fetch_sample_messages(client, resolver, limit=200):
     """Fetch first N messages from the Schedule topic."""
     print(f"Fetching {limit} messages from Schedule topic...")
 
-    messages = []
+    page = [message async for message in client.iter_messages(GROUP_ID, reply_to=TOPIC_ID, limit=limit)]
 
-    async for message in client.iter_messages(GROUP_ID, reply_to=TOPIC_ID, limit=limit):
-        # Get sender info
-        sender = await message.get_sender()
-        sender_name = None
-        if sender:
-            if hasattr(sender, 'first_name'):
-                sender_name = sender.first_name
-                if sender.last_name:
-                    sender_name += f" {sender.last_name}"
-            elif hasattr(sender, 'title'):
-                sender_name = sender.title
+    # Resolve all senders of the page at once
+    sender_names = await resolver.resolve_page(client, page)
 
+    messages = []
+    for message in page:
         msg_data = {
             "id": message.id,
             "date": message.date.isoformat() if message.date else None,
             "sender_id": message.sender_id,
-            "sender_name": sender_name,
+            "sender_name": sender_names.get(message.sender_id),
             "text": message.text if message.text else "[No text - possibly media]"
         }
         messages.append(msg_data)
@@ -49,9 +43,10 @@ def main():
 
     print("Initializing Telegram Client...")
     client = TelegramClient(config.SESSION_NAME, config.TELEGRAM_API_ID, config.TELEGRAM_API_HASH)
+    resolver = SenderResolver(config.SENDER_CACHE_PATH, ttl=config.SENDER_CACHE_TTL)
 
     async def run():
-        messages = await fetch_sample_messages(client, limit=200)
+        messages = await fetch_sample_messages(client, resolver, limit=200)
 
         # Create data structure with metadata
         data = {
@@ -70,7 +65,10 @@ def main():
         print(f"Group ID: {GROUP_ID}, Topic ID: {TOPIC_ID}")
 
     client.start()
-    client.loop.run_until_complete(run())
+    try:
+        client.loop.run_until_complete(run())
+    finally:
+        resolver.save()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,257 @@
+"""
+Bulk batch-job execution of LLM requests for backfills.
+
+BatchJobClient has the same interface as call_llm_async, but instead of
+calling the interactive endpoint it collects the requests made while the
+labeling batches start (until no new one arrives for `gather_window`
+seconds), writes them to a JSONL job file, submits one bulk job per model
+and polls until it finishes. Each caller then gets its own response text,
+so caching, repair rounds and the week/message mapping of the label node
+work unchanged. Repair requests simply become a second, smaller job.
+
+Providers implement:
+    async submit(job_path, model) -> job id
+    async status(job_id) -> (PENDING | SUCCEEDED | FAILED, result reference)
+    async results(result reference) -> JSONL bytes
+
+GeminiBatchProvider uses the Gemini Batch API (billed at a discount and with
+its own quota, so backfills do not compete with interactive runs).
+LocalBatchProvider runs a job file against any async call in-process, as an
+offline stand-in that reads and writes the same file format.
+"""
+import asyncio
+import itertools
+import json
+import os
+import time
+
+from utils.call_llm import submit_batch_job, get_batch_job, download_batch_results
+
+PENDING = "pending"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+_GEMINI_STATES = {
+    'JOB_STATE_SUCCEEDED': SUCCEEDED,
+    'JOB_STATE_PARTIALLY_SUCCEEDED': SUCCEEDED,
+    'JOB_STATE_FAILED': FAILED,
+    'JOB_STATE_CANCELLED': FAILED,
+    'JOB_STATE_EXPIRED': FAILED,
+}
+
+
+class BatchJobError(RuntimeError):
+    """A batch job, or one request of it, failed."""
+
+
+def request_line(key, prompt, response_schema=None):
+    """One line of a job file: {"key", "request": GenerateContentRequest}."""
+    request = {'contents': [{'role': 'user', 'parts': [{'text': prompt}]}]}
+    if response_schema:
+        request['generation_config'] = {
+            'response_mime_type': 'application/json',
+            'response_schema': response_schema,
+        }
+    return {'key': key, 'request': request}
+
+
+def response_line(key, text=None, error=None):
+    """One line of a result file, in the Gemini Batch API output format."""
+    if error is not None:
+        return {'key': key, 'error': {'message': str(error)}}
+    return {'key': key, 'response': {'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]}}]}}
+
+
+def parse_response_line(line):
+    """Return (key, response text or None, error message or None) of a result line."""
+    key = line.get('key')
+    if line.get('error'):
+        error = line['error']
+        return key, None, error.get('message', str(error)) if isinstance(error, dict) else str(error)
+
+    candidates = (line.get('response') or {}).get('candidates') or [{}]
+    parts = (candidates[0].get('content') or {}).get('parts') or []
+    text = ''.join(part.get('text', '') for part in parts)
+    return (key, text, None) if text else (key, None, "empty response")
+
+
+class GeminiBatchProvider:
+    """Gemini Batch API provider."""
+
+    async def submit(self, job_path, model):
+        return await submit_batch_job(job_path, model)
+
+    async def status(self, job_id):
+        state, result_file = await get_batch_job(job_id)
+        return _GEMINI_STATES.get(state, PENDING), result_file
+
+    async def results(self, result_file):
+        return await download_batch_results(result_file)
+
+
+class LocalBatchProvider:
+    """In-process stand-in that runs a job file against an async LLM call.
+
+    Args:
+        call: Async `call(prompt, **kwargs) -> str` (e.g. StubProvider, call_llm_async)
+        concurrency: Requests of a job processed at once
+    """
+
+    def __init__(self, call, concurrency=4):
+        self.call = call
+        self.concurrency = concurrency
+        self._jobs = {}  # job id -> (task, result path)
+        self._ids = itertools.count(1)
+
+    async def submit(self, job_path, model):
+        job_id = f"local-{next(self._ids)}"
+        result_path = f"{os.path.splitext(job_path)[0]}.results.jsonl"
+        task = asyncio.ensure_future(self._run(job_path, result_path, model))
+        self._jobs[job_id] = (task, result_path)
+        return job_id
+
+    async def status(self, job_id):
+        task, result_path = self._jobs[job_id]
+        if not task.done():
+            return PENDING, None
+        return (FAILED if task.exception() else SUCCEEDED), result_path
+
+    async def results(self, result_path):
+        with open(result_path, 'rb') as f:
+            return f.read()
+
+    async def _run(self, job_path, result_path, model):
+        with open(job_path, encoding='utf-8') as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run_one(line):
+            request = line['request']
+            prompt = ''.join(part['text'] for part in request['contents'][0]['parts'])
+            schema = (request.get('generation_config') or {}).get('response_schema')
+            async with semaphore:
+                try:
+                    text = await self.call(prompt, model=model, response_schema=schema)
+                except Exception as e:
+                    return response_line(line['key'], error=e)
+            return response_line(line['key'], text)
+
+        results = await asyncio.gather(*(run_one(line) for line in lines))
+        with open(result_path, 'w', encoding='utf-8') as f:
+            for result in results:
+                f.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+
+class BatchJobClient:
+    """call_llm_async-compatible call that answers requests through bulk jobs.
+
+    Args:
+        provider: GeminiBatchProvider, LocalBatchProvider or compatible
+        job_dir: Directory for job and result files
+        gather_window: Seconds without new requests before a job is submitted
+        poll_interval: Longest wait between status polls (seconds); polling
+            starts at one second and backs off up to this
+    """
+
+    def __init__(self, provider, job_dir, gather_window=0.5, poll_interval=60.0):
+        self.provider = provider
+        self.job_dir = job_dir
+        self.gather_window = gather_window
+        self.poll_interval = poll_interval
+
+        self._pending = []  # (prompt, model, response_schema, future)
+        self._flush_task = None
+        self._jobs = set()
+        self._received = 0
+        self._job_files = itertools.count(1)
+
+        self.job_count = 0
+        self.request_count = 0
+        self.failed_count = 0
+
+    async def __call__(self, prompt, model=None, response_schema=None, **kwargs):
+        """Queue one request and wait for its answer from the next job."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((prompt, model, response_schema, future))
+        self._received += 1
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._flush())
+        return await future
+
+    async def _flush(self):
+        """Wait until requests stop arriving, then start one job per model."""
+        while True:
+            received = self._received
+            await asyncio.sleep(self.gather_window)
+            if self._received == received:
+                break
+
+        pending, self._pending = self._pending, []
+        by_model = {}
+        for request in pending:
+            by_model.setdefault(request[1], []).append(request)
+        for model, requests in by_model.items():
+            # Jobs run on their own, so requests made meanwhile start the next job
+            task = asyncio.ensure_future(self._run_job(model, requests))
+            self._jobs.add(task)
+            task.add_done_callback(self._jobs.discard)
+
+    async def _run_job(self, model, requests):
+        futures = {}
+        try:
+            job_path = self._write_job(model, requests, futures)
+            job_id = await self.provider.submit(job_path, model)
+            self.job_count += 1
+            self.request_count += len(requests)
+            print(f"Submitted batch job {job_id}: {len(requests)} request(s) ({job_path})")
+
+            started = time.monotonic()
+            delay = 1.0
+            while True:
+                state, result_ref = await self.provider.status(job_id)
+                if state != PENDING:
+                    break
+                await asyncio.sleep(delay)
+                delay = min(self.poll_interval, delay * 2)
+            if state == FAILED:
+                raise BatchJobError(f"Batch job {job_id} failed")
+            print(f"Batch job {job_id} finished in {time.monotonic() - started:.0f}s")
+
+            for raw in (await self.provider.results(result_ref)).splitlines():
+                if not raw.strip():
+                    continue
+                key, text, error = parse_response_line(json.loads(raw))
+                future = futures.pop(key, None)
+                if future is None or future.done():
+                    continue
+                if error:
+                    self.failed_count += 1
+                    future.set_exception(BatchJobError(f"Batch request {key} failed: {error}"))
+                else:
+                    future.set_result(text)
+            for key, future in futures.items():
+                if not future.done():
+                    self.failed_count += 1
+                    future.set_exception(BatchJobError(f"Batch request {key} has no result"))
+        except Exception as e:
+            for _, _, _, future in requests:
+                if not future.done():
+                    future.set_exception(e)
+
+    def _write_job(self, model, requests, futures):
+        """Write the job file and register each request's future under its key."""
+        os.makedirs(self.job_dir, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        job_path = os.path.join(self.job_dir, f"labels-{stamp}-{next(self._job_files):03d}.jsonl")
+        with open(job_path, 'w', encoding='utf-8') as f:
+            for i, (prompt, _, response_schema, future) in enumerate(requests, 1):
+                key = f"request-{i}"
+                futures[key] = future
+                f.write(json.dumps(request_line(key, prompt, response_schema), ensure_ascii=False) + '\n')
+        return job_path
+
+    def summary(self):
+        """One-line summary of submitted jobs."""
+        return (f"Batch jobs: {self.job_count} submitted, {self.request_count} requests"
+                + (f", {self.failed_count} failed" if self.failed_count else ""))
@@ -15,13 +15,85 @@ def get_int_env(key, default=None):
         print(f"Warning: Environment variable {key} is not a valid integer. Using default: {default}")
         return default
 
+def get_float_env(key, default=None):
+    """Helper to get an environment variable and cast it to float."""
+    value = os.getenv(key)
+    if value is None or value == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        print(f"Warning: Environment variable {key} is not a valid number. Using default: {default}")
+        return default
+
 # Telegram Configuration
 TELEGRAM_API_ID = get_int_env("TELEGRAM_API_ID")
 TELEGRAM_API_HASH = os.getenv("TELEGRAM_API_HASH")
 SESSION_NAME = os.getenv("SESSION_NAME", "telegram_session")
 
+# Telegram fetch concurrency and adaptive rate limit (requests per second)
+FETCH_CONCURRENCY = get_int_env("FETCH_CONCURRENCY", 4)
+FETCH_REQUESTS_PER_SECOND = get_float_env("FETCH_REQUESTS_PER_SECOND", 1.0)
+FETCH_MAX_REQUESTS_PER_SECOND = get_float_env("FETCH_MAX_REQUESTS_PER_SECOND", 5.0)
+
+# Local message store (SQLite) used for incremental sync
+MESSAGE_STORE_PATH = os.getenv("MESSAGE_STORE_PATH", os.path.join("data_raw", "messages.db"))
+
+# Sender id -> display name cache shared by the fetch node and scripts
+SENDER_CACHE_PATH = os.getenv("SENDER_CACHE_PATH", os.path.join("data_raw", "sender_cache.json"))
+SENDER_CACHE_TTL = get_int_env("SENDER_CACHE_TTL", 7 * 24 * 3600)  # seconds
+
 # Gemini Configuration
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+
+# Two-tier labeling: a cheaper model labels everything first and only low-confidence
+# or inconsistent messages are re-labeled by GEMINI_MODEL (empty: single tier)
+LLM_CASCADE_MODEL = os.getenv("LLM_CASCADE_MODEL", "")
+LLM_CASCADE_CONFIDENCE = get_float_env("LLM_CASCADE_CONFIDENCE", 0.8)
+# Largest share of cheap-tier messages escalated per batch (lowest confidence first)
+LLM_CASCADE_MAX_ESCALATION = get_float_env("LLM_CASCADE_MAX_ESCALATION", 1.0)
+
+# LLM concurrency (AIMD between the initial and max limit) and retries
+LLM_CONCURRENCY = get_int_env("LLM_CONCURRENCY", 4)
+LLM_MAX_CONCURRENCY = get_int_env("LLM_MAX_CONCURRENCY", 16)
+LLM_MAX_ATTEMPTS = get_int_env("LLM_MAX_ATTEMPTS", 6)
+LLM_BACKOFF_MAX = get_float_env("LLM_BACKOFF_MAX", 60.0)  # seconds
+
+# Hedged requests: a call still running after the model's latency percentile is
+# duplicated (to LLM_HEDGE_MODEL, or the same model when empty) and the slower one cancelled
+LLM_HEDGE = os.getenv("LLM_HEDGE", "on")  # on or off
+LLM_HEDGE_MODEL = os.getenv("LLM_HEDGE_MODEL", "")
+LLM_HEDGE_PERCENTILE = get_float_env("LLM_HEDGE_PERCENTILE", 0.95)
+LLM_HEDGE_MAX_RATIO = get_float_env("LLM_HEDGE_MAX_RATIO", 0.1)  # share of calls
+
+# Labeling batches in flight at once and seconds per batch, LLM retries included (0: unbounded)
+LABEL_MAX_PARALLEL_BATCHES = get_int_env("LABEL_MAX_PARALLEL_BATCHES", 32)
+LABEL_BATCH_TIMEOUT = get_float_env("LABEL_BATCH_TIMEOUT", 600.0)
+
+# Follow-up requests for messages a labeling response missed or got wrong
+LLM_REPAIR_ROUNDS = get_int_env("LLM_REPAIR_ROUNDS", 2)
+
+# Context caching of the static labeling prompt: gemini, local (offline stand-in) or off
+LLM_CONTEXT_CACHE = os.getenv("LLM_CONTEXT_CACHE", "gemini")
+LLM_CONTEXT_CACHE_TTL = get_int_env("LLM_CONTEXT_CACHE_TTL", 3600)  # seconds
+
+# Token budget per labeling request (messages are packed up to these estimates)
+LLM_BATCH_INPUT_TOKENS = get_int_env("LLM_BATCH_INPUT_TOKENS", 12000)
+LLM_BATCH_OUTPUT_TOKENS = get_int_env("LLM_BATCH_OUTPUT_TOKENS", 6000)
+
+# Labeling execution: interactive calls, or bulk batch jobs for backfills
+LLM_MODE = os.getenv("LLM_MODE", "interactive")  # interactive or batch
+LLM_BATCH_JOB_PROVIDER = os.getenv("LLM_BATCH_JOB_PROVIDER", "gemini")  # gemini or local (offline stand-in)
+LLM_BATCH_JOB_DIR = os.getenv("LLM_BATCH_JOB_DIR", os.path.join("data_raw", "batch_jobs"))
+LLM_BATCH_JOB_POLL_INTERVAL = get_float_env("LLM_BATCH_JOB_POLL_INTERVAL", 60.0)  # seconds
+LLM_BATCH_JOB_MAX_REQUESTS = get_int_env("LLM_BATCH_JOB_MAX_REQUESTS", 5000)  # requests per job
+
+# Flow checkpoints (--checkpoint / --resume): one directory per run id
+RUN_DIR = os.getenv("RUN_DIR", os.path.join("data_raw", "runs"))
+
+# Per-message LLM label cache (SQLite)
+LABEL_CACHE_PATH = os.getenv("LABEL_CACHE_PATH", os.path.join("data_raw", "label_cache.db"))
 
 # Target Configuration
 # TARGET_GROUP_ID can be an integer (mostly negative for groups)
@@ -29,6 +101,10 @@ TARGET_GROUP_ID = get_int_env("TARGET_GROUP_ID")
 # TARGET_TOPIC_ID is typically an integer
 TARGET_TOPIC_ID = get_int_env("TARGET_TOPIC_ID")
 
+# Group/topic of the recorded fixture data_raw/schedule_sample.json (--replay, benchmarks)
+SAMPLE_GROUP_ID = -1002804503194
+SAMPLE_TOPIC_ID = 5
+
 def validate_config():
     """Validates that all necessary configuration variables are set."""
     required_vars = [
@@ -0,0 +1,264 @@
+"""
+Deterministic resolver for Vietnamese date expressions in schedule messages.
+
+Expressions are resolved relative to the message's send time in Vietnam time
+(Asia/Ho_Chi_Minh, UTC+7), on diacritic-stripped text:
+
+- d/m(/y) dates and day lists sharing a month: "16/1 và 17/1", "16, 17/1"
+- ranges: "từ 16/1 đến 20/1", "từ 16 đến 20/1", "16-20/1", "từ thứ 2 đến thứ 4"
+- relative days: "hôm nay", "sáng nay", "ngày mai", "chiều mai", "mai và mốt", "ngày mốt", "hôm qua"
+- weekdays: "thứ 2", "thứ hai", "t2", "chủ nhật", with "tuần này / sau / trước"
+- half-day markers for nua_buoi: "sáng", "chiều", "nửa buổi", "1/2 ngày"
+
+Explicit d/m dates take precedence over relative words and weekdays
+("hôm nay (14/1)" is 14/1). A message without any date expression refers to
+its send day. Dates joined by "và", "," or "&" count as one expression, so
+"16/1 nhưng 17/1" has two and "16/1 và 17/1" has one. Vague (for example "tuần sau" without a weekday or "vài ngày")
+or invalid expressions resolve to None and are left to the LLM, and so do a
+bare "nay" / "mai" (also the name "Mai") and a day count ("3 ngày") that
+differs from the number of resolved dates.
+"""
+import re
+import unicodedata
+from datetime import date, timedelta, timezone
+
+# Messages are written in Vietnam time
+LOCAL_TZ = timezone(timedelta(hours=7), 'Asia/Ho_Chi_Minh')
+
+MAX_RANGE_DAYS = 14
+
+# Half-day markers
+MORNING = 'sang'
+AFTERNOON = 'chieu'
+HALF_DAY = 'nua'
+
+_D = r'\d{1,2}'
+_DM = rf'{_D}/{_D}(?:/(?:\d{{4}}|\d{{2}}))?'
+_WEEKDAY = r'(?:thu ?(?:[2-7]|hai|ba|tu|nam|sau|bay)|t[2-7]|chu nhat|cn)'
+
+HALF_FRACTION = re.compile(r'\b1/2 ?(ngay|buoi)\b')
+DATE_RANGE = re.compile(rf'(?:\btu (?:ngay )?)?\b({_DM}) ?(?:den|toi|-) ?(?:ngay )?({_DM})\b')
+DAY_RANGE = re.compile(rf'(?:\btu (?:ngay )?)?(?<!thu )\b({_D}) ?(?:den|toi|-) ?(?:ngay )?({_D})/({_D})(?:/(\d{{4}}|\d{{2}}))?\b')
+DAY_LIST = re.compile(rf'\b({_D}(?:(?: ?, ?| va | & ){_D})*)/({_D})(?:/(\d{{4}}|\d{{2}}))?\b')
+WEEKDAY_RANGE = re.compile(rf'(?:\btu )?\b({_WEEKDAY}) ?(?:den|toi|-) ?({_WEEKDAY})\b')
+WEEKDAY = re.compile(rf'\b{_WEEKDAY}\b')
+
+# "mai" / "nay" only count after a day word; "mai" is also a common name
+RELATIVE_DAYS = [
+    (re.compile(r'\b(hom|sang|chieu|trua|toi) nay\b'), 0),
+    (re.compile(r'\b(ngay|sang|chieu|trua|toi) mai\b|\bmai(?= (?:va |& )?mot\b)'), 1),
+    (re.compile(r'\b(ngay mot|ngay kia)\b|(?:(?<=\bmai )|(?<=\bmai va )|(?<=\bmai & ))mot\b'), 2),
+    (re.compile(r'\bhom qua\b'), -1),
+]
+BARE_RELATIVE = re.compile(r'\b(nay|mai)\b')
+# Text between two parsed dates that keeps them in one expression
+JOINER = re.compile(r'^ *(?:,|va|&)? *(?:ngay )?$')
+DAY_COUNT = re.compile(r'(?<![\d/])(?<!thu )\b(\d{1,2}) ngay\b')
+NEXT_WEEK = re.compile(r'\btuan (sau|toi)\b')
+LAST_WEEK = re.compile(r'\btuan truoc\b')
+THIS_WEEK = re.compile(r'\btuan nay\b')
+WEEK_QUALIFIER = re.compile(r'\btuan (nay|sau|toi|truoc)\b')
+VAGUE = re.compile(r'\b(tuan sau|tuan toi|tuan truoc|cuoi tuan|dau tuan|thang sau|vai ngay|may ngay)\b')
+
+MORNING_WORDS = re.compile(r'\b(buoi sang|sang)\b')
+AFTERNOON_WORDS = re.compile(r'\b(buoi chieu|chieu)\b')
+HALF_WORDS = re.compile(r'\bnua (buoi|ngay)\b')
+
+_WEEKDAY_NUMBERS = {'hai': 0, 'ba': 1, 'tu': 2, 'nam': 3, 'sau': 4, 'bay': 5}
+
+
+def strip_diacritics(text):
+    """Lowercase text without Vietnamese diacritics and with collapsed whitespace."""
+    text = unicodedata.normalize('NFD', (text or '').replace('đ', 'd').replace('Đ', 'D'))
+    text = ''.join(c for c in text if unicodedata.category(c) != 'Mn').lower()
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def local_day(sent_at):
+    """Vietnam-time calendar day of a timezone-aware send time."""
+    return sent_at.astimezone(LOCAL_TZ).date()
+
+
+class ResolvedDates:
+    """Dates a message refers to.
+
+    Attributes:
+        dates: Sorted list of datetime.date
+        half: MORNING, AFTERNOON, HALF_DAY or None
+        explicit: Whether the dates come from expressions in the text (False
+            when the message mentions no date and refers to its send day)
+        expressions: Number of separate date expressions in the text
+    """
+    __slots__ = ('dates', 'half', 'explicit', 'expressions')
+
+    def __init__(self, dates, half=None, explicit=True, expressions=1):
+        self.dates = dates
+        self.half = half
+        self.explicit = explicit
+        self.expressions = expressions
+
+    def __repr__(self):
+        return f"ResolvedDates({[d.isoformat() for d in self.dates]}, half={self.half}, explicit={self.explicit})"
+
+
+def resolve(text, sent_at):
+    """Resolve the date expressions of a message (None if vague or invalid).
+
+    Args:
+        text: Message text (original, with diacritics)
+        sent_at: Timezone-aware send time
+    """
+    return resolve_stripped(strip_diacritics(text), local_day(sent_at))
+
+
+def resolve_stripped(text, sent_day):
+    """resolve() for diacritic-stripped text and a local send day."""
+    resolved = _resolve(text, sent_day)
+    count = DAY_COUNT.search(text)
+    if resolved and count and int(count.group(1)) != len(resolved.dates):
+        return None
+    return resolved
+
+
+def _resolve(text, sent_day):
+    half = _half(text)
+    text = HALF_FRACTION.sub(' ', text)
+
+    original = text
+    explicit, spans = [], []
+    for pattern, parse in ((DATE_RANGE, _date_range), (DAY_RANGE, _day_range), (DAY_LIST, _day_list)):
+        for match in pattern.finditer(text):
+            dates = parse(match, sent_day)
+            if not dates:
+                return None
+            explicit.extend(dates)
+            spans.append(match.span())
+        # Blank out what was parsed so "16/1 - 20/1" is not read again as a list
+        text = pattern.sub(lambda m: ' ' * len(m.group(0)), text)
+    if explicit:
+        return ResolvedDates(sorted(set(explicit)), half, expressions=_expressions(original, spans))
+
+    implicit = []
+    for match in WEEKDAY_RANGE.finditer(text):
+        first, last = (_weekday(name, text, sent_day) for name in match.groups())
+        if not 0 <= (last - first).days < MAX_RANGE_DAYS:
+            return None
+        implicit.extend(first + timedelta(days=i) for i in range((last - first).days + 1))
+        spans.append(match.span())
+    text = WEEKDAY_RANGE.sub(lambda m: ' ' * len(m.group(0)), text)
+
+    for match in WEEKDAY.finditer(text):
+        implicit.append(_weekday(match.group(0), text, sent_day))
+        spans.append(match.span())
+    # "tuần này" is not "nay" (today)
+    relative_text = WEEK_QUALIFIER.sub(' ', text)
+    relative_spans = []
+    for pattern, offset in RELATIVE_DAYS:
+        matches = [match.span() for match in pattern.finditer(relative_text)]
+        if matches:
+            implicit.append(sent_day + timedelta(days=offset))
+            relative_spans.extend(matches)
+    for start, end in relative_spans:
+        relative_text = relative_text[:start] + ' ' * (end - start) + relative_text[end:]
+    if BARE_RELATIVE.search(relative_text):
+        return None
+
+    if implicit:
+        return ResolvedDates(sorted(set(implicit)), half, expressions=_expressions(original, spans + relative_spans))
+    if VAGUE.search(text):
+        return None
+
+    # No date mentioned: the request is for the day it was sent
+    return ResolvedDates([sent_day], half, explicit=False, expressions=0)
+
+
+def _expressions(text, spans):
+    """Number of date expressions, merging dates joined by "và", "," or "&"."""
+    spans = sorted(spans)
+    return 1 + sum(not JOINER.match(text[end:start]) for (_, end), (start, _) in zip(spans, spans[1:]))
+
+
+def _half(text):
+    """Half-day marker of a message, if any."""
+    morning, afternoon = MORNING_WORDS.search(text), AFTERNOON_WORDS.search(text)
+    if morning and afternoon:
+        return None
+    if morning:
+        return MORNING
+    if afternoon:
+        return AFTERNOON
+    if HALF_WORDS.search(text) or HALF_FRACTION.search(text):
+        return HALF_DAY
+    return None
+
+
+def parse_day_month(day, month, year, sent_day):
+    """Resolve day/month(/year) near the send date (None if invalid)."""
+    explicit_year = year is not None
+    if explicit_year:
+        year = int(year) + (2000 if len(year) == 2 else 0)
+    else:
+        year = sent_day.year
+    try:
+        resolved = date(year, int(month), int(day))
+    except ValueError:
+        return None
+
+    # "2/1" sent in late December means next year
+    if not explicit_year and (sent_day - resolved).days > 180:
+        try:
+            resolved = resolved.replace(year=year + 1)
+        except ValueError:
+            return None
+    return resolved
+
+
+def _date_span(first, last):
+    if not first or not last or not 0 <= (last - first).days < MAX_RANGE_DAYS:
+        return None
+    return [first + timedelta(days=i) for i in range((last - first).days + 1)]
+
+
+def _date_range(match, sent_day):
+    """"từ 16/1 đến 20/1"."""
+    first, last = (parse_day_month(*_split_dm(s), sent_day) for s in match.groups())
+    return _date_span(first, last)
+
+
+def _day_range(match, sent_day):
+    """"từ 16 đến 20/1": the first day shares the month of the second."""
+    first_day, last_day, month, year = match.groups()
+    return _date_span(parse_day_month(first_day, month, year, sent_day),
+                      parse_day_month(last_day, month, year, sent_day))
+
+
+def _day_list(match, sent_day):
+    """"16/1", "16 và 17/1", "16, 17/1"."""
+    days, month, year = match.groups()
+    dates = [parse_day_month(day, month, year, sent_day) for day in re.findall(r'\d+', days)]
+    return dates if all(dates) else None
+
+
+def _split_dm(value):
+    parts = value.split('/')
+    return parts[0], parts[1], parts[2] if len(parts) > 2 else None
+
+
+def _weekday(name, text, sent_day):
+    """Date of a weekday name: this week's (or the next one still ahead), next or last week's."""
+    name = name.replace(' ', '')
+    if name in ('chunhat', 'cn'):
+        weekday = 6
+    else:
+        value = name[3:] if name.startswith('thu') else name[1:]
+        weekday = int(value) - 2 if value.isdigit() else _WEEKDAY_NUMBERS[value]
+
+    monday = sent_day - timedelta(days=sent_day.weekday())
+    if NEXT_WEEK.search(text):
+        return monday + timedelta(days=7 + weekday)
+    if LAST_WEEK.search(text):
+        return monday + timedelta(days=weekday - 7)
+    resolved = monday + timedelta(days=weekday)
+    if resolved < sent_day and not THIS_WEEK.search(text):
+        resolved += timedelta(days=7)
+    return resolved
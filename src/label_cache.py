@@ -0,0 +1,96 @@
+"""
+Persistent per-message cache of LLM classification results.
+
+Each message's labels are stored under
+(group_id, message_id, hash of normalized text, send date, prompt version),
+so a message is only sent to the LLM again when its text was edited, or the
+prompt/model changed. Messages the LLM did not label are cached too (with an
+empty label list), so chit-chat is not re-sent on every run.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import unicodedata
+from datetime import datetime
+
+
+def normalize_text(text):
+    """Normalize message text for hashing (unicode form, case, whitespace)."""
+    text = unicodedata.normalize('NFC', text or '').lower()
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def text_hash(text):
+    return hashlib.sha1(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+def prompt_version(*parts):
+    """Short hash identifying a prompt/model combination."""
+    return hashlib.sha1('\x00'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+
+class LabelCache:
+    """SQLite cache of per-message labels.
+
+    A cached value is a list of labels, each {'category', 'dates', 'info'};
+    an empty list means the message belongs to no category.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS labels (
+        group_id INTEGER NOT NULL,
+        message_id INTEGER NOT NULL,
+        text_hash TEXT NOT NULL,
+        send_date TEXT NOT NULL,
+        prompt_version TEXT NOT NULL,
+        labels TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        PRIMARY KEY (group_id, message_id, text_hash, send_date, prompt_version)
+    );
+    """
+
+    def __init__(self, path):
+        dir_path = os.path.dirname(path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(self.SCHEMA)
+
+    def _key(self, message, version):
+        return (message.group_id, message.message_id, text_hash(message.text), message.date_str, version)
+
+    def get_many(self, messages, version):
+        """Return {message_id: labels} for the cached messages among `messages`."""
+        cached = {}
+        for message in messages:
+            row = self.conn.execute(
+                """SELECT labels FROM labels WHERE group_id = ? AND message_id = ?
+                   AND text_hash = ? AND send_date = ? AND prompt_version = ?""",
+                self._key(message, version)
+            ).fetchone()
+            if row:
+                cached[message.message_id] = json.loads(row[0])
+        return cached
+
+    def put_many(self, messages, labels_by_id, version):
+        """Cache the labels of `messages` (messages missing from labels_by_id get no label)."""
+        now = datetime.now().isoformat()
+        self.conn.executemany(
+            """INSERT OR REPLACE INTO labels
+               (group_id, message_id, text_hash, send_date, prompt_version, labels, created_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            [
+                self._key(message, version) + (
+                    json.dumps(labels_by_id.get(message.message_id, []), ensure_ascii=False), now
+                )
+                for message in messages
+            ]
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,68 @@
+"""
+Escalation policy for two-tier (cheap model first) labeling.
+
+The cheap model labels every message and reports a confidence per entry.
+A message is escalated to the stronger model when the cheap tier could not
+label it, gave it no confidence, put it in a category and in `none` at once
+(confidence 0), or labeled it below the confidence threshold. At most
+`max_rate` of the batch is escalated for low confidence, lowest first;
+unresolved messages are always escalated.
+"""
+import math
+
+
+def select_escalations(messages, resolved, confidence, threshold, max_rate=1.0):
+    """Pick the messages of a cheap-tier result to re-label with the stronger model.
+
+    Args:
+        messages: All messages sent to the cheap tier
+        resolved: Messages the cheap tier accounted for
+        confidence: {message_id: confidence} of the resolved messages
+        threshold: Confidence below which a resolved message is escalated
+        max_rate: Largest share of `messages` escalated for low confidence
+
+    Returns:
+        (messages to escalate, number of low-confidence messages left out by max_rate)
+    """
+    resolved_ids = {msg.message_id for msg in resolved}
+    unresolved = [msg for msg in messages if msg.message_id not in resolved_ids]
+
+    doubtful = [msg for msg in resolved if confidence.get(msg.message_id, 0.0) < threshold]
+    doubtful.sort(key=lambda msg: confidence.get(msg.message_id, 0.0))
+    limit = math.floor(max_rate * len(messages) + 1e-9)
+    return unresolved + doubtful[:limit], max(0, len(doubtful) - limit)
+
+
+class CascadeStats:
+    """Counts of a labeling run's cheap tier and escalations."""
+
+    def __init__(self, cheap_model, strong_model, threshold, max_rate):
+        self.cheap_model = cheap_model
+        self.strong_model = strong_model
+        self.threshold = threshold
+        self.max_rate = max_rate
+
+        self.cheap_count = 0
+        self.escalated_count = 0
+        self.capped_count = 0
+        self.relabeled_count = 0
+
+    def record(self, cheap, escalated, capped, relabeled):
+        """Add one batch's counts."""
+        self.cheap_count += cheap
+        self.escalated_count += escalated
+        self.capped_count += capped
+        self.relabeled_count += relabeled
+
+    @property
+    def escalation_rate(self):
+        return self.escalated_count / self.cheap_count if self.cheap_count else 0.0
+
+    def summary(self):
+        """One-line summary of the cascade."""
+        return (f"Cascade: {self.cheap_count} messages labeled by {self.cheap_model}, "
+                f"{self.escalated_count} escalated to {self.strong_model} "
+                f"({self.escalation_rate:.0%}, threshold {self.threshold:.2f}), "
+                f"{self.relabeled_count} relabeled"
+                + (f", {self.capped_count} low-confidence kept (max rate {self.max_rate:.0%})"
+                   if self.capped_count else ""))
@@ -0,0 +1,134 @@
+"""
+Structured-output schema and parsing for LLM labeling responses.
+
+The labeling call asks Gemini for a compact JSON array matching RESPONSE_SCHEMA:
+one entry per label with the row number `i` of the prompt (see
+src/prompt_codec.py), category `c`, confidence `p` (0-1), day offsets `d` from
+the batch anchor (only when they differ from the locally resolved dates) and
+info `n`. Rows that fit no category get `{"i": .., "c": "none"}`, so every
+input message is accounted for. parse_label_response() decodes it with orjson
+when installed (json otherwise) and expands every entry through the codec into
+a LabelRecord: entries with an unknown row or category are dropped and invalid
+offsets are discarded, so a slightly-off entry never fails the whole batch.
+"""
+import json
+import re
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # optional speed-up
+    _loads = json.loads
+
+CATEGORIES = ['nghi', 'tre', 'nua_buoi', 'remote']
+
+INFO_MAX_LENGTH = 50
+
+RESPONSE_SCHEMA = {
+    'type': 'ARRAY',
+    'items': {
+        'type': 'OBJECT',
+        'properties': {
+            'i': {'type': 'INTEGER'},
+            'c': {'type': 'STRING', 'enum': CATEGORIES + ['none']},
+            'p': {'type': 'NUMBER'},
+            'd': {'type': 'ARRAY', 'items': {'type': 'INTEGER'}},
+            'n': {'type': 'STRING'},
+        },
+        'required': ['i', 'c'],
+        'property_ordering': ['i', 'c', 'p', 'd', 'n'],
+    },
+}
+
+_FENCE = re.compile(r'^```(?:json)?\s*\n?(.*?)```\s*$', re.DOTALL | re.IGNORECASE)
+
+
+class LabelRecord:
+    """One validated label of a message.
+
+    Attributes:
+        message_id: Telegram message id (int)
+        dates: Dates the request is for ("YYYY-MM-DD")
+        info: Short description (at most INFO_MAX_LENGTH characters)
+    """
+    __slots__ = ('message_id', 'dates', 'info')
+
+    def __init__(self, message_id, dates, info):
+        self.message_id = message_id
+        self.dates = dates
+        self.info = info
+
+    def to_dict(self, name):
+        """Labeled item as stored in labeled_messages."""
+        return {'message_id': self.message_id, 'name': name, 'dates': self.dates, 'info': self.info}
+
+    def __repr__(self):
+        return f"LabelRecord({self.message_id}, {self.dates}, {self.info!r})"
+
+
+def parse_label_response(text, codec):
+    """Parse a compact JSON labeling response into {category: [LabelRecord], 'none': [message_id]}.
+
+    The result also has 'confidence': {message_id: lowest `p` of its entries}
+    for messages whose entries carry a valid confidence; answers contradicting
+    the locally resolved dates get confidence 0.
+
+    Args:
+        text: Response text
+        codec: PromptCodec the request was encoded with
+
+    Raises:
+        ValueError: The response is not a JSON array
+    """
+    text = text.strip()
+    fenced = _FENCE.match(text)
+    if fenced:
+        text = fenced.group(1)
+
+    try:
+        result = _loads(text)
+    except ValueError as e:
+        raise ValueError(f"Invalid JSON response: {e}: {text[:200]}") from None
+    if not isinstance(result, list):
+        raise ValueError(f"Expected a JSON array, got {type(result).__name__}: {text[:200]}")
+
+    labels = {category: [] for category in CATEGORIES}
+    labels['none'] = []
+    confidence = {}
+    for item in result:
+        if not isinstance(item, dict) or item.get('c') not in labels:
+            continue
+        row = _to_int(item.get('i'))
+        message_id = codec.message_id(row)
+        if message_id is None:
+            continue
+        p = item.get('p')
+        if isinstance(p, (int, float)) and not isinstance(p, bool) and 0 <= p <= 1:
+            confidence[message_id] = min(p, confidence.get(message_id, 1.0))
+        if item['c'] == 'none':
+            labels['none'].append(message_id)
+        else:
+            record, mismatch = _to_record(row, message_id, item, codec)
+            labels[item['c']].append(record)
+            if mismatch:
+                confidence[message_id] = 0.0
+    labels['confidence'] = confidence
+    return labels
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_record(row, message_id, item, codec):
+    """Expand one entry into (LabelRecord, whether its dates contradict the resolved ones)."""
+    offsets = item.get('d')
+    if offsets is not None and not isinstance(offsets, list):
+        offsets = [offsets]
+    dates, mismatch = codec.dates(row, [_to_int(offset) for offset in offsets or []])
+
+    info = str(item.get('n') or '')[:INFO_MAX_LENGTH]
+    return LabelRecord(message_id, dates, info), mismatch
@@ -0,0 +1,193 @@
+"""
+Adaptive (AIMD) concurrency control and retries for LLM calls.
+
+One dispatcher is shared by all parallel labeling batches:
+    - at most `limit` calls are in flight; every other call waits for a slot
+    - each successful call raises the limit additively (about +1 per
+      `limit` successful calls), up to `max_limit`
+    - a 429 / quota / overload error, or a call much slower than the recent
+      average, multiplies the limit by `decrease` (at most once per average
+      call latency, so one burst of errors counts once)
+    - throttled calls are retried with full-jitter exponential backoff; a
+      server retry hint (RetryInfo / Retry-After) blocks every new call for
+      that long instead
+"""
+import asyncio
+import random
+import re
+import time
+from contextlib import asynccontextmanager
+
+# HTTP codes / API statuses worth retrying
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+RETRYABLE_STATUSES = {'RESOURCE_EXHAUSTED', 'UNAVAILABLE', 'DEADLINE_EXCEEDED', 'INTERNAL'}
+THROTTLE_CODES = {429, 503}
+
+
+class AdaptiveConcurrencyLimiter:
+    """Shared cap on in-flight calls with additive increase / multiplicative decrease."""
+
+    def __init__(self, limit=4, max_limit=32, min_limit=1, increase=1.0, decrease=0.5,
+                 latency_spike=3.0):
+        self.limit = float(limit)
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_spike = latency_spike
+
+        self.in_flight = 0
+        self.latency = None  # moving average of successful call latency (seconds)
+        self.blocked_until = 0.0
+        self.decreased_at = 0.0
+        self._cond = asyncio.Condition()
+
+        self.peak_in_flight = 0
+        self.throttle_count = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one in-flight slot for the duration of a call."""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            await self.release()
+
+    async def acquire(self):
+        """Wait until a call may be sent."""
+        while True:
+            delay = self.blocked_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            async with self._cond:
+                if self.in_flight < max(self.min_limit, int(self.limit)):
+                    self.in_flight += 1
+                    self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+                    return
+                await self._cond.wait()
+
+    def try_acquire(self):
+        """Take a slot without waiting; False if none is free or calls are paused."""
+        if self.blocked_until > time.monotonic() or self.in_flight >= max(self.min_limit, int(self.limit)):
+            return False
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        return True
+
+    async def release(self):
+        """Free a slot and wake up waiting calls."""
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self, latency):
+        """A call succeeded: increase additively, or decrease on a latency spike."""
+        if self.latency is not None and latency > self.latency_spike * self.latency:
+            self._decrease()
+        else:
+            self.limit = min(self.max_limit, self.limit + self.increase / max(self.limit, 1.0))
+        self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+
+    def on_throttle(self, retry_after=None):
+        """The server pushed back: decrease and, with a hint, pause every new call."""
+        self.throttle_count += 1
+        self._decrease()
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self.decreased_at < (self.latency or 1.0):
+            return
+        self.decreased_at = now
+        self.limit = max(self.min_limit, self.limit * self.decrease)
+
+
+class LLMDispatcher:
+    """Send LLM calls through an AdaptiveConcurrencyLimiter, retrying throttled ones.
+
+    Args:
+        call: Async function `call(prompt, **kwargs) -> str` (e.g. call_llm_async)
+        limiter: Shared AdaptiveConcurrencyLimiter
+        max_attempts: Attempts per call before the error is raised
+        base_delay, max_delay: Exponential backoff bounds (seconds) without a retry hint
+    """
+
+    def __init__(self, call, limiter=None, max_attempts=6, base_delay=1.0, max_delay=60.0):
+        self.call = call
+        self.limiter = limiter or AdaptiveConcurrencyLimiter()
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.call_count = 0
+        self.retry_count = 0
+
+    async def __call__(self, prompt, **kwargs):
+        """Dispatch one call, waiting for a slot and retrying retryable errors."""
+        for attempt in range(self.max_attempts):
+            async with self.limiter.slot():
+                started = time.monotonic()
+                self.call_count += 1
+                try:
+                    result = await self.call(prompt, **kwargs)
+                except Exception as e:
+                    if not is_retryable(e) or attempt == self.max_attempts - 1:
+                        raise
+                    error = e
+                    retry_after = retry_hint(e)
+                    if is_throttle(e):
+                        self.limiter.on_throttle(retry_after)
+                else:
+                    self.limiter.on_success(time.monotonic() - started)
+                    return result
+
+            self.retry_count += 1
+            delay = retry_after or random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+            print(f"LLM call failed ({type(error).__name__}: {error_code(error)}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def summary(self):
+        """One-line summary of the dispatcher's activity."""
+        return (f"LLM dispatcher: {self.call_count} calls, {self.retry_count} retries, "
+                f"{self.limiter.throttle_count} throttled, peak {self.limiter.peak_in_flight} in flight, "
+                f"limit {self.limiter.limit:.1f}")
+
+
+def error_code(error):
+    """HTTP code of an SDK error (google.genai.errors.APIError has `.code`), if any."""
+    code = getattr(error, 'code', None) or getattr(error, 'status_code', None)
+    return code if isinstance(code, int) else None
+
+
+def is_throttle(error):
+    """Rate limit, quota or overload errors that should reduce concurrency."""
+    return error_code(error) in THROTTLE_CODES or getattr(error, 'status', None) == 'RESOURCE_EXHAUSTED'
+
+
+def is_retryable(error):
+    """Throttling, transient server errors and timeouts."""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    return error_code(error) in RETRYABLE_CODES or getattr(error, 'status', None) in RETRYABLE_STATUSES
+
+
+def retry_hint(error):
+    """Seconds the server asked to wait (RetryInfo.retryDelay or Retry-After), or None."""
+    details = getattr(error, 'details', None)
+    if isinstance(details, dict):
+        details = details.get('error', details).get('details', [])
+    for detail in details if isinstance(details, list) else []:
+        delay = isinstance(detail, dict) and detail.get('retryDelay')
+        match = delay and re.fullmatch(r'([\d.]+)s', str(delay))
+        if match:
+            return float(match.group(1))
+
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,210 @@
+"""
+Hedged LLM requests to cut tail latency.
+
+HedgedRouter sits between the dispatcher and the provider call. It keeps a
+window of recent latencies per model, and when a request is still running
+after the model's p95 (`hedge_percentile`), it sends a duplicate to the
+hedge route: the same model again, or a secondary model/provider. The first
+answer wins and the other request is cancelled. At most `max_hedge_ratio` of
+the calls are hedged, so a slow provider is not hit with twice the load.
+
+The router runs inside one dispatcher slot, so with the dispatcher's
+AdaptiveConcurrencyLimiter given as `limiter` a hedge takes a slot of its own
+and is skipped when none is free (or calls are paused after a throttle):
+hedging never pushes the calls in flight past the adaptive limit. Throttled
+hedges reduce the limit like throttled dispatcher calls.
+
+Requests referencing a provider context cache can only be hedged to another
+model when `expand(cached_content, prompt)` is given to send the prompt
+inline (the cache belongs to the primary model).
+
+StubProvider is a local provider with configurable latency and a slow tail,
+so hedging can be exercised without network access.
+"""
+import asyncio
+import random
+import time
+from collections import deque
+
+from src.llm_dispatcher import is_throttle, retry_hint
+
+
+class LatencyTracker:
+    """Recent call latencies (seconds) per model."""
+
+    def __init__(self, window=200):
+        self.window = window
+        self._samples = {}
+
+    def add(self, model, latency):
+        self._samples.setdefault(model, deque(maxlen=self.window)).append(latency)
+
+    def count(self, model):
+        return len(self._samples.get(model, ()))
+
+    def models(self):
+        return list(self._samples)
+
+    def percentile(self, model, q):
+        """Latency at quantile `q` (0-1), or None without samples."""
+        samples = sorted(self._samples.get(model, ()))
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class Route:
+    """A provider call, optionally pinned to one model.
+
+    Args:
+        call: Async `call(prompt, **kwargs) -> str` (e.g. call_llm_async)
+        model: Model sent with every request (default: the request's model)
+    """
+
+    def __init__(self, call, model=None):
+        self.call = call
+        self.model = model
+
+
+class HedgedRouter:
+    """Send each request to the primary route and hedge slow ones.
+
+    Args:
+        primary: Route (or async call) for every request
+        hedge: Route (or async call) for duplicates (default: the primary route)
+        hedge_percentile: Latency quantile after which a request is hedged
+        min_samples: Latencies needed for a model before its requests are hedged
+        max_hedge_ratio: Largest share of calls that may be hedged
+        expand: Optional `expand(cached_content, prompt) -> str` for inline hedges
+        limiter: AdaptiveConcurrencyLimiter of the dispatcher calling the router
+    """
+
+    def __init__(self, primary, hedge=None, hedge_percentile=0.95, min_samples=20,
+                 max_hedge_ratio=0.1, expand=None, limiter=None):
+        self.primary = primary if isinstance(primary, Route) else Route(primary)
+        hedge = hedge or self.primary
+        self.hedge = hedge if isinstance(hedge, Route) else Route(hedge)
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.max_hedge_ratio = max_hedge_ratio
+        self.expand = expand
+        self.limiter = limiter
+        self.latency = LatencyTracker()
+
+        self.call_count = 0
+        self.hedge_count = 0
+        self.hedge_win_count = 0
+        self.hedge_skip_count = 0
+        self.cancel_count = 0
+
+    async def __call__(self, prompt, **kwargs):
+        """Return the first successful answer of the primary or hedged request."""
+        self.call_count += 1
+        primary_kwargs = dict(kwargs, model=self.primary.model or kwargs.get('model'))
+        model = primary_kwargs['model']
+        started = time.monotonic()
+        primary = asyncio.ensure_future(self.primary.call(prompt, **primary_kwargs))
+        tasks = {primary}
+        hedge_slot = False
+        try:
+            delay = self._hedge_delay(model)
+            hedge_request = self._hedge_request(prompt, kwargs) if delay is not None else None
+            if hedge_request is not None:
+                await asyncio.wait(tasks, timeout=delay)
+            if not primary.done() and hedge_request is not None and self.limiter is not None:
+                hedge_slot = self.limiter.try_acquire()
+                if not hedge_slot:
+                    self.hedge_skip_count += 1
+                    hedge_request = None
+            if primary.done() or hedge_request is None:
+                result = await primary
+                self.latency.add(model, time.monotonic() - started)
+                return result
+
+            self.hedge_count += 1
+            hedge_prompt, hedge_kwargs = hedge_request
+            hedge_started = time.monotonic()
+            hedge = asyncio.ensure_future(self.hedge.call(hedge_prompt, **hedge_kwargs))
+            tasks.add(hedge)
+
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        # The dispatcher only sees the error it gets raised
+                        if tasks and self.limiter is not None and is_throttle(error):
+                            self.limiter.on_throttle(retry_hint(error))
+                    elif task is hedge:
+                        self.hedge_win_count += 1
+                        self.latency.add(hedge_kwargs['model'], time.monotonic() - hedge_started)
+                        return task.result()
+                    else:
+                        self.latency.add(model, time.monotonic() - started)
+                        return task.result()
+            raise error
+        finally:
+            # Cancel the slower request (or both, if the caller was cancelled)
+            pending = [task for task in tasks if not task.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                self.cancel_count += len(pending)
+                await asyncio.gather(*pending, return_exceptions=True)
+            if hedge_slot:
+                await self.limiter.release()
+
+    def _hedge_delay(self, model):
+        """Seconds to wait before hedging a request to `model` (None: do not hedge)."""
+        if self.hedge_count >= self.max_hedge_ratio * self.call_count:
+            return None
+        if self.latency.count(model) < self.min_samples:
+            return None
+        return self.latency.percentile(model, self.hedge_percentile)
+
+    def _hedge_request(self, prompt, kwargs):
+        """(prompt, kwargs) for the hedge route, or None if the request cannot be duplicated."""
+        hedge_kwargs = dict(kwargs, model=self.hedge.model or kwargs.get('model'))
+        if hedge_kwargs.get('cached_content') and hedge_kwargs['model'] != kwargs.get('model'):
+            if self.expand is None:
+                return None
+            prompt = self.expand(hedge_kwargs.pop('cached_content'), prompt)
+        return prompt, hedge_kwargs
+
+    def summary(self):
+        """One-line summary of hedging and latency percentiles per model."""
+        percentiles = ", ".join(
+            f"{model} p50 {self.latency.percentile(model, 0.5):.2f}s / p95 {self.latency.percentile(model, 0.95):.2f}s"
+            for model in self.latency.models()
+        )
+        return (f"LLM router: {self.call_count} calls, {self.hedge_count} hedged, "
+                f"{self.hedge_win_count} won by the hedge, {self.cancel_count} cancelled, "
+                f"{self.hedge_skip_count} skipped at the concurrency limit"
+                + (f" ({percentiles})" if percentiles else ""))
+
+
+class StubProvider:
+    """Local provider with random latency for offline runs and tests.
+
+    Args:
+        respond: `respond(prompt, **kwargs) -> str` (default: an empty JSON array)
+        latency: Typical latency (seconds)
+        jitter: Uniform jitter added to each call (seconds)
+        slow_rate: Share of calls that hit the slow tail
+        slow_latency: Latency of a slow call (seconds)
+    """
+
+    def __init__(self, respond=None, latency=0.05, jitter=0.02, slow_rate=0.0, slow_latency=1.0):
+        self.respond = respond or (lambda prompt, **kwargs: "[]")
+        self.latency = latency
+        self.jitter = jitter
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.call_count = 0
+
+    async def __call__(self, prompt, **kwargs):
+        self.call_count += 1
+        delay = self.slow_latency if random.random() < self.slow_rate else self.latency
+        await asyncio.sleep(delay + random.uniform(0, self.jitter))
+        return self.respond(prompt, **kwargs)
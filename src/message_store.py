@@ -0,0 +1,132 @@
+"""
+Local SQLite store for Telegram schedule messages.
+
+Messages are keyed by (group_id, topic_id, message_id). For each topic the
+store also keeps a sync state:
+    - last_message_id: newest message id already synced (high-water mark)
+    - synced_since / synced_until: the store holds every message of the topic
+      sent in [synced_since, synced_until)
+
+With that state a run only has to ask Telegram for the parts of a date window
+that are not covered yet (newer than the high-water mark via min_id, or older
+than synced_since) and can read everything else from disk.
+"""
+import os
+import sqlite3
+from datetime import datetime
+
+
+class MessageStore:
+    """Persistent message store backed by SQLite."""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS messages (
+        group_id INTEGER NOT NULL,
+        topic_id INTEGER NOT NULL,
+        message_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        sender_id INTEGER,
+        sender_name TEXT,
+        text TEXT NOT NULL DEFAULT '',
+        PRIMARY KEY (group_id, topic_id, message_id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_messages_topic_date
+        ON messages (group_id, topic_id, date);
+    CREATE TABLE IF NOT EXISTS sync_state (
+        group_id INTEGER NOT NULL,
+        topic_id INTEGER NOT NULL,
+        last_message_id INTEGER NOT NULL,
+        synced_since TEXT NOT NULL,
+        synced_until TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        PRIMARY KEY (group_id, topic_id)
+    );
+    """
+
+    def __init__(self, path):
+        dir_path = os.path.dirname(path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(self.SCHEMA)
+
+    def get_sync_state(self, group_id, topic_id):
+        """Return {'last_message_id', 'synced_since', 'synced_until'} for a topic, or None if never synced."""
+        row = self.conn.execute(
+            """SELECT last_message_id, synced_since, synced_until FROM sync_state
+               WHERE group_id = ? AND topic_id = ?""",
+            (group_id, topic_id)
+        ).fetchone()
+        if not row:
+            return None
+
+        return {
+            'last_message_id': row[0],
+            'synced_since': datetime.fromisoformat(row[1]),
+            'synced_until': datetime.fromisoformat(row[2]),
+        }
+
+    def update_sync_state(self, group_id, topic_id, last_message_id, synced_since, synced_until):
+        """Record the high-water mark and the covered date range for a topic."""
+        self.conn.execute(
+            """INSERT INTO sync_state (group_id, topic_id, last_message_id, synced_since, synced_until, updated_at)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT (group_id, topic_id) DO UPDATE SET
+                   last_message_id = excluded.last_message_id,
+                   synced_since = excluded.synced_since,
+                   synced_until = excluded.synced_until,
+                   updated_at = excluded.updated_at""",
+            (group_id, topic_id, last_message_id, synced_since.isoformat(),
+             synced_until.isoformat(), datetime.now().isoformat())
+        )
+        self.conn.commit()
+
+    def save_messages(self, group_id, topic_id, messages):
+        """Insert or update messages of a topic.
+
+        Args:
+            messages: List of dicts with keys: message_id, date (datetime),
+                sender_id, sender_name, text
+        """
+        self.conn.executemany(
+            """INSERT OR REPLACE INTO messages
+               (group_id, topic_id, message_id, date, sender_id, sender_name, text)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            [
+                (group_id, topic_id, m['message_id'], m['date'].isoformat(),
+                 m['sender_id'], m['sender_name'], m['text'] or '')
+                for m in messages
+            ]
+        )
+        self.conn.commit()
+
+    def load_messages(self, group_id, topic_id, start, end, max_message_id=None):
+        """Load messages of a topic sent in [start, end), oldest first.
+
+        Args:
+            max_message_id: Optional upper bound (inclusive) on message ids
+        """
+        query = """SELECT message_id, date, sender_id, sender_name, text FROM messages
+                   WHERE group_id = ? AND topic_id = ? AND date >= ? AND date < ?"""
+        args = [group_id, topic_id, start.isoformat(), end.isoformat()]
+        if max_message_id is not None:
+            query += " AND message_id <= ?"
+            args.append(max_message_id)
+
+        rows = self.conn.execute(query + " ORDER BY date, message_id", args).fetchall()
+
+        return [
+            {
+                'message_id': row[0],
+                'date': datetime.fromisoformat(row[1]),
+                'sender_id': row[2],
+                'sender_name': row[3],
+                'text': row[4],
+            }
+            for row in rows
+        ]
+
+    def close(self):
+        self.conn.close()
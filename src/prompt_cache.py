@@ -0,0 +1,137 @@
+"""
+Provider-side caching of the static labeling prompt.
+
+PromptCache registers a prompt prefix (system instruction + few-shot
+examples) once per run and model, and hands out the cache name so each batch
+request only sends its new messages. The cache is re-created shortly before
+its TTL ends. If the provider refuses to create it (e.g. a prompt below the
+minimum cacheable size), callers get None and fall back to inline prompts
+for the rest of the run.
+
+LocalContextCache is an in-process stand-in for the provider: it creates
+names, expires them, and expands `cached_content` back into a full prompt
+around any LLM call, so the cached path can be exercised offline.
+"""
+import asyncio
+import itertools
+import time
+
+from src.llm_dispatcher import error_code
+
+
+class PromptCache:
+    """Create-once / reuse cache names for static prompt prefixes.
+
+    Args:
+        create: Async `create(prefix, model, ttl_seconds) -> name` (e.g. create_context_cache)
+        delete: Optional async `delete(name)` called by close()
+        ttl_seconds: Lifetime requested for each cache
+        refresh_margin: Seconds before expiry after which a new cache is created
+    """
+
+    def __init__(self, create, delete=None, ttl_seconds=3600, refresh_margin=60):
+        self.create = create
+        self.delete = delete
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin = refresh_margin
+
+        self._entries = {}  # (prefix, model) -> (name, expires_at)
+        self._unavailable = set()
+        self._lock = asyncio.Lock()
+
+        self.created_count = 0
+        self.hit_count = 0
+        self.fallback_count = 0
+
+    async def get(self, prefix, model):
+        """Return a cache name for `prefix`, or None to send the prompt inline."""
+        key = (prefix, model)
+        async with self._lock:
+            if key in self._unavailable:
+                self.fallback_count += 1
+                return None
+
+            entry = self._entries.get(key)
+            if entry and time.monotonic() < entry[1] - self.refresh_margin:
+                self.hit_count += 1
+                return entry[0]
+
+            try:
+                name = await self.create(prefix, model, self.ttl_seconds)
+            except Exception as e:
+                print(f"Context caching unavailable ({type(e).__name__}: {e}), sending prompts inline")
+                self._unavailable.add(key)
+                self.fallback_count += 1
+                return None
+
+            self._entries[key] = (name, time.monotonic() + self.ttl_seconds)
+            self.created_count += 1
+            return name
+
+    def invalidate(self, name):
+        """Forget a cache the provider no longer accepts; the next get() re-creates it."""
+        for key, entry in list(self._entries.items()):
+            if entry[0] == name:
+                del self._entries[key]
+
+    async def close(self):
+        """Delete every cache created in this run."""
+        entries, self._entries = self._entries, {}
+        if self.delete:
+            for name, _ in entries.values():
+                try:
+                    await self.delete(name)
+                except Exception as e:
+                    print(f"Failed to delete context cache {name}: {e}")
+
+    def summary(self):
+        """One-line summary of cache usage."""
+        return (f"Prompt cache: {self.created_count} created, {self.hit_count} reused, "
+                f"{self.fallback_count} inline")
+
+
+class CacheNotFound(RuntimeError):
+    """LocalContextCache has no (unexpired) cache of that name."""
+
+
+def is_cache_error(error):
+    """The provider rejected a cache reference (expired, deleted or not found)."""
+    if isinstance(error, CacheNotFound):
+        return True
+    return error_code(error) in (400, 403, 404) and 'cache' in str(error).lower()
+
+
+class LocalContextCache:
+    """In-process stand-in for provider context caching."""
+
+    def __init__(self):
+        self.contents = {}  # name -> (prefix, model, expires_at)
+        self._ids = itertools.count(1)
+        self.requests = []  # (cached_content, prompt) of every wrapped call
+
+    async def create(self, prefix, model, ttl_seconds):
+        name = f"cachedContents/local-{next(self._ids)}"
+        self.contents[name] = (prefix, model, time.monotonic() + ttl_seconds)
+        return name
+
+    async def delete(self, name):
+        self.contents.pop(name, None)
+
+    def expand(self, name, prompt):
+        """Full prompt for a request referencing `name` (CacheNotFound if unknown or expired)."""
+        if name not in self.contents:
+            raise CacheNotFound(f"Cache {name} not found")
+        prefix, _, expires_at = self.contents[name]
+        if time.monotonic() >= expires_at:
+            del self.contents[name]
+            raise CacheNotFound(f"Cache {name} expired")
+        return f"{prefix}\n\n{prompt}"
+
+    def wrap(self, call):
+        """Wrap an LLM call so `cached_content` is expanded locally before calling it."""
+        async def cached_call(prompt, cached_content=None, **kwargs):
+            self.requests.append((cached_content, prompt))
+            if cached_content:
+                prompt = self.expand(cached_content, prompt)
+            return await call(prompt, **kwargs)
+        return cached_call
@@ -0,0 +1,116 @@
+"""
+Compact encoding of a labeling batch for the LLM prompt.
+
+Instead of full message ids, sender names and "YYYY-MM-DD HH:MM" timestamps,
+each row carries a row number, a sender alias, a day offset from the batch's
+anchor date, the time (Vietnam time) and the dates src/date_resolver.py
+resolved from the text:
+
+    d0=2026-01-12 (Thứ Hai)
+    i,s,d,t,r,message
+    1,s1,0,08:05,4,Em xin nghỉ phép ngày 16/1 ạ
+    2,s2,1,09:30,,Dạ em xin lên trễ 30p ạ
+    3,s1,1,10:00,?,Em xin nghỉ đầu tuần sau ạ
+
+`r` lists the resolved day offsets (suffix s / c / n for morning, afternoon
+or an unspecified half day); it is empty when the text mentions no date (the
+send day) and "?" when the dates could not be resolved.
+
+The model answers with the same row numbers and only gives day offsets when
+they differ from `r`; the codec maps rows back to message ids, fills in the
+resolved dates and flags answers that contradict them. Names never go
+through the model.
+"""
+import csv
+from datetime import timedelta
+from io import StringIO
+
+from src.date_resolver import resolve, local_day, LOCAL_TZ, MORNING, AFTERNOON, HALF_DAY
+
+WEEKDAYS = ['Thứ Hai', 'Thứ Ba', 'Thứ Tư', 'Thứ Năm', 'Thứ Sáu', 'Thứ Bảy', 'Chủ Nhật']
+
+# Offsets further than this from the anchor are treated as invalid
+MAX_DAY_OFFSET = 366
+
+CSV_FIELDS = ['i', 's', 'd', 't', 'r', 'message']
+
+HALF_SUFFIXES = {MORNING: 's', AFTERNOON: 'c', HALF_DAY: 'n'}
+
+
+class PromptCodec:
+    """Row numbers, sender aliases, day offsets and resolved dates for one batch of ScheduleMessage.
+
+    Args:
+        messages: Messages of the batch (the anchor is the earliest local send date)
+    """
+
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.days = [local_day(msg.date) for msg in self.messages]
+        self.anchor = min(self.days)
+        self.resolved = [resolve(msg.text, msg.date) for msg in self.messages]
+
+        self.aliases = {}
+        for msg in self.messages:
+            self.aliases.setdefault(msg.sender_id, f"s{len(self.aliases) + 1}")
+
+        self.date_mismatch_count = 0
+
+    def encode(self):
+        """Prompt input for the batch: anchor line and compact CSV rows."""
+        output = StringIO()
+        output.write(f"d0={self.anchor.strftime('%Y-%m-%d')} ({WEEKDAYS[self.anchor.weekday()]})\n")
+        writer = csv.writer(output, lineterminator='\n')
+        writer.writerow(CSV_FIELDS)
+        writer.writerows(
+            (row, self.aliases[msg.sender_id], (day - self.anchor).days,
+             msg.date.astimezone(LOCAL_TZ).strftime('%H:%M'), self._encode_resolved(resolved), msg.text)
+            for row, (msg, day, resolved) in enumerate(zip(self.messages, self.days, self.resolved), 1)
+        )
+        return output.getvalue()
+
+    def _encode_resolved(self, resolved):
+        if resolved is None:
+            return '?'
+        suffix = HALF_SUFFIXES.get(resolved.half, '')
+        if not resolved.explicit:
+            return suffix
+        return ';'.join(f"{(d - self.anchor).days}{suffix}" for d in resolved.dates)
+
+    def message_id(self, row):
+        """Message id of a 1-based row number (None if out of range)."""
+        if isinstance(row, int) and 1 <= row <= len(self.messages):
+            return self.messages[row - 1].message_id
+        return None
+
+    def date(self, offset):
+        """"YYYY-MM-DD" of a day offset from the anchor (None if invalid)."""
+        if not isinstance(offset, int) or abs(offset) > MAX_DAY_OFFSET:
+            return None
+        return (self.anchor + timedelta(days=offset)).strftime('%Y-%m-%d')
+
+    def dates(self, row, offsets):
+        """Dates of a labeled row, cross-checked against the resolved ones.
+
+        Args:
+            row: 1-based row number
+            offsets: Day offsets from the response (None or empty: use the resolved dates)
+
+        Returns:
+            (sorted "YYYY-MM-DD" list, whether the answer contradicts explicitly resolved dates)
+        """
+        resolved = self.resolved[row - 1]
+        expected = sorted(d.strftime('%Y-%m-%d') for d in resolved.dates) if resolved else []
+
+        answered = sorted({d for d in map(self.date, offsets or []) if d})
+        if answered:
+            dates = answered
+            mismatch = bool(resolved and resolved.explicit and answered != expected)
+        else:
+            # Nothing usable in the answer: the resolved dates (or none for "?")
+            dates = expected
+            mismatch = bool(offsets) and bool(expected)
+
+        if mismatch:
+            self.date_mismatch_count += 1
+        return dates, mismatch
@@ -0,0 +1,56 @@
+"""
+Adaptive token-bucket rate limiter for Telegram requests.
+
+One limiter is shared by all concurrent topic fetches:
+    - every page request takes one token; tokens refill at `rate` per second
+    - on FloodWaitError every caller is blocked for exactly the requested
+      number of seconds and the rate is halved
+    - every clean page raises the rate again, up to `max_rate`
+"""
+import asyncio
+import time
+
+
+class AdaptiveRateLimiter:
+    """Shared token bucket that backs off on FloodWait and speeds up on success."""
+
+    def __init__(self, rate=1.0, max_rate=5.0, min_rate=0.2, increase=0.25, burst=1):
+        self.rate = rate
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.increase = increase
+        self.burst = burst
+
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a request may be sent."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+
+                self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def on_success(self):
+        """A page came back without throttling: speed up additively."""
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_flood_wait(self, seconds):
+        """Telegram asked to wait `seconds`: pause everyone and halve the rate."""
+        now = time.monotonic()
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = 0
+        self.updated_at = now
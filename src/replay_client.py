@@ -0,0 +1,304 @@
+"""
+Offline stand-in for TelegramClient.
+
+ReplayTelegramClient implements the subset of the Telethon API used by this
+project (start, iter_messages, get_sender, get_entity, get_dialogs,
+disconnect) and serves either recorded fixtures such as
+data_raw/schedule_sample.json or a seeded generator of Vietnamese schedule
+messages. Per-page latency and FloodWaits can be injected, so fetch and
+grouping can be measured and regression-tested at 10k - 1M messages without
+a network connection.
+
+Usage:
+    client = ReplayTelegramClient.from_fixture('data_raw/schedule_sample.json', GROUP_ID, TOPIC_ID)
+    client = ReplayTelegramClient.synthetic(topics, count=100_000, start=start, end=end, seed=1)
+    flow = create_schedule_flow(client_factory=lambda: client)
+"""
+import asyncio
+import json
+import random
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+
+from telethon.errors import FloodWaitError
+
+# Telegram serves history in chunks of at most 100 messages per request
+MESSAGES_PER_REQUEST = 100
+
+LOCAL_TZ = timezone(timedelta(hours=7))
+
+LAST_NAMES = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Huỳnh', 'Phan', 'Vũ', 'Võ', 'Đặng', 'Bùi', 'Đỗ', 'Lữ']
+FIRST_NAMES = ['An', 'Bình', 'Chi', 'Dũng', 'Giang', 'Hà', 'Hoa', 'Khanh', 'Linh', 'Nam', 'Nhật',
+               'Phúc', 'Quân', 'Thắng', 'Thu', 'Tín', 'Trang', 'Tuấn', 'Vy', 'Duy Thắng', 'Minh']
+REASONS = ['bị sốt', 'có việc cá nhân', 'xe bị hư', 'đi khám bệnh', 'kẹt xe', 'nhà có việc', 'bị đau bụng']
+
+# (weight, templates) per category; {d0} is the send date, {d1}/{d2} following days (d/m)
+TEMPLATES = {
+    'tre': (20, [
+        "Dạ em xin phép thầy và anh chị cho em lên trễ tầm {hour}h ạ",
+        "Dạ em xin phép lên trễ {minutes}p do {reason} ạ",
+        "Em xin phép vào muộn một chút ạ, em {reason}",
+    ]),
+    'nghi': (15, [
+        "Em xin nghỉ phép ngày {d1} ạ",
+        "Em xin nghỉ phép ngày {d1} và {d2} ạ",
+        "Dạ em xin off hôm nay ({d0}) do {reason} ạ",
+        "Em xin nghỉ từ {d1} đến {d2} để về quê ạ",
+    ]),
+    'nua_buoi': (10, [
+        "Em xin nghỉ buổi chiều hôm nay ạ",
+        "Dạ em xin nghỉ sáng mai do {reason} ạ",
+        "Em xin phép nghỉ nửa buổi sáng ngày {d1} ạ",
+    ]),
+    'remote': (15, [
+        "Em xin phép thầy và anh chị cho em xin phép làm remote hôm nay ({d0}) do em {reason} ạ",
+        "Dạ mai em xin làm online ạ",
+        "Em xin work from home ngày {d1} ạ",
+    ]),
+    'chat': (40, [
+        "Ok giữ sk nha",
+        "rồi chiều có lên ko",
+        "Dạ vâng ạ",
+        "Mọi người nhớ cập nhật lịch tuần sau nhé",
+        "Nhớ báo trước nha em",
+    ]),
+}
+
+
+class ReplayUser:
+    """Minimal stand-in for telethon.tl.types.User."""
+    __slots__ = ('id', 'first_name', 'last_name')
+
+    def __init__(self, id, first_name, last_name=None):
+        self.id = id
+        self.first_name = first_name
+        self.last_name = last_name
+
+
+class ReplayMessage:
+    """Minimal stand-in for telethon.tl.custom.Message."""
+    __slots__ = ('id', 'date', 'sender_id', 'sender', 'text')
+
+    def __init__(self, id, date, sender_id, sender, text):
+        self.id = id
+        self.date = date
+        self.sender_id = sender_id
+        self.sender = sender
+        self.text = text
+
+    async def get_sender(self):
+        return self.sender
+
+
+class ReplayDialog:
+    """Minimal stand-in for telethon.tl.custom.Dialog."""
+
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+        self.is_group = True
+        self.is_channel = True
+        self.entity = None
+
+
+class _RecordedTopic:
+    """Messages of one topic held in memory, sorted by id."""
+
+    def __init__(self, messages):
+        self.messages = sorted(messages, key=lambda m: m.id)
+        self.ids = [m.id for m in self.messages]
+        self.dates = [m.date for m in self.messages]
+
+    def __len__(self):
+        return len(self.messages)
+
+    def message(self, index):
+        return self.messages[index]
+
+
+class _SyntheticDates:
+    """Lazy, evenly spaced (strictly increasing) send dates of a synthetic topic."""
+
+    def __init__(self, start, step, count):
+        self.start, self.step, self.count = start, step, count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        return self.start + self.step * (index + 0.5)
+
+
+class _SyntheticTopic:
+    """Seeded generator of schedule messages; messages are built on demand."""
+
+    def __init__(self, count, start, end, seed, first_id, users):
+        self.count = count
+        self.seed = seed
+        self.users = users
+        self.ids = range(first_id, first_id + count)
+        self.dates = _SyntheticDates(start, (end - start) / max(count, 1), count)
+
+        categories = list(TEMPLATES)
+        self._categories = categories
+        self._weights = [TEMPLATES[c][0] for c in categories]
+
+    def __len__(self):
+        return self.count
+
+    def message(self, index):
+        rng = random.Random(self.seed * 1_000_003 + index)
+        date = self.dates[index].replace(microsecond=0)
+        user = self.users[rng.randrange(len(self.users))]
+
+        category = rng.choices(self._categories, weights=self._weights)[0]
+        template = rng.choice(TEMPLATES[category][1])
+        local_day = date.astimezone(LOCAL_TZ)
+        text = template.format(
+            hour=rng.choice([9, 10, 11]),
+            minutes=rng.choice([15, 30, 45]),
+            reason=rng.choice(REASONS),
+            d0=f"{local_day.day}/{local_day.month}",
+            d1=self._day(local_day, 1),
+            d2=self._day(local_day, 2),
+        )
+        return ReplayMessage(self.ids[index], date, user.id, user, text)
+
+    def _day(self, local_day, offset):
+        day = local_day + timedelta(days=offset)
+        return f"{day.day}/{day.month}"
+
+
+class ReplayTelegramClient:
+    """Drop-in offline replacement for the TelegramClient calls used in this project.
+
+    Args:
+        topics: Dict mapping (group_id, topic_id) -> list of ReplayMessage
+        users: Optional list of ReplayUser resolvable through get_entity()
+        group_names: Optional dict group_id -> name for get_dialogs()
+        page_latency: Seconds slept per emulated API request
+        flood_wait_rate: Probability that a request raises FloodWaitError
+        flood_wait_seconds: Seconds requested by injected FloodWaits
+        seed: Seed for FloodWait injection
+    """
+
+    def __init__(self, topics=None, users=None, group_names=None,
+                 page_latency=0.0, flood_wait_rate=0.0, flood_wait_seconds=1, seed=0):
+        self.topics = {key: _RecordedTopic(messages) for key, messages in (topics or {}).items()}
+        self.users = {u.id: u for u in (users or [])}
+        self.group_names = group_names or {}
+        self.page_latency = page_latency
+        self.flood_wait_rate = flood_wait_rate
+        self.flood_wait_seconds = flood_wait_seconds
+        self._rng = random.Random(seed)
+
+        # Statistics
+        self.request_count = 0
+        self.flood_wait_count = 0
+
+    @classmethod
+    def from_fixture(cls, path, group_id, topic_id, **kwargs):
+        """Serve a recorded JSON fixture (list of messages, or dict with "messages").
+
+        Fixture messages have keys: id, date (ISO), sender_id, sender_name, text
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        records = data['messages'] if isinstance(data, dict) else data
+
+        users = {}
+        messages = []
+        for record in records:
+            sender_id = record.get('sender_id')
+            if sender_id is not None and sender_id not in users:
+                users[sender_id] = ReplayUser(sender_id, record.get('sender_name') or f"User {sender_id}")
+            messages.append(ReplayMessage(
+                record['id'],
+                datetime.fromisoformat(record['date']),
+                sender_id,
+                users.get(sender_id),
+                record.get('text') or ''
+            ))
+
+        return cls({(group_id, topic_id): messages}, users=list(users.values()), **kwargs)
+
+    @classmethod
+    def synthetic(cls, topics, count, start, end, seed=0, senders=50, **kwargs):
+        """Serve `count` seeded synthetic messages spread over `topics` and [start, end).
+
+        Args:
+            topics: List of (group_id, topic_id) or schedule topic dicts
+                (as returned by find_schedule_topics)
+        """
+        rng = random.Random(seed)
+        users = [
+            ReplayUser(6_000_000_000 + i, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES))
+            for i in range(senders)
+        ]
+
+        client = cls(users=users, seed=seed, **kwargs)
+        keys = [(t['group_id'], t['topic_id']) if isinstance(t, dict) else tuple(t) for t in topics]
+        for i, key in enumerate(keys):
+            topic_count = count // len(keys) + (1 if i < count % len(keys) else 0)
+            client.topics[key] = _SyntheticTopic(topic_count, start, end, seed + i, 1000, users)
+            if isinstance(topics[i], dict):
+                client.group_names[key[0]] = topics[i].get('group_name')
+        return client
+
+    async def start(self):
+        return self
+
+    async def disconnect(self):
+        pass
+
+    async def get_dialogs(self):
+        group_ids = sorted({group_id for group_id, _ in self.topics})
+        return [ReplayDialog(g, self.group_names.get(g) or f"Group {g}") for g in group_ids]
+
+    async def get_entity(self, entity):
+        await self._request()
+        if isinstance(entity, (list, tuple)):
+            return [self._get_user(e) for e in entity]
+        return self._get_user(entity)
+
+    def _get_user(self, user_id):
+        if user_id not in self.users:
+            raise ValueError(f"Could not find the input entity for {user_id}")
+        return self.users[user_id]
+
+    async def iter_messages(self, entity, limit=None, *, offset_date=None, offset_id=0,
+                            max_id=0, min_id=0, reply_to=None, **kwargs):
+        """Yield messages newest first, one emulated request per 100 messages."""
+        topic = self.topics.get((entity, reply_to))
+
+        lo, hi = 0, len(topic) if topic else 0
+        if topic:
+            if offset_id:
+                hi = min(hi, bisect_left(topic.ids, offset_id))
+            if max_id:
+                hi = min(hi, bisect_left(topic.ids, max_id))
+            if offset_date:
+                # Messages *previous* to offset_date (exclusive)
+                hi = min(hi, bisect_left(topic.dates, offset_date))
+            if min_id:
+                lo = bisect_right(topic.ids, min_id)
+
+        remaining = float('inf') if limit is None else limit
+        while True:
+            await self._request()
+            chunk = int(min(MESSAGES_PER_REQUEST, remaining, max(hi - lo, 0)))
+            for index in range(hi - 1, hi - chunk - 1, -1):
+                yield topic.message(index)
+            hi -= chunk
+            remaining -= chunk
+            if chunk < MESSAGES_PER_REQUEST or remaining <= 0 or hi <= lo:
+                return
+
+    async def _request(self):
+        """Emulate one API round trip: latency and optional FloodWait."""
+        self.request_count += 1
+        if self.page_latency:
+            await asyncio.sleep(self.page_latency)
+        if self.flood_wait_rate and self._rng.random() < self.flood_wait_rate:
+            self.flood_wait_count += 1
+            raise FloodWaitError(request=None, capture=self.flood_wait_seconds)
@@ -0,0 +1,140 @@
+"""
+Deterministic rule-based classifier for formulaic Vietnamese schedule messages.
+
+Rules run on diacritic-stripped, lowercased text ("Em xin nghỉ phép ngày 16/1"
+-> "em xin nghi phep ngay 16/1"). Each message gets one of three decisions:
+
+- LABEL: a request ("xin ...") matching exactly one category, with dates
+  that src/date_resolver.py can resolve (d/m dates, "hôm nay", "ngày mai", or
+  none) and no vague period or day count that disagrees with them, in a
+  single clause with a single date expression
+- SKIP: obviously not a request (fewer than 4 words, or no schedule keyword)
+- AMBIGUOUS: everything else, left to the LLM
+"""
+import re
+
+from src.date_resolver import strip_diacritics, local_day, resolve_stripped, VAGUE, MORNING, AFTERNOON
+
+LABEL = 'label'
+SKIP = 'skip'
+AMBIGUOUS = 'ambiguous'
+
+MIN_WORDS = 4
+INFO_MAX_LENGTH = 50
+
+KEYWORDS = re.compile(
+    r'\b(nghi|off|phep|tre|muon|remote|online|wfh|work from home|o nha|vang|buoi|xin)\b'
+)
+REQUEST = re.compile(r'\bxin\b')
+# Negation, questions, cancellations, changes, contrasts and make-up time need the LLM
+UNCERTAIN = re.compile(
+    r'\?|\b(khong|ko|k|chua|huy|doi|nham|lui|hoan|neu|hay|hoac|tuan|thu|chu nhat|nhung|van|bu|som)\b'
+)
+# A second clause ("..., sáng mai em lên sớm") may change the request; ", do ..." is a reason
+CLAUSE_BREAK = re.compile(r'[,;.!] *(?!(?:do|vi) )[a-z]|\b(roi|con|sau do)\b')
+GREETING = re.compile(r'^(?:da|vang|thua \w+)(?: a)? *[,.!]* *')
+
+CATEGORY_PATTERNS = {
+    'remote': re.compile(r'\b(remote|online|wfh|work from home|lam (o|tai) nha)\b'),
+    'tre': re.compile(r'\b(len|di|vao|den) (tre|muon)\b|\b(tre|muon) (mot chut|\d+ ?(p|phut|h|tieng))\b'),
+    'nua_buoi': re.compile(r'\b(nghi|off)\b.*\b(nua buoi|nua ngay|buoi sang|buoi chieu|sang|chieu)\b'),
+    'nghi': re.compile(r'\b(nghi|off)\b'),
+}
+
+HOUR = re.compile(r'\b(\d{1,2}) ?(h|gio)\b')
+MINUTES = re.compile(r'\b(\d{1,3}) ?(p|phut)\b')
+REASON = re.compile(r'\b(?:do|vi) (.+?)(?: (?:a|nha|nhe|ak))?[.!]*$')
+
+
+class RuleResult:
+    """Decision for one message; `label` is set for LABEL decisions.
+
+    Attributes:
+        decision: LABEL, SKIP or AMBIGUOUS
+        category: nghi, tre, nua_buoi or remote (LABEL only)
+        label: Labeled item {message_id, name, dates, info} (LABEL only)
+    """
+    __slots__ = ('decision', 'category', 'label')
+
+    def __init__(self, decision, category=None, label=None):
+        self.decision = decision
+        self.category = category
+        self.label = label
+
+
+def classify(message):
+    """Classify a ScheduleMessage with the rules."""
+    text = strip_diacritics(message.text)
+
+    if len(text.split()) < MIN_WORDS or not KEYWORDS.search(text):
+        return RuleResult(SKIP)
+
+    # Nothing re-checks rule labels downstream, so vague periods go to the LLM
+    # even when some date resolved ("3 ngày từ mai" is caught by the resolver)
+    if not REQUEST.search(text) or UNCERTAIN.search(text) or VAGUE.search(text):
+        return RuleResult(AMBIGUOUS)
+
+    if CLAUSE_BREAK.search(GREETING.sub('', text)):
+        return RuleResult(AMBIGUOUS)
+
+    # "sáng" / "chiều" in "do sáng em đi khám" say nothing about the request
+    reason = REASON.search(text)
+    request = text[:reason.start()] if reason else text
+
+    categories = [c for c, pattern in CATEGORY_PATTERNS.items() if pattern.search(request)]
+    # nua_buoi requests also match nghi
+    if 'nua_buoi' in categories:
+        categories.remove('nghi')
+    if len(categories) != 1:
+        return RuleResult(AMBIGUOUS)
+
+    category = categories[0]
+    sent_day = local_day(message.date)
+    resolved = resolve_stripped(text, sent_day)
+    if not resolved or resolved.expressions > 1 or (category != 'nghi' and len(resolved.dates) > 1):
+        return RuleResult(AMBIGUOUS)
+    # A date in the reason clause ("do hôm qua em ốm") may or may not be the
+    # requested one; the half-day marker only counts in the request itself
+    requested = resolve_stripped(request, sent_day) if reason else resolved
+    if not requested or requested.dates != resolved.dates:
+        return RuleResult(AMBIGUOUS)
+
+    return RuleResult(LABEL, category, {
+        'message_id': message.message_id,
+        'name': message.name,
+        'dates': [d.strftime('%Y-%m-%d') for d in resolved.dates],
+        'info': _info(category, text, message.text, len(resolved.dates), requested.half),
+    })
+
+
+def _info(category, text, original, day_count, half=None):
+    """Short Vietnamese description like the ones the LLM writes."""
+    if category == 'tre':
+        hour, minutes = HOUR.search(text), MINUTES.search(text)
+        if hour:
+            info = f"Lên trễ đến {hour.group(1)}h"
+        elif minutes:
+            info = f"Lên trễ {minutes.group(1)}p"
+        else:
+            info = "Lên trễ"
+    elif category == 'nua_buoi':
+        if half == MORNING:
+            info = "Nghỉ buổi sáng"
+        elif half == AFTERNOON:
+            info = "Nghỉ buổi chiều"
+        else:
+            info = "Nghỉ nửa buổi"
+    elif category == 'remote':
+        info = "Làm remote"
+    else:
+        info = f"Nghỉ phép {day_count} ngày" if day_count > 1 else "Nghỉ phép"
+
+    # Keep the reason from the original text ("do em bị sốt"); stripping
+    # diacritics keeps words aligned with the original
+    reason = REASON.search(text)
+    if reason:
+        first = len(text[:reason.start(1)].split())
+        words = original.split()[first:first + len(reason.group(1).split())]
+        info = f"{info} do {' '.join(words)}"
+
+    return info if len(info) <= INFO_MAX_LENGTH else info[:INFO_MAX_LENGTH].rsplit(' ', 1)[0]
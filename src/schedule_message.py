@@ -0,0 +1,38 @@
+"""
+Compact in-memory record for schedule messages passed between nodes.
+
+Nodes share lists of ScheduleMessage (with pre-parsed, timezone-aware send
+dates) through the shared store. The LLM prompt rows are built from them by
+src/prompt_codec.py.
+"""
+DATE_FORMAT = '%Y-%m-%d %H:%M'
+
+
+class ScheduleMessage:
+    """One schedule message.
+
+    Attributes:
+        message_id: Telegram message id
+        group_id: Telegram group id the message belongs to
+        sender_id: Telegram sender id
+        name: Sender display name
+        date: Send time (timezone-aware datetime, UTC)
+        text: Message text
+    """
+    __slots__ = ('message_id', 'group_id', 'sender_id', 'name', 'date', 'text')
+
+    def __init__(self, message_id, group_id, sender_id, name, date, text):
+        self.message_id = message_id
+        self.group_id = group_id
+        self.sender_id = sender_id
+        self.name = name
+        self.date = date
+        self.text = text
+
+    @property
+    def date_str(self):
+        """Send time as "YYYY-MM-DD HH:MM" (the format used in reports)."""
+        return self.date.strftime(DATE_FORMAT)
+
+    def __repr__(self):
+        return f"ScheduleMessage({self.message_id}, {self.name!r}, {self.date_str}, {self.text[:30]!r})"
@@ -0,0 +1,124 @@
+"""
+Batched sender-name resolution with a persistent id -> name cache.
+
+Instead of awaiting message.get_sender() for every message, the resolver
+looks at the distinct sender ids of a whole page, reuses cached names,
+takes names from the entities Telegram already attached to the page and
+resolves the remaining ids with a single bulk get_entity() request. Telethon
+fails the whole list when one id cannot be resolved (deleted account, no
+access hash), so a failed request is split in half and retried until the
+bad ids are isolated; ids that stay unresolved are not cached.
+"""
+import json
+import os
+import time
+
+from telethon import utils
+
+
+def get_sender_name(sender):
+    """Build a display name from a Telethon User/Chat/Channel entity."""
+    if not sender:
+        return None
+
+    if hasattr(sender, 'first_name'):
+        sender_name = sender.first_name or ''
+        if getattr(sender, 'last_name', None):
+            sender_name += f" {sender.last_name}"
+        return sender_name or None
+    if hasattr(sender, 'title'):
+        return sender.title
+    return None
+
+
+class SenderResolver:
+    """Resolve sender ids to display names with an on-disk cache and TTL."""
+
+    def __init__(self, path, ttl=7 * 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self.cache = {}
+        self._dirty = False
+
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.cache = json.load(f)
+
+    def get(self, sender_id):
+        """Return the cached name of a sender, or None if unknown or expired."""
+        entry = self.cache.get(str(sender_id))
+        if not entry or time.time() - entry['updated_at'] > self.ttl:
+            return None
+        return entry['name']
+
+    def put(self, sender_id, name):
+        self.cache[str(sender_id)] = {'name': name, 'updated_at': time.time()}
+        self._dirty = True
+
+    async def resolve_page(self, client, messages):
+        """Resolve the senders of a page of messages.
+
+        Args:
+            client: TelegramClient (or any client exposing get_entity)
+            messages: Telethon messages of one page
+
+        Returns:
+            Dict mapping sender_id -> display name (None if unresolved)
+        """
+        names = {}
+        unknown = set()
+        for message in messages:
+            sender_id = message.sender_id
+            if sender_id is None or sender_id in names:
+                continue
+
+            name = self.get(sender_id)
+            if name is None:
+                # Entities returned with the page are free, no extra request
+                name = get_sender_name(getattr(message, 'sender', None))
+                if name is not None:
+                    self.put(sender_id, name)
+            names[sender_id] = name
+            if name is None:
+                unknown.add(sender_id)
+
+        if unknown:
+            for entity in await self._get_entities(client, sorted(unknown)):
+                name = get_sender_name(entity)
+                if name is not None:
+                    sender_id = self._peer_id(entity)
+                    names[sender_id] = name
+                    self.put(sender_id, name)
+
+        return names
+
+    async def _get_entities(self, client, ids):
+        """Bulk get_entity(), bisecting the ids when Telegram rejects the request."""
+        try:
+            return await client.get_entity(ids)
+        except (ValueError, TypeError) as e:
+            if len(ids) == 1:
+                print(f"Warning: could not resolve sender {ids[0]}: {e}")
+                return []
+        middle = len(ids) // 2
+        return await self._get_entities(client, ids[:middle]) + await self._get_entities(client, ids[middle:])
+
+    def _peer_id(self, entity):
+        """Return the id Telegram uses as message.sender_id for an entity."""
+        if hasattr(entity, 'first_name'):
+            return entity.id
+        # Chats and channels are addressed with marked (negative) ids
+        return utils.get_peer_id(entity)
+
+    def save(self):
+        """Write the cache to disk if it changed."""
+        if not self.path or not self._dirty:
+            return
+
+        dir_path = os.path.dirname(self.path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(self.cache, f, ensure_ascii=False)
+        self._dirty = False
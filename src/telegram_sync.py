@@ -0,0 +1,218 @@
+"""
+Incremental sync of Telegram topic messages into the local MessageStore.
+
+Shared by FetchTelegramMessagesNode and scripts/fetch_schedule_messages.py.
+"""
+import json
+from datetime import datetime, timezone
+
+from telethon.errors import FloodWaitError
+
+# Telegram returns at most 100 messages per history request,
+# so one page here is one API call and one rate-limiter token
+MESSAGES_PER_REQUEST = 100
+
+
+def find_schedule_topics(dialog_info_path):
+    """Find all groups with topics named 'schedule' (case-insensitive)."""
+    with open(dialog_info_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    schedule_topics = []
+    for group in data.get('groups_and_channels', []):
+        for topic in group.get('topics', []):
+            if topic.get('title', '').lower() == 'schedule':
+                schedule_topics.append({
+                    'group_id': group['id'],
+                    'group_name': group['name'],
+                    'topic_id': topic['id'],
+                    'topic_name': topic['title']
+                })
+
+    return schedule_topics
+
+
+def month_window(year, month):
+    """Return the [start, end) UTC datetimes of a calendar month."""
+    start = datetime(year, month, 1, tzinfo=timezone.utc)
+    if month == 12:
+        end = datetime(year + 1, 1, 1, tzinfo=timezone.utc)
+    else:
+        end = datetime(year, month + 1, 1, tzinfo=timezone.utc)
+    return start, end
+
+
+async def sync_topic(client, store, resolver, limiter, group_id, topic_id, start, end, verbose=False,
+                     on_progress=None):
+    """Sync one topic for the date window [start, end) and return its messages.
+
+    Only the parts of the window the store does not cover yet are requested:
+        - newer than the covered range: seek to `end` with offset_date and
+          stop at the high-water mark (min_id)
+        - older than the covered range: seek to the covered start and page
+          back until crossing `start`
+    A window that does not touch the covered range is fetched on its own by
+    seeking straight to `end`. There is no message-count ceiling.
+
+    Sender names are resolved once per page through the SenderResolver and
+    every page request goes through the shared AdaptiveRateLimiter.
+
+    If `on_progress` is given, it is awaited as on_progress(messages, covered_since)
+    while the sync runs: messages are emitted newest first (fetched pages and
+    the part already on disk), and covered_since means every message of the
+    window sent at or after it has been emitted. The last call has
+    covered_since == start.
+
+    Returns:
+        List of message dicts (oldest first) with keys:
+        message_id, date, sender_id, sender_name, text
+    """
+    # Messages sent after this moment cannot be in the store yet
+    synced_at = datetime.now(timezone.utc)
+    state = store.get_sync_state(group_id, topic_id)
+
+    touches_coverage = (
+        state is not None
+        and state['synced_since'] <= end
+        and start <= state['synced_until']
+    )
+
+    async def on_page(page):
+        # Every message newer than the oldest one of a page has been emitted
+        if on_progress and page:
+            await on_progress(page, page[-1]['date'])
+
+    fetched = []
+    if touches_coverage:
+        last_message_id = state['last_message_id']
+        synced_since = state['synced_since']
+        synced_until = state['synced_until']
+
+        if end > synced_until:
+            if verbose:
+                print(f"  Fetching messages newer than id {last_message_id} before {end.strftime('%Y-%m-%d')}")
+            fetched += await _fetch_range(
+                client, resolver, limiter, group_id, topic_id,
+                offset_date=end, stop_before=None, min_id=last_message_id, verbose=verbose, on_page=on_page
+            )
+            synced_until = min(end, synced_at)
+
+        if on_progress:
+            # The covered part of the window is already on disk
+            stored_since = max(start, synced_since)
+            stored = store.load_messages(group_id, topic_id, stored_since, end, max_message_id=last_message_id)
+            await on_progress(stored[::-1], stored_since)
+
+        if start < synced_since:
+            if verbose:
+                print(f"  Fetching messages from {start.strftime('%Y-%m-%d')} to {synced_since.strftime('%Y-%m-%d')}")
+            fetched += await _fetch_range(
+                client, resolver, limiter, group_id, topic_id,
+                offset_date=synced_since, stop_before=start, min_id=0, verbose=verbose, on_page=on_page
+            )
+            synced_since = start
+    else:
+        if verbose:
+            print(f"  Fetching messages from {start.strftime('%Y-%m-%d')} to {end.strftime('%Y-%m-%d')}")
+        fetched += await _fetch_range(
+            client, resolver, limiter, group_id, topic_id,
+            offset_date=end, stop_before=start, min_id=0, verbose=verbose, on_page=on_page
+        )
+        last_message_id = 0
+        synced_since = start
+        synced_until = min(end, synced_at)
+
+    if on_progress:
+        await on_progress([], start)
+
+    store.save_messages(group_id, topic_id, fetched)
+
+    # A window older than (and detached from) the covered range keeps the newer coverage
+    if touches_coverage or state is None or end > state['synced_since']:
+        last_message_id = max([last_message_id] + [m['message_id'] for m in fetched])
+        store.update_sync_state(group_id, topic_id, last_message_id, synced_since, synced_until)
+
+    return store.load_messages(group_id, topic_id, start, end)
+
+
+async def _fetch_range(client, resolver, limiter, group_id, topic_id, offset_date, stop_before, min_id,
+                       verbose=False, on_page=None):
+    """Stream pages of a topic backwards from `offset_date`.
+
+    Stops when a message older than `stop_before` is reached or Telegram has
+    no more messages (above `min_id`). Each page of message dicts (newest
+    first) is passed to the optional async `on_page` callback.
+    """
+    fetched = []
+    offset_id = 0
+    request_count = 0
+
+    while True:
+        request_count += 1
+        if verbose:
+            print(f"  Request {request_count}: Fetching {MESSAGES_PER_REQUEST} messages (offset_id={offset_id})...")
+
+        while True:
+            await limiter.acquire()
+            try:
+                page, reached_stop = await _fetch_page(
+                    client, group_id, topic_id,
+                    # The first page seeks by date, following pages continue from the last id
+                    offset_date=None if offset_id else offset_date,
+                    offset_id=offset_id,
+                    min_id=min_id,
+                    stop_before=stop_before
+                )
+                limiter.on_success()
+                break
+            except FloodWaitError as e:
+                if verbose:
+                    print(f"  FloodWait: Telegram asked to wait {e.seconds} second(s)")
+                limiter.on_flood_wait(e.seconds)
+
+        if page:
+            offset_id = page[-1].id
+
+        sender_names = await resolver.resolve_page(client, page)
+        records = [
+            {
+                'message_id': message.id,
+                'date': message.date,
+                'sender_id': message.sender_id,
+                'sender_name': sender_names.get(message.sender_id),
+                'text': message.text or '',
+            }
+            for message in page
+        ]
+        fetched.extend(records)
+        if on_page:
+            await on_page(records)
+        if verbose and page:
+            print(f"  Fetched {len(page)} messages. Total: {len(fetched)}")
+
+        if reached_stop or len(page) < MESSAGES_PER_REQUEST:
+            return fetched
+
+
+async def _fetch_page(client, group_id, topic_id, offset_date, offset_id, min_id, stop_before):
+    """Fetch one page of a topic, newest first.
+
+    Returns:
+        tuple: (messages, reached_stop) - reached_stop is True when the page
+        ran into a message older than `stop_before`
+    """
+    page = []
+    async for message in client.iter_messages(
+        group_id,
+        reply_to=topic_id,
+        limit=MESSAGES_PER_REQUEST,
+        offset_date=offset_date,
+        offset_id=offset_id,
+        min_id=min_id
+    ):
+        # Stop if message is older than the requested start date
+        if stop_before and message.date and message.date < stop_before:
+            return page, True
+        page.append(message)
+
+    return page, False
@@ -0,0 +1,33 @@
+"""
+Rough token estimates used to size LLM labeling requests.
+
+No tokenizer is needed: Vietnamese text with diacritics averages about three
+characters per token on Gemini, and each CSV row / JSON entry has a roughly
+fixed overhead. Estimates only need to be close enough to keep a request
+under the input and output budgets.
+"""
+import math
+
+CHARS_PER_TOKEN = 3
+
+# Row number, sender alias, day offset, time, resolved dates and CSV punctuation of one input row
+INPUT_ROW_OVERHEAD = 10
+
+# JSON keys, row number, category, confidence and a ~50 character info of one entry
+# (day offsets are only sent when they differ from the resolved dates)
+OUTPUT_ITEM_OVERHEAD = 28
+
+
+def estimate_tokens(text):
+    """Estimate the number of tokens in a piece of text."""
+    return math.ceil(len(text or '') / CHARS_PER_TOKEN)
+
+
+def estimate_input_tokens(message):
+    """Estimate the prompt tokens of one ScheduleMessage CSV row."""
+    return INPUT_ROW_OVERHEAD + estimate_tokens(message.text)
+
+
+def estimate_output_tokens(message):
+    """Estimate the response tokens if a ScheduleMessage gets labeled (worst case)."""
+    return OUTPUT_ITEM_OVERHEAD
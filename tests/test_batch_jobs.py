@@ -0,0 +1,98 @@
+import asyncio
+import json
+
+import pytest
+
+from src.batch_jobs import (
+    BatchJobClient, BatchJobError, LocalBatchProvider, SUCCEEDED, response_line, parse_response_line,
+)
+
+
+class FileProvider:
+    """Finishes every job at once with the result lines `respond(lines)` returns."""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.jobs = {}
+
+    async def submit(self, job_path, model):
+        with open(job_path, encoding='utf-8') as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+        job_id = f"job-{len(self.jobs) + 1}"
+        self.jobs[job_id] = (model, lines)
+        return job_id
+
+    async def status(self, job_id):
+        return SUCCEEDED, job_id
+
+    async def results(self, job_id):
+        _, lines = self.jobs[job_id]
+        return '\n'.join(json.dumps(line) for line in self.respond(lines)).encode('utf-8')
+
+
+def prompt_of(line):
+    return line['request']['contents'][0]['parts'][0]['text']
+
+
+def test_per_request_error_and_missing_result(tmp_path):
+    def respond(lines):
+        by_prompt = {prompt_of(line): line['key'] for line in lines}
+        return [
+            response_line(by_prompt['ok'], '[]'),
+            response_line(by_prompt['bad'], error="quota exceeded"),
+            # no line for "lost"
+        ]
+
+    provider = FileProvider(respond)
+    client = BatchJobClient(provider, str(tmp_path), gather_window=0.01)
+
+    async def run():
+        return await asyncio.gather(
+            client('ok', model='m'), client('bad', model='m'), client('lost', model='m'),
+            return_exceptions=True,
+        )
+
+    ok, bad, lost = asyncio.run(run())
+    assert ok == '[]'
+    assert isinstance(bad, BatchJobError) and "quota exceeded" in str(bad)
+    assert isinstance(lost, BatchJobError) and "no result" in str(lost)
+    # All three requests went into one job file
+    assert len(provider.jobs) == 1
+    assert (client.job_count, client.request_count, client.failed_count) == (1, 3, 2)
+    assert len(list(tmp_path.glob('*.jsonl'))) == 1
+
+
+def test_one_job_per_model(tmp_path):
+    provider = FileProvider(lambda lines: [response_line(line['key'], prompt_of(line)) for line in lines])
+    client = BatchJobClient(provider, str(tmp_path), gather_window=0.01)
+
+    async def run():
+        return await asyncio.gather(client('a', model='cheap'), client('b', model='strong'), client('c', model='cheap'))
+
+    assert asyncio.run(run()) == ['a', 'b', 'c']
+    assert sorted((model, len(lines)) for model, lines in provider.jobs.values()) == [('cheap', 2), ('strong', 1)]
+
+
+def test_local_provider_reports_call_errors(tmp_path):
+    async def call(prompt, **kwargs):
+        if prompt == 'bad':
+            raise ValueError("boom")
+        return prompt.upper()
+
+    client = BatchJobClient(LocalBatchProvider(call), str(tmp_path), gather_window=0.01)
+
+    async def run():
+        return await asyncio.gather(client('ok'), client('bad'), return_exceptions=True)
+
+    ok, bad = asyncio.run(run())
+    assert ok == 'OK'
+    assert isinstance(bad, BatchJobError) and "boom" in str(bad)
+
+
+@pytest.mark.parametrize('line, expected', [
+    (response_line('k', 'text'), ('k', 'text', None)),
+    (response_line('k', error='failed'), ('k', None, 'failed')),
+    ({'key': 'k', 'response': {'candidates': []}}, ('k', None, 'empty response')),
+])
+def test_parse_response_line(line, expected):
+    assert parse_response_line(line) == expected
@@ -0,0 +1,20 @@
+import asyncio
+import importlib
+
+import pytest
+
+# utils re-exports the call_llm function under the module's name
+call_llm_module = importlib.import_module('utils.call_llm')
+
+
+@pytest.fixture
+def no_api_key(monkeypatch):
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    monkeypatch.setattr(call_llm_module, '_client', None)
+
+
+def test_calls_without_an_api_key_raise(no_api_key):
+    with pytest.raises(RuntimeError, match="GEMINI_API_KEY"):
+        asyncio.run(call_llm_module.call_llm_async("prompt"))
+    with pytest.raises(RuntimeError, match="GEMINI_API_KEY"):
+        call_llm_module.call_llm("prompt")
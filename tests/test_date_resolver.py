@@ -0,0 +1,53 @@
+from datetime import date, datetime, timezone
+
+import pytest
+
+from src.date_resolver import resolve, resolve_stripped, strip_diacritics, MORNING
+
+# Thursday 2026-01-15, 09:00 Vietnam time
+SENT_AT = datetime(2026, 1, 15, 2, 0, tzinfo=timezone.utc)
+SENT_DAY = date(2026, 1, 15)
+
+
+def dates(text):
+    resolved = resolve(text, SENT_AT)
+    return None if resolved is None else [d.isoformat() for d in resolved.dates]
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("Em xin nghỉ phép ngày 16/1 ạ", ['2026-01-16']),
+    ("Em xin nghỉ từ 16 đến 19/1", ['2026-01-16', '2026-01-17', '2026-01-18', '2026-01-19']),
+    ("Em xin nghỉ 16, 17/1", ['2026-01-16', '2026-01-17']),
+    ("Em xin nghỉ hôm nay ạ", ['2026-01-15']),
+    ("Em xin nghỉ ngày mai ạ", ['2026-01-16']),
+    ("Em xin nghỉ mai và mốt ạ", ['2026-01-16', '2026-01-17']),
+    ("xin nghỉ 2 ngày mai và mốt", ['2026-01-16', '2026-01-17']),
+    ("Em xin nghỉ thứ 2 tuần sau", ['2026-01-19']),
+    ("Em xin nghỉ thứ 3 ngày 20/1", ['2026-01-20']),
+    ("Em xin lên trễ 30p", ['2026-01-15']),
+])
+def test_resolves_dates(text, expected):
+    assert dates(text) == expected
+
+
+@pytest.mark.parametrize('text', [
+    # "Mai" is a name here, not "tomorrow"
+    "Chị Mai xin nghỉ hôm nay ạ",
+    "Mai xin nghỉ ngày mai ạ",
+    # Stated day counts that differ from the resolved dates
+    "Em xin nghỉ phép 3 ngày từ mai ạ",
+    "xin nghỉ 2 ngày 16 17/1",
+    # Vague or invalid
+    "Em xin nghỉ vài ngày",
+    "Em xin nghỉ đầu tuần sau",
+    "Em xin nghỉ 31/2",
+])
+def test_unresolvable_dates_are_left_to_the_llm(text):
+    assert dates(text) is None
+
+
+def test_half_day_and_implicit_send_day():
+    resolved = resolve_stripped(strip_diacritics("Em xin nghỉ buổi sáng ạ"), SENT_DAY)
+    assert resolved.dates == [SENT_DAY]
+    assert resolved.half == MORNING
+    assert not resolved.explicit
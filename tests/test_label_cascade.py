@@ -0,0 +1,55 @@
+import pytest
+
+from src.label_cascade import select_escalations
+
+
+class Message:
+    def __init__(self, message_id):
+        self.message_id = message_id
+
+
+MESSAGES = [Message(i) for i in range(1, 6)]
+
+
+def ids(messages):
+    return [msg.message_id for msg in messages]
+
+
+def test_resolved_messages_below_the_threshold_are_escalated_lowest_first():
+    confidence = {1: 0.95, 2: 0.5, 3: 0.8, 4: 0.3, 5: 0.7}
+
+    escalated, capped = select_escalations(MESSAGES, MESSAGES, confidence, threshold=0.75)
+
+    assert ids(escalated) == [4, 2, 5]
+    assert capped == 0
+
+
+def test_a_confidence_at_the_threshold_is_kept():
+    escalated, _ = select_escalations(MESSAGES[:1], MESSAGES[:1], {1: 0.75}, threshold=0.75)
+    assert escalated == []
+
+
+def test_unresolved_messages_and_missing_confidences_are_always_escalated():
+    # 2 was not accounted for (e.g. an unknown category), 3 came without "p"
+    resolved = [MESSAGES[0], MESSAGES[2]]
+
+    escalated, capped = select_escalations(MESSAGES[:3], resolved, {1: 0.9}, threshold=0.75, max_rate=0.0)
+
+    assert ids(escalated) == [2]
+    assert capped == 1
+
+    escalated, _ = select_escalations(MESSAGES[:3], resolved, {1: 0.9}, threshold=0.75)
+    assert ids(escalated) == [2, 3]
+
+
+@pytest.mark.parametrize('max_rate, expected, capped', [(0.4, [4, 2], 2), (0.2, [4], 3), (1.0, [4, 2, 5, 3], 0)])
+def test_max_rate_caps_low_confidence_escalations(max_rate, expected, capped):
+    confidence = {1: 0.95, 2: 0.5, 3: 0.8, 4: 0.3, 5: 0.7}
+
+    assert select_escalations(MESSAGES, MESSAGES, confidence, threshold=0.9, max_rate=max_rate) == (
+        [msg for i in expected for msg in MESSAGES if msg.message_id == i], capped
+    )
+
+
+def test_empty_input():
+    assert select_escalations([], [], {}, threshold=0.75, max_rate=0.5) == ([], 0)
@@ -0,0 +1,142 @@
+import asyncio
+import csv
+import json
+from datetime import datetime, timezone
+from io import StringIO
+
+from nodes.label_schedule_messages import LabelScheduleMessagesNode
+from src import config
+from src.schedule_message import ScheduleMessage
+
+# Thursday 2026-01-15, 09:00 Vietnam time
+SENT_AT = datetime(2026, 1, 15, 2, 0, tzinfo=timezone.utc)
+
+
+def rows(prompt):
+    """{row number: message text} of the CSV in a labeling prompt."""
+    body = prompt.rsplit('i,s,d,t,r,message\n', 1)[1].split('\nOutput (JSON):', 1)[0]
+    return {int(row[0]): row[5] for row in csv.reader(StringIO(body)) if row}
+
+
+def create_node(tmp_path, answer, **kwargs):
+    """Label node with a local cache and a fake LLM; `answer(rows)` returns the response items."""
+    prompts = []
+
+    async def provider(prompt, **_):
+        prompts.append(rows(prompt))
+        return json.dumps(answer(prompts[-1]))
+
+    options = dict(cache_path=str(tmp_path / 'labels.db'), context_cache='off', hedge='off', cascade_model='',
+                   provider=provider, mode='interactive')
+    node = LabelScheduleMessagesNode(**dict(options, **kwargs))
+    return node, prompts
+
+
+def label_leave_requests(batch):
+    return [{'i': i, 'c': 'nghi' if 'nghỉ' in text else 'none', 'p': 0.9} for i, text in batch.items()]
+
+
+def week(*texts):
+    """Week batch of messages with ids 1, 2, ... sent at SENT_AT."""
+    return {'week_key': '2026-01-12', 'week_range': '12/01 - 18/01', 'messages': [
+        ScheduleMessage(i, -100, 7, "An", SENT_AT, text) for i, text in enumerate(texts, 1)
+    ]}
+
+
+def test_unpacked_weeks_with_the_same_message_id_in_two_groups(tmp_path):
+    node, prompts = create_node(tmp_path, label_leave_requests)
+    week = {'week_key': '2026-01-12', 'week_range': '12/01 - 18/01', 'messages': [
+        ScheduleMessage(1, -100, 7, "An", SENT_AT, "Em xin nghỉ phép ngày 16/1 ạ"),
+        ScheduleMessage(1, -200, 8, "Bình", SENT_AT, "Mọi người nhớ cập nhật lịch nhé"),
+    ]}
+    shared = {'weekly_messages': [week]}
+
+    asyncio.run(node.run_async(shared))
+
+    # One request per group, so row numbers never mix the two messages with id 1
+    assert len(prompts) == 2
+    assert shared['labeled_messages']['nghi'] == [
+        {'message_id': 1, 'name': "An", 'dates': ['2026-01-16'], 'info': ''},
+    ]
+    assert shared['weekly_labeled_messages'][0]['labels']['nghi'] == shared['labeled_messages']['nghi']
+    assert shared['unresolved_messages'] == []
+
+
+class Unavailable(Exception):
+    code = 503
+
+
+def test_only_the_dispatcher_retries_a_failing_batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'LLM_MAX_ATTEMPTS', 3)
+    monkeypatch.setattr(config, 'LLM_BACKOFF_MAX', 0.001)
+
+    def unavailable(batch):
+        raise Unavailable()
+
+    node, prompts = create_node(tmp_path, unavailable)
+    shared = {'weekly_messages': [week("Em xin nghỉ phép ngày 16/1 ạ")]}
+
+    asyncio.run(node.run_async(shared))
+
+    assert len(prompts) == config.LLM_MAX_ATTEMPTS
+    assert [item['message_id'] for item in shared['unresolved_messages']] == [1]
+
+
+def test_only_the_messages_a_response_missed_are_asked_again(tmp_path):
+    # The first response only covers row 1
+    node, prompts = create_node(tmp_path, lambda batch: label_leave_requests(batch)[:1] if len(prompts) == 1
+                                else label_leave_requests(batch))
+    shared = {'weekly_messages': [week("Em xin nghỉ phép ngày 16/1 ạ", "Ok giữ sk nha", "Em xin nghỉ hôm nay ạ")]}
+
+    asyncio.run(node.run_async(shared))
+
+    assert [sorted(batch.values()) for batch in prompts[1:]] == [["Em xin nghỉ hôm nay ạ", "Ok giữ sk nha"]]
+    assert [item['message_id'] for item in shared['labeled_messages']['nghi']] == [1, 3]
+    assert shared['unresolved_messages'] == []
+
+
+def test_mislabeled_rows_are_asked_again(tmp_path):
+    # "đầu tuần sau" cannot be resolved locally, so a label without "d" has no dates
+    def answer(batch):
+        return [{'i': i, 'c': 'nghi', 'p': 0.9, **({'d': [4]} if len(prompts) > 1 else {})} for i in batch]
+
+    node, prompts = create_node(tmp_path, answer)
+    shared = {'weekly_messages': [week("Em xin nghỉ phép ngày 16/1 ạ", "Em xin nghỉ đầu tuần sau ạ")]}
+
+    asyncio.run(node.run_async(shared))
+
+    assert [list(batch.values()) for batch in prompts[1:]] == [["Em xin nghỉ đầu tuần sau ạ"]]
+    assert [(item['message_id'], item['dates']) for item in shared['labeled_messages']['nghi']] == [
+        (1, ['2026-01-16']), (2, ['2026-01-19']),
+    ]
+
+
+def test_messages_still_missing_after_the_repair_rounds_are_unresolved(tmp_path):
+    def answer(batch):
+        return [item for item in label_leave_requests(batch) if 'nghỉ' in batch[item['i']]]
+
+    node, prompts = create_node(tmp_path, answer, repair_rounds=2)
+    shared = {'weekly_messages': [week("Em xin nghỉ phép ngày 16/1 ạ", "Ok giữ sk nha")]}
+
+    asyncio.run(node.run_async(shared))
+
+    assert len(prompts) == 3
+    assert [item['message_id'] for item in shared['labeled_messages']['nghi']] == [1]
+    assert [(item['message_id'], item['message']) for item in shared['unresolved_messages']] == [(2, "Ok giữ sk nha")]
+
+
+def test_unknown_cheap_tier_categories_are_escalated(tmp_path):
+    # The cheap model answers first, with a category that does not exist
+    def answer(batch):
+        if len(prompts) == 1:
+            return [{'i': i, 'c': 'sick_leave', 'p': 0.9} for i in batch]
+        return label_leave_requests(batch)
+
+    node, prompts = create_node(tmp_path, answer, cascade_model='cheap', repair_rounds=0)
+    shared = {'weekly_messages': [week("Em xin nghỉ phép ngày 16/1 ạ")]}
+
+    asyncio.run(node.run_async(shared))
+
+    assert len(prompts) == 2
+    assert (node.cascade_stats.cheap_count, node.cascade_stats.escalated_count) == (1, 1)
+    assert [item['message_id'] for item in shared['labeled_messages']['nghi']] == [1]
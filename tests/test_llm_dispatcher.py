@@ -0,0 +1,102 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.llm_dispatcher import AdaptiveConcurrencyLimiter, LLMDispatcher, retry_hint
+
+
+class APIError(Exception):
+    """Shaped like google.genai.errors.APIError."""
+
+    def __init__(self, code, details=None, headers=None):
+        super().__init__(f"{code}")
+        self.code = code
+        self.details = details
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+def test_successful_calls_increase_the_limit_by_about_one_per_limit_calls():
+    limiter = AdaptiveConcurrencyLimiter(limit=4, max_limit=16)
+    for _ in range(4):
+        limiter.on_success(0.1)
+
+    assert 4.9 < limiter.limit < 5
+
+
+def test_the_limit_never_exceeds_max_limit():
+    limiter = AdaptiveConcurrencyLimiter(limit=4, max_limit=5)
+    for _ in range(100):
+        limiter.on_success(0.1)
+
+    assert limiter.limit == 5
+
+
+def test_throttles_halve_the_limit_once_per_burst_down_to_min_limit():
+    limiter = AdaptiveConcurrencyLimiter(limit=8, min_limit=3)
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.limit == 4
+    assert limiter.throttle_count == 2
+
+    limiter.decreased_at = 0.0
+    limiter.on_throttle()
+    assert limiter.limit == 3
+
+
+def test_a_latency_spike_decreases_the_limit():
+    limiter = AdaptiveConcurrencyLimiter(limit=8, latency_spike=3.0)
+    limiter.on_success(0.1)
+    limiter.on_success(1.0)
+
+    assert limiter.limit < 8
+
+
+def test_a_retry_hint_pauses_new_calls():
+    limiter = AdaptiveConcurrencyLimiter()
+    limiter.on_throttle(retry_after=30)
+
+    assert not limiter.try_acquire()
+
+
+@pytest.mark.parametrize('error, hint', [
+    (APIError(429, details={'error': {'details': [
+        {'@type': 'type.googleapis.com/google.rpc.QuotaFailure'},
+        {'@type': 'type.googleapis.com/google.rpc.RetryInfo', 'retryDelay': '12s'},
+    ]}}), 12.0),
+    (APIError(429, details=[{'retryDelay': '1.5s'}]), 1.5),
+    (APIError(503, headers={'retry-after': '7'}), 7.0),
+    (APIError(503, headers={'retry-after': 'soon'}), None),
+    (APIError(500), None),
+    (ValueError("not an API error"), None),
+])
+def test_retry_hint(error, hint):
+    assert retry_hint(error) == hint
+
+
+def test_retryable_errors_are_retried_up_to_max_attempts():
+    calls = []
+
+    async def call(prompt, **kwargs):
+        calls.append(prompt)
+        raise APIError(503)
+
+    dispatcher = LLMDispatcher(call, max_attempts=3, base_delay=0.001, max_delay=0.001)
+    with pytest.raises(APIError):
+        asyncio.run(dispatcher('prompt'))
+
+    assert len(calls) == 3
+    assert dispatcher.retry_count == 2
+    assert dispatcher.limiter.in_flight == 0
+
+
+def test_other_errors_are_raised_at_once():
+    calls = []
+
+    async def call(prompt, **kwargs):
+        calls.append(prompt)
+        raise APIError(400)
+
+    with pytest.raises(APIError):
+        asyncio.run(LLMDispatcher(call, max_attempts=3)('prompt'))
+    assert len(calls) == 1
@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+from src.llm_dispatcher import AdaptiveConcurrencyLimiter, LLMDispatcher
+from src.llm_router import HedgedRouter, Route
+
+
+class FakeRoute:
+    """Async call answering `answer` after `delay` seconds; records cancellations."""
+
+    def __init__(self, answer, delay, error=None):
+        self.answer = answer
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self, prompt, **kwargs):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error:
+            raise self.error
+        return self.answer
+
+
+class Throttled(Exception):
+    code = 429
+
+
+def create_router(primary, hedge, limiter=None, p95=0.05):
+    router = HedgedRouter(Route(primary), Route(hedge), min_samples=1, max_hedge_ratio=1.0, limiter=limiter)
+    router.latency.add('m', p95)
+    return router
+
+
+def test_slow_requests_are_hedged_after_the_p95_and_the_loser_is_cancelled():
+    primary, hedge = FakeRoute('primary', 1.0), FakeRoute('hedge', 0.01)
+    router = create_router(primary, hedge)
+
+    started = time.monotonic()
+    assert asyncio.run(router('prompt', model='m')) == 'hedge'
+
+    assert 0.05 <= time.monotonic() - started < 0.5
+    assert (router.hedge_count, router.hedge_win_count, router.cancel_count) == (1, 1, 1)
+    assert primary.cancelled == 1
+
+
+def test_fast_requests_are_not_hedged():
+    primary, hedge = FakeRoute('primary', 0.01), FakeRoute('hedge', 0.01)
+    router = create_router(primary, hedge, p95=0.5)
+
+    assert asyncio.run(router('prompt', model='m')) == 'primary'
+    assert hedge.calls == 0
+    assert router.hedge_count == 0
+
+
+def test_hedges_take_a_limiter_slot_of_their_own():
+    limiter = AdaptiveConcurrencyLimiter(limit=2, max_limit=2)
+    in_flight = []
+
+    async def hedge(prompt, **kwargs):
+        in_flight.append(limiter.in_flight)
+        return 'hedge'
+
+    router = create_router(FakeRoute('primary', 1.0), hedge, limiter=limiter)
+    dispatcher = LLMDispatcher(router, limiter)
+
+    assert asyncio.run(dispatcher('prompt', model='m')) == 'hedge'
+    # The dispatcher's slot for the primary, and one for the hedge
+    assert in_flight == [2]
+    assert limiter.in_flight == 0
+
+
+def test_no_hedge_without_a_free_limiter_slot():
+    limiter = AdaptiveConcurrencyLimiter(limit=1, max_limit=1)
+    primary, hedge = FakeRoute('primary', 0.2), FakeRoute('hedge', 0.01)
+    router = create_router(primary, hedge, limiter=limiter)
+    dispatcher = LLMDispatcher(router, limiter)
+
+    assert asyncio.run(dispatcher('prompt', model='m')) == 'primary'
+    assert hedge.calls == 0
+    assert (router.hedge_count, router.hedge_skip_count) == (0, 1)
+    assert limiter.in_flight == 0
+
+
+def test_a_throttled_hedge_reduces_the_limit():
+    limiter = AdaptiveConcurrencyLimiter(limit=4, max_limit=4)
+    router = create_router(FakeRoute('primary', 0.2), FakeRoute('hedge', 0.01, error=Throttled()), limiter=limiter)
+
+    assert asyncio.run(LLMDispatcher(router, limiter)('prompt', model='m')) == 'primary'
+    assert limiter.throttle_count == 1
+    assert limiter.limit < 4
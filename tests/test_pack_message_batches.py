@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta, timezone
+
+from nodes.pack_message_batches import PackMessageBatchesNode
+from src.schedule_message import ScheduleMessage
+from src.token_budget import estimate_input_tokens
+
+# 20 estimated input tokens per message (10 row overhead + 30 characters)
+TEXT = "x" * 30
+
+
+def message(message_id, day, hour=2, text=TEXT):
+    """Message sent on 2026-01-`day` at `hour` UTC (`hour` + 7 in Vietnam)."""
+    sent_at = datetime(2026, 1, day, tzinfo=timezone.utc) + timedelta(hours=hour)
+    return ScheduleMessage(message_id, -100, 7, "An", sent_at, text)
+
+
+def pack(messages, input_budget):
+    node = PackMessageBatchesNode(input_budget=input_budget, output_budget=10_000)
+    return [[msg.message_id for msg in batch['messages']] for batch in node._pack(messages)]
+
+
+def test_batches_stay_within_the_input_budget():
+    messages = [message(i, 14, hour=i) for i in range(1, 8)]
+    batches = pack(messages, input_budget=60)
+
+    assert batches == [[1, 2, 3], [4, 5, 6], [7]]
+    by_id = {msg.message_id: msg for msg in messages}
+    assert all(sum(estimate_input_tokens(by_id[i]) for i in batch) <= 60 for batch in batches)
+
+
+def test_requests_are_cut_at_a_vietnam_day_boundary():
+    # 16/1 01:00 and 09:00 in Vietnam are one day, although the first is 15/1 in UTC
+    messages = [message(1, 14), message(2, 14), message(3, 14),
+                message(4, 15, hour=18), message(5, 16), message(6, 17)]
+
+    assert pack(messages, input_budget=80) == [[1, 2, 3], [4, 5, 6]]
+
+
+def test_the_last_day_is_not_carried_over_when_it_does_not_fit_with_the_next_message():
+    # 70 tokens: with the carried 20 it would exceed the budget
+    messages = [message(1, 14), message(2, 14), message(3, 15), message(4, 15, text="x" * 180)]
+
+    assert pack(messages, input_budget=80) == [[1, 2, 3], [4]]
+
+
+def test_an_oversized_message_gets_a_request_of_its_own():
+    messages = [message(1, 14), message(2, 15, text="x" * 600), message(3, 16)]
+
+    assert pack(messages, input_budget=80) == [[1], [2], [3]]
+
+
+def test_groups_are_never_mixed():
+    messages = [message(1, 14), message(1, 14), message(2, 15)]
+    messages[1].group_id = -200
+
+    batches = PackMessageBatchesNode(input_budget=1_000, output_budget=10_000)._pack(messages)
+
+    assert [(batch['group_id'], len(batch['messages'])) for batch in batches] == [(-100, 2), (-200, 1)]
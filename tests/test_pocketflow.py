@@ -0,0 +1,286 @@
+import asyncio
+import os
+
+import pytest
+
+from pocketflow import (
+    Node, AsyncNode, AsyncParallelBatchNode, AsyncParallelBatchFlow, ItemError,
+    ProcessPoolBatchNode, ProcessPoolBatchFlow, AsyncDAGFlow, SharedConflictError,
+    AsyncFlow, Checkpoint, JsonSerializer,
+)
+
+
+class Divide(AsyncParallelBatchNode):
+    async def prep_async(self, shared):
+        return shared['items']
+
+    async def exec_async(self, item):
+        return 1 / item
+
+    async def post_async(self, shared, prep_res, exec_res):
+        shared['results'] = exec_res
+
+
+def test_parallel_batch_failures_raise_by_default():
+    with pytest.raises(ZeroDivisionError):
+        asyncio.run(Divide().run_async({'items': [1, 0, 2]}))
+
+
+def test_parallel_batch_returns_item_errors_in_order():
+    shared = {'items': [1, 0, 2]}
+    with pytest.warns(UserWarning, match="1 of 3 batch items failed"):
+        asyncio.run(Divide(return_errors=True).run_async(shared))
+
+    first, error, last = shared['results']
+    assert (first, last) == (1.0, 0.5)
+    assert isinstance(error, ItemError)
+    assert (error.index, error.item) == (1, 0)
+    assert isinstance(error.exc, ZeroDivisionError)
+
+
+def test_parallel_batch_bounds_concurrency():
+    running, peak = 0, 0
+
+    class Track(AsyncParallelBatchNode):
+        async def exec_async(self, item):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return item
+
+    async def run():
+        return await Track(max_concurrency=2)._exec(list(range(8)))
+
+    assert asyncio.run(run()) == list(range(8))
+    assert peak == 2
+
+
+def test_parallel_batch_times_out_and_retries_each_attempt():
+    attempts = {}
+
+    class Slow(AsyncParallelBatchNode):
+        async def exec_async(self, item):
+            attempts[item] = attempts.get(item, 0) + 1
+            # 'late' is slow on its first attempt only
+            if item == 'stuck' or attempts[item] == 1 and item == 'late':
+                await asyncio.sleep(1)
+            return item
+
+    async def run():
+        node = Slow(max_retries=2, timeout=0.05, backoff=2, wait=0.01, max_wait=0.02, return_errors=True)
+        return await node._exec(['fast', 'late', 'stuck'])
+
+    with pytest.warns(UserWarning):
+        fast, late, stuck = asyncio.run(run())
+    assert (fast, late) == ('fast', 'late')
+    assert isinstance(stuck, ItemError) and isinstance(stuck.exc, asyncio.TimeoutError)
+    assert attempts == {'fast': 1, 'late': 2, 'stuck': 2}
+
+
+def test_parallel_batch_flow_passes_item_results_to_post():
+    class Step(AsyncNode):
+        async def exec_async(self, _):
+            if self.params['x'] == 2:
+                raise ValueError("bad item")
+            return self.params['x']
+
+        async def post_async(self, shared, prep_res, exec_res):
+            return f"done-{exec_res}"
+
+    class Items(AsyncParallelBatchFlow):
+        async def prep_async(self, shared):
+            return [{'x': x} for x in (1, 2, 3)]
+
+        async def post_async(self, shared, prep_res, exec_res):
+            shared['results'] = exec_res
+
+    shared = {}
+    with pytest.warns(UserWarning):
+        asyncio.run(Items(start=Step(), return_errors=True).run_async(shared))
+    first, error, last = shared['results']
+    assert (first, last) == ('done-1', 'done-3')
+    assert isinstance(error, ItemError) and error.item == {'x': 2}
+
+    with pytest.raises(ValueError):
+        asyncio.run(Items(start=Step()).run_async({}))
+
+
+class Square(ProcessPoolBatchNode):
+    def prep(self, shared):
+        return shared['items']
+
+    def exec(self, item):
+        if item == 3:
+            raise ValueError("three")
+        return item * item, os.getpid()
+
+    def post(self, shared, prep_res, exec_res):
+        shared['results'] = exec_res
+
+
+def test_process_pool_returns_results_in_order_with_item_errors():
+    shared = {'items': list(range(6))}
+    with pytest.warns(UserWarning, match="1 of 6 batch items failed"):
+        Square(max_workers=2, chunksize=2, return_errors=True).run(shared)
+
+    results = shared['results']
+    assert [r[0] for i, r in enumerate(results) if i != 3] == [0, 1, 4, 16, 25]
+    assert isinstance(results[3], ItemError)
+    assert (results[3].index, results[3].item, str(results[3].exc)) == (3, 3, "three")
+    assert os.getpid() not in {r[1] for i, r in enumerate(results) if i != 3}
+
+
+def test_process_pool_item_error_raises_by_default():
+    with pytest.raises(ValueError, match="three"):
+        Square(max_workers=2).run({'items': [1, 3]})
+
+
+class Team(Node):
+    def exec(self, _):
+        return self.params['team']
+
+    def post(self, shared, prep_res, exec_res):
+        shared.setdefault('teams', []).append(exec_res)
+
+
+class Teams(ProcessPoolBatchFlow):
+    def prep(self, shared):
+        return [{'team': team} for team in 'abc']
+
+    def post(self, shared, prep_res, exec_res):
+        shared['per_item'] = [result['teams'] for result in exec_res]
+
+
+def test_process_pool_flow_runs_each_item_on_its_own_copy_of_shared():
+    shared = {'month': 1}
+    Teams(start=Team(), max_workers=2).run(shared)
+    assert shared['per_item'] == [['a'], ['b'], ['c']]
+    assert 'teams' not in shared
+
+
+class Write(Node):
+    def __init__(self, key, value):
+        super().__init__()
+        self.key, self.value = key, value
+
+    def prep(self, shared):
+        return dict(shared)
+
+    def post(self, shared, prep_res, exec_res):
+        shared[self.key] = (self.value, prep_res)
+
+
+def test_dag_runs_dependencies_first_and_merges_writes():
+    fetch = Write('fetched', 1)
+    excel = Write('excel', 2).after(fetch)
+    yaml = Write('yaml', 3).after(fetch)
+    report = Write('report', 4).after(excel, yaml)
+
+    shared = {'month': 1}
+    asyncio.run(AsyncDAGFlow([report]).run_async(shared))
+
+    assert set(shared) == {'month', 'fetched', 'excel', 'yaml', 'report'}
+    assert shared['excel'][1] == {'month': 1, 'fetched': shared['fetched']}
+    assert set(shared['report'][1]) == {'month', 'fetched', 'excel', 'yaml'}
+
+
+def test_dag_rejects_conflicting_writers():
+    with pytest.raises(SharedConflictError, match="shared\\['total'\\]"):
+        asyncio.run(AsyncDAGFlow([Write('total', 1), Write('total', 2)]).run_async({}))
+
+
+def test_dag_allows_a_dependent_to_overwrite():
+    first = Write('total', 1)
+    shared = {}
+    asyncio.run(AsyncDAGFlow([Write('total', 2).after(first)]).run_async(shared))
+    assert shared['total'][0] == 2
+
+
+def test_dag_rejects_a_dependency_cycle():
+    a = Write('a', 1)
+    b = Write('b', 2).after(a)
+    a.after(b)
+    with pytest.raises(ValueError, match="cycle"):
+        asyncio.run(AsyncDAGFlow([a]).run_async({}))
+
+
+def test_dag_runs_independent_branches_concurrently():
+    class Sleep(AsyncNode):
+        async def exec_async(self, _):
+            await asyncio.sleep(0.2)
+
+    async def run():
+        started = asyncio.get_running_loop().time()
+        await AsyncDAGFlow([Sleep(), Sleep(), Sleep()]).run_async({})
+        return asyncio.get_running_loop().time() - started
+
+    assert asyncio.run(run()) < 0.4
+
+
+class Fetch(AsyncNode):
+    calls = 0
+
+    async def exec_async(self, _):
+        Fetch.calls += 1
+        return list(range(4))
+
+    async def post_async(self, shared, prep_res, exec_res):
+        shared['items'] = exec_res
+
+
+class Label(AsyncParallelBatchNode):
+    failing, calls = set(), []
+
+    async def prep_async(self, shared):
+        return shared['items']
+
+    async def exec_async(self, item):
+        Label.calls.append(item)
+        if item in Label.failing:
+            raise RuntimeError("provider down")
+        return item * 10
+
+    async def post_async(self, shared, prep_res, exec_res):
+        shared['labels'] = exec_res
+
+
+class Export(Node):
+    def post(self, shared, prep_res, exec_res):
+        shared['total'] = sum(shared['labels'])
+
+
+def checkpointed_flow(run_dir, last=Export):
+    fetch, label = Fetch(), Label()
+    fetch >> label >> last()
+    return AsyncFlow(start=fetch, checkpoint=Checkpoint(str(run_dir), serializers={'items': JsonSerializer()}))
+
+
+def test_resume_skips_finished_nodes_and_items(tmp_path, monkeypatch):
+    monkeypatch.setattr(Fetch, 'calls', 0)
+    monkeypatch.setattr(Label, 'calls', [])
+    monkeypatch.setattr(Label, 'failing', {2})
+
+    with pytest.raises(RuntimeError, match="provider down"):
+        asyncio.run(checkpointed_flow(tmp_path).run_async({'month': 1}))
+    assert (tmp_path / 'state.json').exists()
+
+    Label.failing, Label.calls = set(), []
+    shared = {}
+    asyncio.run(checkpointed_flow(tmp_path).run_async(shared))
+
+    # Fetch finished before the crash; only the failed item is labeled again
+    assert Fetch.calls == 1
+    assert Label.calls == [2]
+    assert shared == {'month': 1, 'items': [0, 1, 2, 3], 'labels': [0, 10, 20, 30], 'total': 60}
+    assert Checkpoint(str(tmp_path)).exists()
+
+
+def test_resume_rejects_a_different_flow(tmp_path):
+    class OtherExport(Export):
+        pass
+
+    asyncio.run(checkpointed_flow(tmp_path).run_async({}))
+    with pytest.raises(ValueError, match="does not match this flow"):
+        asyncio.run(checkpointed_flow(tmp_path, last=OtherExport).run_async({}))
@@ -0,0 +1,77 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from nodes import LabelScheduleMessagesNode
+from src.prompt_cache import PromptCache, LocalContextCache, CacheNotFound, is_cache_error
+from src.schedule_message import ScheduleMessage
+
+
+def test_prompt_cache_hit_expiry_and_recreate():
+    async def run():
+        local = LocalContextCache()
+        cache = PromptCache(local.create, local.delete, ttl_seconds=3600)
+
+        name = await cache.get("prefix", "model")
+        assert await cache.get("prefix", "model") == name
+        assert local.expand(name, "rows") == "prefix\n\nrows"
+
+        # The provider drops the cache before our TTL ends
+        local.contents[name] = local.contents[name][:2] + (0,)
+        with pytest.raises(CacheNotFound) as error:
+            local.expand(name, "rows")
+        assert is_cache_error(error.value)
+
+        cache.invalidate(name)
+        new_name = await cache.get("prefix", "model")
+        assert new_name != name
+        assert (cache.created_count, cache.hit_count) == (2, 1)
+
+        await cache.close()
+        assert local.contents == {}
+
+    asyncio.run(run())
+
+
+def test_other_errors_are_not_cache_errors():
+    assert not is_cache_error(KeyError("cachedContents/local-1"))
+    assert not is_cache_error(ValueError("Invalid JSON response"))
+
+
+def test_label_node_recreates_an_expired_cache(tmp_path):
+    prompts = []
+
+    async def provider(prompt, **kwargs):
+        prompts.append(prompt)
+        return '[{"i": 1, "c": "nghi", "p": 0.95, "n": "Nghỉ phép"}]'
+
+    node = LabelScheduleMessagesNode(
+        cache_path=str(tmp_path / "labels.db"), context_cache="local", provider=provider,
+        cascade_model="", hedge="off", mode="interactive", repair_rounds=0,
+    )
+    local = node.prompt_cache.create.__self__
+    sent_at = datetime(2026, 1, 15, 2, 0, tzinfo=timezone.utc)
+
+    def batch(message_id):
+        message = ScheduleMessage(message_id, -100, 7, "Nguyễn Văn A", sent_at, "Em xin nghỉ ạ")
+        return {'batch_key': f"b{message_id}", 'batch_range': "", 'messages': [message]}
+
+    async def run():
+        first = await node.exec_async(batch(1))
+        for name in local.contents:
+            local.contents[name] = local.contents[name][:2] + (0,)
+        second = await node.exec_async(batch(2))
+        third = await node.exec_async(batch(3))
+        await node.prompt_cache.close()
+        return first, second, third
+
+    results = asyncio.run(run())
+    node._get_cache().close()
+
+    assert [r['labels']['nghi'][0]['message_id'] for r in results] == [1, 2, 3]
+    # Cached, then inline after the provider rejected the cache, then cached again
+    assert [cached is not None for cached, _ in local.requests] == [True, True, False, True]
+    assert local.requests[2][1].startswith(node.SYSTEM_PROMPT)
+    assert len(prompts) == 3
+    assert node.prompt_cache.created_count == 2
@@ -0,0 +1,88 @@
+import csv
+from datetime import datetime, timezone
+from io import StringIO
+
+from src.label_schema import parse_label_response
+from src.prompt_codec import PromptCodec
+
+# Thursday 2026-01-15, 09:00 and 16:30 Vietnam time; Friday 2026-01-16, 08:00
+THURSDAY = datetime(2026, 1, 15, 2, 0, tzinfo=timezone.utc)
+THURSDAY_AFTERNOON = datetime(2026, 1, 15, 9, 30, tzinfo=timezone.utc)
+FRIDAY = datetime(2026, 1, 16, 1, 0, tzinfo=timezone.utc)
+
+
+class Message:
+    def __init__(self, message_id, sender_id, date, text):
+        self.message_id = message_id
+        self.sender_id = sender_id
+        self.date = date
+        self.text = text
+
+
+MESSAGES = [
+    Message(501, 7, THURSDAY, "Em xin nghỉ phép ngày 16/1 và 17/1 ạ"),
+    Message(502, 8, THURSDAY_AFTERNOON, "Em xin nghỉ buổi chiều hôm nay ạ"),
+    Message(503, 7, FRIDAY, "Em xin lên trễ 30p, kẹt xe quá"),
+    Message(504, 9, FRIDAY, "Em xin nghỉ đầu tuần sau ạ"),
+]
+
+
+def decode(encoded):
+    """(anchor line, CSV rows as dicts) of an encoded batch."""
+    anchor, body = encoded.split('\n', 1)
+    return anchor, list(csv.DictReader(StringIO(body)))
+
+
+def test_encode_uses_rows_aliases_day_offsets_and_resolved_dates():
+    anchor, rows = decode(PromptCodec(MESSAGES).encode())
+
+    assert anchor == "d0=2026-01-15 (Thứ Năm)"
+    assert [(row['i'], row['s'], row['d'], row['t'], row['r']) for row in rows] == [
+        ('1', 's1', '0', '09:00', '1;2'),
+        ('2', 's2', '0', '16:30', '0c'),
+        ('3', 's1', '1', '08:00', ''),
+        ('4', 's3', '1', '08:00', '?'),
+    ]
+    # Commas in the text are quoted, so the message column round-trips
+    assert [row['message'] for row in rows] == [msg.text for msg in MESSAGES]
+
+
+def test_rows_and_day_offsets_decode_back_to_ids_and_dates():
+    codec = PromptCodec(MESSAGES)
+    _, rows = decode(codec.encode())
+
+    assert [codec.message_id(int(row['i'])) for row in rows] == [msg.message_id for msg in MESSAGES]
+    assert [codec.date(int(row['d'])) for row in rows] == ['2026-01-15', '2026-01-15', '2026-01-16', '2026-01-16']
+    assert codec.message_id(0) is None
+    assert codec.message_id(len(MESSAGES) + 1) is None
+    assert codec.date(400) is None
+
+
+def test_dates_fall_back_to_the_resolved_ones_and_flag_contradictions():
+    codec = PromptCodec(MESSAGES)
+
+    assert codec.dates(1, None) == (['2026-01-16', '2026-01-17'], False)
+    assert codec.dates(3, []) == (['2026-01-16'], False)
+    assert codec.dates(4, [4]) == (['2026-01-19'], False)
+    assert codec.dates(1, [1]) == (['2026-01-16'], True)
+    assert codec.date_mismatch_count == 1
+
+
+def test_a_response_decodes_into_message_ids_and_dates():
+    codec = PromptCodec(MESSAGES)
+    response = """[
+        {"i": 1, "c": "nghi", "p": 0.95, "n": "Nghỉ phép 2 ngày"},
+        {"i": 2, "c": "nua_buoi", "p": 0.9, "n": "Nghỉ buổi chiều"},
+        {"i": 3, "c": "tre", "p": 0.9},
+        {"i": 4, "c": "nghi", "p": 0.7, "d": [4]},
+        {"i": 9, "c": "nghi", "p": 0.9}
+    ]"""
+
+    records = parse_label_response(response, codec)
+
+    assert [(r.message_id, r.dates) for r in records['nghi']] == [
+        (501, ['2026-01-16', '2026-01-17']), (504, ['2026-01-19']),
+    ]
+    assert [(r.message_id, r.dates) for r in records['nua_buoi']] == [(502, ['2026-01-15'])]
+    assert [(r.message_id, r.dates) for r in records['tre']] == [(503, ['2026-01-16'])]
+    assert records['confidence'] == {501: 0.95, 502: 0.9, 503: 0.9, 504: 0.7}
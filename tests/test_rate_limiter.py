@@ -0,0 +1,91 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src import rate_limiter
+from src.rate_limiter import AdaptiveRateLimiter
+
+
+class FakeClock:
+    """monotonic() and an asyncio.sleep() that only advances the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, 'time', SimpleNamespace(monotonic=clock.monotonic))
+    monkeypatch.setattr(rate_limiter, 'asyncio', SimpleNamespace(sleep=clock.sleep, Lock=asyncio.Lock))
+    return clock
+
+
+def acquire(limiter, times=1):
+    async def run():
+        for _ in range(times):
+            await limiter.acquire()
+    asyncio.run(run())
+
+
+def test_tokens_refill_at_the_rate(clock):
+    limiter = AdaptiveRateLimiter(rate=2.0, burst=1)
+
+    acquire(limiter, 3)
+
+    assert clock.now == pytest.approx(1001.0)
+
+
+def test_flood_wait_blocks_for_the_requested_time_and_halves_the_rate(clock):
+    limiter = AdaptiveRateLimiter(rate=2.0, burst=1)
+    acquire(limiter)
+
+    limiter.on_flood_wait(30)
+    acquire(limiter)
+
+    assert clock.now == pytest.approx(1030.0)
+    assert limiter.rate == 1.0
+    # Tokens were emptied: the following request waits a full interval at the new rate
+    acquire(limiter)
+    assert clock.now == pytest.approx(1031.0)
+
+
+def test_repeated_flood_waits_do_not_go_below_min_rate(clock):
+    limiter = AdaptiveRateLimiter(rate=1.0, min_rate=0.2)
+    for _ in range(5):
+        limiter.on_flood_wait(1)
+
+    assert limiter.rate == 0.2
+
+
+def test_a_shorter_flood_wait_does_not_shorten_the_block(clock):
+    limiter = AdaptiveRateLimiter(rate=1.0, burst=1)
+    limiter.on_flood_wait(20)
+    limiter.on_flood_wait(5)
+
+    acquire(limiter)
+
+    assert clock.now >= 1020.0
+
+
+def test_clean_pages_recover_the_rate_up_to_max_rate(clock):
+    limiter = AdaptiveRateLimiter(rate=4.0, max_rate=5.0, increase=0.25)
+    limiter.on_flood_wait(1)
+    assert limiter.rate == 2.0
+
+    for _ in range(4):
+        limiter.on_success()
+    assert limiter.rate == 3.0
+
+    for _ in range(20):
+        limiter.on_success()
+    assert limiter.rate == 5.0
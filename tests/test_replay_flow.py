@@ -0,0 +1,62 @@
+import asyncio
+import os
+import re
+import shutil
+
+import pytest
+
+import flow
+import nodes.label_schedule_messages as label_module
+from src import config
+from src.replay_client import ReplayTelegramClient
+from src.telegram_sync import month_window
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+FIXTURE = os.path.join(ROOT, 'data_raw', 'schedule_sample.json')
+# data_raw/schedule_sample.json: 2026-01-11 .. 2026-01-14
+WEEKLY_COUNTS = [('2026-01-05', 1), ('2026-01-12', 9)]
+# Rule labels only; the fake LLM answers "none" for the rest
+LABEL_COUNTS = {'nghi': 0, 'tre': 3, 'nua_buoi': 1, 'remote': 1}
+ROW = re.compile(r'^(\d+),s\d+,', re.MULTILINE)
+
+
+@pytest.fixture
+def offline(tmp_path, monkeypatch):
+    """Run in a scratch directory with local caches and an LLM that labels every row "none"."""
+    os.makedirs(tmp_path / 'data_raw')
+    shutil.copy(os.path.join(ROOT, 'data_raw', 'dialog_info.json'), tmp_path / 'data_raw')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config, 'LABEL_CACHE_PATH', str(tmp_path / 'labels.db'))
+    monkeypatch.setattr(config, 'LLM_CONTEXT_CACHE', 'off')
+    monkeypatch.setattr(config, 'LLM_HEDGE', 'off')
+    monkeypatch.setattr(config, 'LLM_CASCADE_MODEL', '')
+    monkeypatch.setattr(config, 'LLM_MODE', 'interactive')
+
+    prompts = []
+
+    async def fake_llm(prompt, **kwargs):
+        prompts.append(prompt)
+        rows = ROW.findall(prompt.rsplit('d0=', 1)[-1])
+        return '[' + ', '.join(f'{{"i": {row}, "c": "none", "p": 0.9}}' for row in rows) + ']'
+
+    monkeypatch.setattr(label_module, 'call_llm_async', fake_llm)
+    return prompts
+
+
+@pytest.mark.parametrize('create', [flow.create_schedule_flow, flow.create_streaming_schedule_flow])
+def test_replay_fixture_through_the_schedule_flow(offline, create):
+    client = ReplayTelegramClient.from_fixture(FIXTURE, config.SAMPLE_GROUP_ID, config.SAMPLE_TOPIC_ID)
+    start, end = month_window(2026, 1)
+    shared = {'report_start': start, 'report_end': end}
+
+    asyncio.run(create(client_factory=lambda: client).run_async(shared))
+
+    assert len(shared['schedule_messages']) == 10
+    assert [(week['week_key'], len(week['messages'])) for week in shared['weekly_messages']] == WEEKLY_COUNTS
+    assert {week['week_key'] for week in shared['weekly_labeled_messages']} == {key for key, _ in WEEKLY_COUNTS}
+    assert {category: len(items) for category, items in shared['labeled_messages'].items()} == LABEL_COUNTS
+    assert shared['unresolved_messages'] == []
+    # Messages the rules could not decide went to the (fake) LLM
+    assert offline
+    assert os.path.exists(shared['excel_output_path'])
+    assert shared['labeled_messages_yaml']
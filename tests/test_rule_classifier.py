@@ -0,0 +1,61 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from src.rule_classifier import classify, LABEL, SKIP, AMBIGUOUS
+from src.schedule_message import ScheduleMessage
+
+# Thursday 2026-01-15, 09:00 Vietnam time
+SENT_AT = datetime(2026, 1, 15, 2, 0, tzinfo=timezone.utc)
+
+
+def message(text, name="Nguyễn Văn A"):
+    return ScheduleMessage(1, -100, 7, name, SENT_AT, text)
+
+
+@pytest.mark.parametrize('text, category, dates', [
+    ("Em xin nghỉ phép ngày 16/1 ạ", 'nghi', ['2026-01-16']),
+    ("Em xin nghỉ hôm nay ạ", 'nghi', ['2026-01-15']),
+    ("xin nghỉ 2 ngày 16, 17/1", 'nghi', ['2026-01-16', '2026-01-17']),
+    ("Em xin lên trễ 30p ạ", 'tre', ['2026-01-15']),
+    ("Em xin làm remote ngày mai ạ", 'remote', ['2026-01-16']),
+])
+def test_labels_formulaic_requests(text, category, dates):
+    result = classify(message(text))
+    assert result.decision == LABEL
+    assert result.category == category
+    assert result.label['dates'] == dates
+
+
+@pytest.mark.parametrize('text', [
+    "Chị Mai xin nghỉ hôm nay ạ",
+    "Em xin nghỉ phép 3 ngày từ mai ạ",
+    "xin nghỉ 2 ngày 16 17/1",
+    "Em xin nghỉ vài ngày từ 16/1 ạ",
+    "Em không xin nghỉ ngày 16/1",
+    "Em xin nghỉ ngày 16/1 được không ạ?",
+    "Em xin nghỉ 16/1 nhưng 17/1 em vẫn lên",
+    "Em xin lên trễ 30p, sáng mai em lên sớm bù",
+])
+def test_uncertain_requests_go_to_the_llm(text):
+    assert classify(message(text)).decision == AMBIGUOUS
+
+
+def test_half_day_words_in_the_reason_do_not_make_a_half_day_request():
+    result = classify(message("Em xin off ngày 16/1 do sáng em đi khám bệnh"))
+    assert result.decision == LABEL
+    assert result.category == 'nghi'
+    assert result.label['dates'] == ['2026-01-16']
+    assert result.label['info'] == "Nghỉ phép do sáng em đi khám bệnh"
+
+
+def test_sender_named_mai_is_labeled_normally():
+    result = classify(message("Em xin nghỉ phép ngày 16/1 ạ", name="Trần Thị Mai"))
+    assert result.decision == LABEL
+    assert result.label['name'] == "Trần Thị Mai"
+    assert result.label['dates'] == ['2026-01-16']
+
+
+def test_skips_chit_chat():
+    assert classify(message("ok ạ")).decision == SKIP
+    assert classify(message("Chúc mọi người cuối tuần vui vẻ")).decision == SKIP
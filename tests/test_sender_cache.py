@@ -0,0 +1,49 @@
+import asyncio
+
+from src.replay_client import ReplayUser
+from src.sender_cache import SenderResolver
+
+
+class Message:
+    def __init__(self, sender_id):
+        self.sender_id = sender_id
+        self.sender = None
+
+
+class Client:
+    """get_entity() that fails the whole list if any id is unknown, like Telethon."""
+
+    def __init__(self, users):
+        self.users = {user.id: user for user in users}
+        self.requests = []
+
+    async def get_entity(self, ids):
+        self.requests.append(list(ids))
+        missing = [i for i in ids if i not in self.users]
+        if missing:
+            raise ValueError(f"Could not find the input entity for {missing[0]}")
+        return [self.users[i] for i in ids]
+
+
+def test_one_unresolvable_sender_does_not_hide_the_others(tmp_path):
+    client = Client([ReplayUser(i, f"User{i}") for i in (1, 2, 3, 5)])
+    resolver = SenderResolver(str(tmp_path / "senders.json"))
+
+    names = asyncio.run(resolver.resolve_page(client, [Message(i) for i in (1, 2, 3, 4, 5)]))
+
+    assert names == {1: "User1", 2: "User2", 3: "User3", 4: None, 5: "User5"}
+    assert client.requests[0] == [1, 2, 3, 4, 5]
+    # The failed id is not cached, so the next page asks for it again
+    assert resolver.get(4) is None
+    assert resolver.get(5) == "User5"
+
+    client.requests.clear()
+    asyncio.run(resolver.resolve_page(client, [Message(4), Message(5)]))
+    assert client.requests == [[4]]
+
+
+def test_resolved_senders_need_one_request():
+    client = Client([ReplayUser(i, f"User{i}") for i in (1, 2)])
+    resolver = SenderResolver(None)
+    assert asyncio.run(resolver.resolve_page(client, [Message(1), Message(2), Message(1)])) == {1: "User1", 2: "User2"}
+    assert client.requests == [[1, 2]]
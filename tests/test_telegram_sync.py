@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.message_store import MessageStore
+from src.rate_limiter import AdaptiveRateLimiter
+from src.replay_client import ReplayMessage, ReplayTelegramClient, ReplayUser
+from src.sender_cache import SenderResolver
+from src.telegram_sync import sync_topic
+
+GROUP_ID, TOPIC_ID = -100, 5
+USER = ReplayUser(7, "An")
+# Message i was sent on January i, 2026 at 12:00 UTC (ids 1 .. 59 run to February 28)
+MESSAGES = [
+    ReplayMessage(i, datetime(2026, 1, 1, 12, tzinfo=timezone.utc) + timedelta(days=i - 1), USER.id, USER, f"msg {i}")
+    for i in range(1, 60)
+]
+
+
+def jan(day):
+    return datetime(2026, 1, day, tzinfo=timezone.utc)
+
+
+class RecordingClient(ReplayTelegramClient):
+    """Replay client that records the (offset_date, min_id) each history request starts from."""
+
+    def __init__(self):
+        super().__init__({(GROUP_ID, TOPIC_ID): MESSAGES}, users=[USER])
+        self.requests = []
+
+    def iter_messages(self, entity, limit=None, *, offset_date=None, offset_id=0, min_id=0, **kwargs):
+        if not offset_id:
+            self.requests.append((offset_date, min_id))
+        return super().iter_messages(entity, limit, offset_date=offset_date, offset_id=offset_id,
+                                     min_id=min_id, **kwargs)
+
+
+@pytest.fixture
+def sync(tmp_path):
+    """sync(start, end) -> (message ids, requests sent to the client) against one store."""
+    store = MessageStore(str(tmp_path / 'messages.db'))
+    resolver = SenderResolver(None)
+    limiter = AdaptiveRateLimiter(rate=1000, max_rate=1000, burst=1000)
+
+    def run(start, end):
+        client = RecordingClient()
+        messages = asyncio.run(sync_topic(client, store, resolver, limiter, GROUP_ID, TOPIC_ID, start, end))
+        return [m['message_id'] for m in messages], client.requests
+
+    yield run
+    store.close()
+
+
+def test_fresh_sync_fetches_the_whole_window(sync, tmp_path):
+    ids, requests = sync(jan(10), jan(20))
+
+    assert ids == list(range(10, 20))
+    assert requests == [(jan(20), 0)]
+    store = MessageStore(str(tmp_path / 'messages.db'))
+    assert store.get_sync_state(GROUP_ID, TOPIC_ID) == {
+        'last_message_id': 19, 'synced_since': jan(10), 'synced_until': jan(20),
+    }
+    store.close()
+
+
+def test_a_window_extending_backwards_only_fetches_the_older_part(sync):
+    sync(jan(10), jan(20))
+
+    ids, requests = sync(jan(5), jan(20))
+
+    assert ids == list(range(5, 20))
+    assert requests == [(jan(10), 0)]
+
+
+def test_a_window_extending_forwards_only_fetches_past_the_high_water_mark(sync):
+    sync(jan(10), jan(20))
+
+    ids, requests = sync(jan(15), jan(25))
+
+    assert ids == list(range(15, 25))
+    assert requests == [(jan(25), 19)]
+
+
+def test_a_covered_window_is_read_from_the_store(sync):
+    sync(jan(10), jan(20))
+
+    ids, requests = sync(jan(12), jan(18))
+
+    assert ids == list(range(12, 18))
+    assert requests == []
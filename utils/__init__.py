@@ -2,6 +2,6 @@
 Utility functions for the schedule automation project
 """
 
-from .call_llm import call_llm
+from .call_llm import call_llm, call_llm_async, close_llm_client
 
-__all__ = ['call_llm']
\ No newline at end of file
+__all__ = ['call_llm', 'call_llm_async', 'close_llm_client']
\ No newline at end of file
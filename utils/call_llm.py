@@ -1,21 +1,72 @@
 import os
-import asyncio
-import google.generativeai as genai
 from typing import Optional
 from google import genai
 from google.genai import types
 
+DEFAULT_MODEL = "gemini-2.5-flash"
 
-def call_llm(prompt: str, fast_mode: bool = False, max_retry_time: int = None) -> str:
-    """Call LLM with timeout protection and automatic retry logic"""
-    model_id = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        return "Xin lỗi, hệ thống chưa cấu hình API key."
-    
-    client = genai.Client(api_key=api_key)
-    config = types.GenerateContentConfig(thinking_config=types.ThinkingConfig(thinking_budget=0)) if "thinking" in model_id and not fast_mode else None
-    response = client.models.generate_content(model=model_id, contents=prompt, config=config)
+# Process-wide client: its sync and async (client.aio) HTTP connection pools
+# are reused by every call instead of paying a new client and TLS handshake.
+_client: Optional[genai.Client] = None
+
+
+def get_model(model: Optional[str] = None) -> str:
+    """Model to use: the explicit one, else GEMINI_MODEL, else DEFAULT_MODEL."""
+    return model or os.getenv("GEMINI_MODEL", DEFAULT_MODEL)
+
+
+def get_llm_client() -> Optional[genai.Client]:
+    """Return the shared Gemini client, creating it on first use (None without an API key)."""
+    global _client
+    if _client is None:
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            return None
+        _client = genai.Client(api_key=api_key)
+    return _client
+
+
+def _require_client() -> genai.Client:
+    """Return the shared Gemini client, or raise when no API key is configured."""
+    client = get_llm_client()
+    if client is None:
+        raise RuntimeError("GEMINI_API_KEY is not configured")
+    return client
+
+
+async def close_llm_client():
+    """Close the shared client's connection pools (call before the event loop ends)."""
+    global _client
+    if _client is None:
+        return
+    client, _client = _client, None
+    await client.aio.aclose()
+    client.close()
+
+
+def _generate_config(model_id: str, fast_mode: bool, cached_content: Optional[str] = None,
+                     response_schema: Optional[dict] = None):
+    options = {}
+    if "thinking" in model_id and not fast_mode:
+        options["thinking_config"] = types.ThinkingConfig(thinking_budget=0)
+    if cached_content:
+        options["cached_content"] = cached_content
+    if response_schema:
+        options["response_mime_type"] = "application/json"
+        options["response_schema"] = response_schema
+    return types.GenerateContentConfig(**options) if options else None
+
+
+def call_llm(prompt: str, fast_mode: bool = False, max_retry_time: int = None, model: Optional[str] = None) -> str:
+    """Call LLM with timeout protection and automatic retry logic
+
+    Raises:
+        RuntimeError: GEMINI_API_KEY is not configured
+    """
+    model_id = get_model(model)
+    client = _require_client()
+
+    response = client.models.generate_content(model=model_id, contents=prompt, config=_generate_config(model_id, fast_mode))
     return response.text or "Xin lỗi, không thể tạo response."
 
 def main():
@@ -29,21 +80,93 @@ def main():
         print(f"Error: {e}")
 
 
-async def call_llm_async(prompt: str, model_name: str = "gemini-2.5-flash") -> str:
+async def call_llm_async(prompt: str, model: Optional[str] = None, fast_mode: bool = False,
+                         cached_content: Optional[str] = None, response_schema: Optional[dict] = None) -> str:
     """
     Async version of call_llm for parallel execution.
 
+    Uses the SDK's native async API (client.aio) on the shared client, so
+    parallel calls share one connection pool and need no worker threads.
+
     Args:
         prompt: The input prompt to send to Gemini
-        model_name: The Gemini model to use (default: gemini-2.5-flash)
+        model: The Gemini model to use (default: GEMINI_MODEL or gemini-2.5-flash)
+        fast_mode: Keep the model's default thinking configuration
+        cached_content: Name of a context cache (create_context_cache) holding
+            the system instruction; `prompt` is then only the new content
+        response_schema: Schema for structured JSON output (response is JSON text)
 
     Returns:
         The generated response text from Gemini
+
+    Raises:
+        RuntimeError: GEMINI_API_KEY is not configured
+    """
+    model_id = get_model(model)
+    client = _require_client()
+
+    response = await client.aio.models.generate_content(
+        model=model_id, contents=prompt, config=_generate_config(model_id, fast_mode, cached_content, response_schema)
+    )
+    return response.text or "Xin lỗi, không thể tạo response."
+
+
+async def create_context_cache(system_instruction: str, model: Optional[str] = None, ttl_seconds: int = 3600) -> str:
+    """Register a system instruction as a Gemini context cache and return its name.
+
+    Raises when caching is unavailable (no API key, model without caching, or a
+    prompt below the model's minimum cacheable size).
+    """
+    client = _require_client()
+
+    cache = await client.aio.caches.create(
+        model=get_model(model),
+        config=types.CreateCachedContentConfig(
+            system_instruction=system_instruction,
+            ttl=f"{ttl_seconds}s",
+            display_name="schedule-label-prompt",
+        ),
+    )
+    return cache.name
+
+
+async def delete_context_cache(name: str):
+    """Delete a context cache created by create_context_cache."""
+    client = get_llm_client()
+    if client is not None:
+        await client.aio.caches.delete(name=name)
+
+
+async def submit_batch_job(job_path: str, model: Optional[str] = None, display_name: str = "schedule-labels") -> str:
+    """Upload a JSONL batch request file and start a Gemini batch job; return the job name.
+
+    Each line of the file is {"key": ..., "request": GenerateContentRequest}.
     """
-    # Run sync call_llm in thread pool to not block event loop
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, call_llm, prompt, model_name)
+    client = _require_client()
+
+    uploaded = await client.aio.files.upload(
+        file=job_path, config=types.UploadFileConfig(display_name=display_name, mime_type="jsonl")
+    )
+    job = await client.aio.batches.create(
+        model=get_model(model), src=uploaded.name, config=types.CreateBatchJobConfig(display_name=display_name)
+    )
+    return job.name
+
+
+async def get_batch_job(name: str):
+    """Return (state name, result file name or None) of a Gemini batch job."""
+    client = _require_client()
+
+    job = await client.aio.batches.get(name=name)
+    result_file = job.dest.file_name if job.dest else None
+    return job.state.name, result_file
+
+
+async def download_batch_results(file_name: str) -> bytes:
+    """Download the JSONL result file of a finished Gemini batch job."""
+    client = _require_client()
+    return await client.aio.files.download(file=file_name)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()